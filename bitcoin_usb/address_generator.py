@@ -0,0 +1,138 @@
+import logging
+import threading
+
+import bdkpython as bdk
+from hwilib.descriptor import PubkeyProvider
+from hwilib.key import KeyOriginInfo
+
+from .address_types import DescriptorInfo
+
+logger = logging.getLogger(__name__)
+
+
+class AddressGenerator:
+    """Derives the receive and change addresses of a DescriptorInfo in batches.
+
+    The non-hardened chain nodes (key_origin/0 and key_origin/1) of every spk_provider are derived once,
+    so every address only costs 1 child derivation per key.
+    Contiguous ranges are derived by bdk in 1 call (including the sorting of sortedmulti keys)
+    and are cached, such that growing the range (e.g. a gap limit scan) only derives the new addresses.
+
+    Like SimplePubKeyProvider.get_address_bip32_path, receive addresses are on chain 0 and
+    change addresses on chain 1, independent of the derivation_path of the spk_providers.
+    """
+
+    def __init__(self, descriptor_info: DescriptorInfo, network: bdk.Network) -> None:
+        self.descriptor_info = descriptor_info
+        self.network = network
+        self._descriptors: dict[bdk.KeychainKind, bdk.Descriptor] = {}
+        # a private wallet per keychain, that is only used to reveal addresses
+        self._wallets: dict[bdk.KeychainKind, bdk.Wallet] = {}
+        # {keychain: addresses from index 0 on}
+        self._addresses: dict[bdk.KeychainKind, list[str]] = {
+            bdk.KeychainKind.EXTERNAL: [],
+            bdk.KeychainKind.INTERNAL: [],
+        }
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def chain_index(keychain: bdk.KeychainKind) -> int:
+        return 0 if keychain == bdk.KeychainKind.EXTERNAL else 1
+
+    def _chain_pubkey_provider(self, pubkey_provider: PubkeyProvider, chain_index: int) -> PubkeyProvider:
+        "The pubkey_provider with the xpub of the chain node and the wildcard as derivation path"
+        assert pubkey_provider.origin, "The key origin is needed for the chain node"
+        origin = pubkey_provider.origin.to_string()
+        chain_key = bdk.DescriptorPublicKey.from_string(f"[{origin}]{pubkey_provider.pubkey}").derive(
+            bdk.DerivationPath(f"m/{chain_index}")
+        )
+        # str(chain_key) = "[7c85f2b5/84'/1'/0'/0]tpub...."
+        chain_xpub = str(chain_key).split("]")[-1]
+        return PubkeyProvider(
+            origin=KeyOriginInfo.from_string(f"{origin}/{chain_index}"),
+            pubkey=chain_xpub,
+            deriv_path="/*",
+        )
+
+    def chain_descriptor(self, keychain: bdk.KeychainKind) -> bdk.Descriptor:
+        "The descriptor of the keychain, in which the keys are the (cached) chain nodes"
+        descriptor = self._descriptors.get(keychain)
+        if descriptor is not None:
+            return descriptor
+
+        chain_index = self.chain_index(keychain)
+        descriptor_str = self.descriptor_info.get_hwi_descriptor(self.network).to_string_no_checksum()
+        for spk_provider in self.descriptor_info.spk_providers:
+            pubkey_provider = spk_provider.to_hwi_pubkey_provider()
+            descriptor_str = descriptor_str.replace(
+                pubkey_provider.to_string(),
+                self._chain_pubkey_provider(pubkey_provider, chain_index).to_string(),
+            )
+        descriptor = bdk.Descriptor(descriptor_str, network=self.network)
+        self._descriptors[keychain] = descriptor
+        return descriptor
+
+    def _wallet(self, keychain: bdk.KeychainKind) -> bdk.Wallet:
+        wallet = self._wallets.get(keychain)
+        if wallet is None:
+            wallet = bdk.Wallet.create_single(
+                descriptor=self.chain_descriptor(keychain),
+                network=self.network,
+                persister=bdk.Persister.new_in_memory(),
+            )
+            self._wallets[keychain] = wallet
+        return wallet
+
+    def addresses(self, keychain: bdk.KeychainKind, start: int, stop: int) -> list[str]:
+        """The addresses with the indexes start, ..., stop - 1.
+
+        Ranges that start beyond the cached addresses are derived one by one and are not cached,
+        so that the addresses in between are not derived.
+        """
+        if stop <= start:
+            return []
+        with self._lock:
+            cached = self._addresses[keychain]
+            if start > len(cached):
+                descriptor = self.chain_descriptor(keychain)
+                return [str(descriptor.derive_address(index, self.network)) for index in range(start, stop)]
+
+            if stop > len(cached):
+                # the wallet only reveals the addresses beyond its internal index, which is len(cached) - 1,
+                # or lower after seed()
+                number_cached = len(cached)
+                address_infos = self._wallet(keychain).reveal_addresses_to(
+                    bdk.KeychainKind.EXTERNAL, stop - 1
+                )
+                cached += [
+                    str(address_info.address)
+                    for address_info in address_infos
+                    if address_info.index >= number_cached
+                ]
+                logger.debug(f"Derived {len(address_infos)} addresses of {keychain}")
+            return cached[start:stop]
+
+    def seed(self, keychain: bdk.KeychainKind, addresses: list[str]) -> None:
+        """Caches known addresses (from index 0 on) of the keychain, e.g. persisted ones, without deriving them.
+
+        Growing the cache beyond them still is 1 batch, in which the wallet reveals the seeded addresses too.
+        """
+        with self._lock:
+            if len(addresses) > len(self._addresses[keychain]):
+                self._addresses[keychain] = list(addresses)
+
+    def address(self, keychain: bdk.KeychainKind, index: int) -> str:
+        return self.addresses(keychain, index, index + 1)[0]
+
+    def receive_addresses(self, start: int, stop: int) -> list[str]:
+        return self.addresses(bdk.KeychainKind.EXTERNAL, start, stop)
+
+    def change_addresses(self, start: int, stop: int) -> list[str]:
+        return self.addresses(bdk.KeychainKind.INTERNAL, start, stop)
+
+    def number_cached(self, keychain: bdk.KeychainKind) -> int:
+        with self._lock:
+            return len(self._addresses[keychain])
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.descriptor_info.address_type.short_name}, {self.network})"
@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+import bdkpython as bdk
+
+from .address_generator import AddressGenerator
+from .address_types import DescriptorInfo, SimplePubKeyProvider
+
+logger = logging.getLogger(__name__)
+
+
+class AddressLocation:
+    def __init__(self, keychain: bdk.KeychainKind, index: int, bip32_paths: dict[str, str]) -> None:
+        self.keychain = keychain
+        self.index = index
+        # {fingerprint: full bip32 path of the key}, e.g. {"7C85F2B5": "m/84h/1h/0h/0/5"}
+        self.bip32_paths = bip32_paths
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.__dict__})"
+
+
+class AddressIndex:
+    """Maps the addresses (and scriptPubKeys) of a DescriptorInfo to their keychain and index.
+
+    The first lookahead receive and change addresses are indexed, and extend() only derives the
+    addresses beyond the current window.  Lookups are dictionary lookups.
+
+    If path is given, the addresses are persisted as a json file (only for the same descriptor and network).
+    Note: like xpubs, the addresses of a wallet are privacy sensitive.
+    """
+
+    version = 1
+    keychains = [bdk.KeychainKind.EXTERNAL, bdk.KeychainKind.INTERNAL]
+
+    def __init__(
+        self,
+        descriptor_info: DescriptorInfo,
+        network: bdk.Network,
+        lookahead: int = 1000,
+        path: Path | str | None = None,
+        address_generator: AddressGenerator | None = None,
+    ) -> None:
+        self.descriptor_info = descriptor_info
+        self.network = network
+        self.path = Path(path) if path else None
+        self.address_generator = (
+            address_generator if address_generator else AddressGenerator(descriptor_info, network)
+        )
+        self._descriptor_str = descriptor_info.get_descriptor_str(network)
+        # {keychain: addresses from index 0 on}
+        self._addresses: dict[bdk.KeychainKind, list[str]] = {keychain: [] for keychain in self.keychains}
+        # {address: (keychain, index)}
+        self._locations: dict[str, tuple[bdk.KeychainKind, int]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+        self.extend(lookahead)
+
+    @property
+    def lookahead(self) -> int:
+        with self._lock:
+            return min(len(addresses) for addresses in self._addresses.values())
+
+    def extend(self, lookahead: int) -> None:
+        "Indexes the receive and change addresses up to (excluding) the index lookahead"
+        with self._lock:
+            for keychain in self.keychains:
+                addresses = self._addresses[keychain]
+                if lookahead <= len(addresses):
+                    continue
+                new_addresses = self.address_generator.addresses(keychain, len(addresses), lookahead)
+                for index, address in enumerate(new_addresses, start=len(addresses)):
+                    self._locations[address] = (keychain, index)
+                addresses += new_addresses
+                self._dirty = True
+
+    def _normalize(self, address_or_script_pubkey: str | bytes) -> str | None:
+        try:
+            if isinstance(address_or_script_pubkey, bytes):
+                return str(bdk.Address.from_script(bdk.Script(address_or_script_pubkey), self.network))
+            return str(bdk.Address(address_or_script_pubkey.strip(), self.network))
+        except Exception as e:
+            logger.debug(f"{address_or_script_pubkey!r} is not an address of {self.network}: {e}")
+            return None
+
+    def lookup(self, address_or_script_pubkey: str | bytes) -> AddressLocation | None:
+        "The location of an address (or of a scriptPubKey given as bytes), if it is in the window"
+        address = self._normalize(address_or_script_pubkey)
+        if address is None:
+            return None
+        with self._lock:
+            location = self._locations.get(address)
+        if location is None:
+            return None
+        keychain, index = location
+        return AddressLocation(
+            keychain=keychain,
+            index=index,
+            bip32_paths={
+                spk_provider.fingerprint: spk_provider.get_address_bip32_path(keychain, index)
+                for spk_provider in self.descriptor_info.spk_providers
+            },
+        )
+
+    def __contains__(self, address_or_script_pubkey: str | bytes) -> bool:
+        return self.lookup(address_or_script_pubkey) is not None
+
+    def address_descriptor(self, location: AddressLocation) -> str:
+        "The descriptor of the single address, e.g. for USBGui.display_address"
+        derivation_path = f"/{AddressGenerator.chain_index(location.keychain)}/{location.index}"
+        return DescriptorInfo(
+            address_type=self.descriptor_info.address_type,
+            spk_providers=[
+                SimplePubKeyProvider(
+                    xpub=spk_provider.xpub,
+                    fingerprint=spk_provider.fingerprint,
+                    key_origin=spk_provider.key_origin,
+                    derivation_path=derivation_path,
+                )
+                for spk_provider in self.descriptor_info.spk_providers
+            ],
+            threshold=self.descriptor_info.threshold,
+        ).get_descriptor_str(self.network)
+
+    def flush(self) -> None:
+        "Writes the index to path, if anything changed"
+        with self._lock:
+            if not self._dirty or not self.path:
+                self._dirty = False
+                return
+            content = json.dumps(
+                {
+                    "version": self.version,
+                    "descriptor": self._descriptor_str,
+                    "network": self.network.name,
+                    "addresses": {
+                        str(AddressGenerator.chain_index(keychain)): addresses
+                        for keychain, addresses in self._addresses.items()
+                    },
+                }
+            )
+            self._dirty = False
+
+        # write atomically, such that a crash never leaves a half written file
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_text(content)
+        os.replace(tmp_path, self.path)
+
+    def _load(self) -> None:
+        if not self.path or not self.path.exists():
+            return
+        try:
+            content = json.loads(self.path.read_text())
+            if content.get("version") != self.version:
+                logger.warning(
+                    f"Ignoring {self.path}, because of the unknown version {content.get('version')}"
+                )
+                return
+            if content["descriptor"] != self._descriptor_str or content["network"] != self.network.name:
+                logger.warning(f"Ignoring {self.path}, because it belongs to another descriptor or network")
+                return
+            for keychain in self.keychains:
+                addresses = content["addresses"][str(AddressGenerator.chain_index(keychain))]
+                self._addresses[keychain] = addresses
+                for index, address in enumerate(addresses):
+                    self._locations[address] = (keychain, index)
+            for keychain in self.keychains:
+                # such that extend() derives only the addresses beyond the loaded ones, in 1 batch
+                self.address_generator.seed(keychain, self._addresses[keychain])
+        except Exception as e:
+            logger.warning(f"Could not load the address index {self.path}: {e}")
+            self._addresses = {keychain: [] for keychain in self.keychains}
+            self._locations = {}
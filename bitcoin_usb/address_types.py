@@ -1,5 +1,10 @@
+import functools
 import logging
-from collections.abc import Callable, Sequence
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable, Mapping, Sequence
+from types import MappingProxyType
+from typing import Any
 
 import bdkpython as bdk
 from hwilib.common import AddressType as HWIAddressType
@@ -48,10 +53,69 @@ class ConstDerivationPaths:
     multipath = "/<0;1>/*"
 
 
+class _Frozen:
+    """Base of the immutable value types, whose attributes are the __slots__ of the subclass.
+
+    The attributes are set once in __init__ (with _set_slots), afterwards they cannot be changed.
+    This makes the instances small, hashable and safe to share (e.g. by DescriptorInfoCache),
+    so copies are not needed.
+    """
+
+    __slots__: tuple[str, ...] = ()
+
+    def _set_slots(self, **values: Any) -> None:
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable, {name} cannot be set")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable, {name} cannot be deleted")
+
+    @property  # type: ignore[misc]
+    def __dict__(self) -> dict[str, Any]:  # type: ignore[override]
+        "A read-only view of the public attributes (there is no real __dict__), used by __repr__"
+        return {name: getattr(self, name) for name in self.__slots__ if not name.startswith("_")}
+
+    def __copy__(self) -> Any:
+        return self
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> Any:
+        return self
+
+
 # https://bitcoin.design/guide/glossary/address/
 # https://learnmeabitcoin.com/technical/derivation-paths
 # https://github.com/bitcoin/bips/blob/master/bip-0380.mediawiki
-class AddressType:
+class AddressType(_Frozen):
+    "Immutable. Compared by identity, all AddressTypes are module level instances"
+
+    __slots__ = (
+        "short_name",
+        "name",
+        "is_multisig",
+        "key_origin",
+        "bdk_descriptor_secret",
+        "info_url",
+        "description",
+        "bdk_descriptor",
+        "hwi_descriptor_classes",
+    )
+    short_name: str
+    name: str
+    is_multisig: bool
+    key_origin: Callable[[bdk.Network], str]
+    bdk_descriptor_secret: (
+        Callable[[bdk.DescriptorSecretKey, bdk.KeychainKind, bdk.Network], bdk.Descriptor] | None
+    )
+    info_url: str | None
+    description: str | None
+    bdk_descriptor: (
+        Callable[[bdk.DescriptorPublicKey, str, bdk.KeychainKind, bdk.Network], bdk.Descriptor] | None
+    )
+    hwi_descriptor_classes: tuple[type[Descriptor], ...]
+
     def __init__(
         self,
         short_name: str,
@@ -71,38 +135,41 @@ class AddressType:
         ]
         | None = None,
     ) -> None:
-        self.short_name = short_name
-        self.name = name
-        self.is_multisig = is_multisig
-        self.key_origin: Callable[[bdk.Network], str] = key_origin
-        self.bdk_descriptor_secret = bdk_descriptor_secret
-        self.info_url = info_url
-        self.description = description
-        self.bdk_descriptor = bdk_descriptor
-        self.hwi_descriptor_classes = hwi_descriptor_classes
-
-    def clone(self):
-        return AddressType(
-            short_name=self.short_name,
-            name=self.name,
-            is_multisig=self.is_multisig,
-            key_origin=self.key_origin,
-            bdk_descriptor_secret=self.bdk_descriptor_secret,
-            info_url=self.info_url,
-            description=self.description,
-            bdk_descriptor=self.bdk_descriptor,
-            hwi_descriptor_classes=self.hwi_descriptor_classes,
+        self._set_slots(
+            short_name=short_name,
+            name=name,
+            is_multisig=is_multisig,
+            key_origin=key_origin,
+            bdk_descriptor_secret=bdk_descriptor_secret,
+            info_url=info_url,
+            description=description,
+            bdk_descriptor=bdk_descriptor,
+            hwi_descriptor_classes=tuple(hwi_descriptor_classes),
         )
 
+    def clone(self) -> "AddressType":
+        "AddressType is immutable, so there is nothing to copy"
+        return self
+
     def __str__(self):
         return str(self.name)
 
     def __repr__(self):
         return f"AddressType({self.__dict__})"
 
+    def __reduce__(self) -> tuple[Any, ...]:
+        "Pickled by short_name, so only registered AddressTypes can be unpickled"
+        return (_registered_address_type, (self.short_name,))
+
     def get_bip32_path(self, network: bdk.Network, keychain: bdk.KeychainKind, address_index: int) -> str:
         return f"m/{0 if keychain == bdk.KeychainKind.EXTERNAL else 1}/{address_index}"
 
+    def key_origin_of_account(self, network: bdk.Network, account: int) -> str:
+        "Like key_origin, but with the account index replaced, e.g. m/84h/1h/{account}h"
+        indexes = parse_path(self.key_origin(network))
+        indexes[2] = account | HARDENED_FLAG
+        return SimplePubKeyProvider.key_origin_indexes_to_str(indexes)
+
 
 class AddressTypes:
     p2pkh = AddressType(
@@ -171,18 +238,131 @@ class AddressTypes:
     )
 
 
-def get_address_type_dicts() -> dict[str, AddressType]:
-    return {k: v for k, v in AddressTypes.__dict__.items() if (not k.startswith("_"))}
+class AddressTypeRegistry:
+    """The supported AddressTypes, indexed by short_name, by the chain of hwi descriptor classes
+    and by the purpose of the key origin (e.g. 84 for m/84h/0h/0h).
+
+    All lookups are dictionary lookups.  register adds new AddressTypes (e.g. a taproot multisig);
+    it replaces the indexes instead of changing them, so the returned mappings and tuples never change.
+    """
+
+    def __init__(self, address_types: Iterable[AddressType] = ()) -> None:
+        self._lock = threading.Lock()
+        self._address_types: tuple[AddressType, ...] = ()
+        # {short_name with "_" instead of "-": address_type}, the attribute names of AddressTypes
+        self._by_name: Mapping[str, AddressType] = MappingProxyType({})
+        self._by_short_name: Mapping[str, AddressType] = MappingProxyType({})
+        self._by_hwi_descriptor_classes: Mapping[tuple[type[Descriptor], ...], AddressType] = (
+            MappingProxyType({})
+        )
+        self._by_purpose: Mapping[int, tuple[AddressType, ...]] = MappingProxyType({})
+        for address_type in address_types:
+            self.register(address_type)
+
+    @staticmethod
+    def purpose(address_type: AddressType) -> int:
+        "The first index of the key origin, e.g. 48 for m/48h/0h/0h/2h"
+        return parse_path(address_type.key_origin(bdk.Network.BITCOIN))[0] & ~HARDENED_FLAG
+
+    def register(self, address_type: AddressType) -> None:
+        """Adds address_type to all indexes.
+
+        Raises:
+            ValueError: if the short_name or the hwi_descriptor_classes are already registered
+        """
+        with self._lock:
+            if address_type.short_name in self._by_short_name:
+                raise ValueError(f"An AddressType {address_type.short_name} is already registered")
+            existing = self._by_hwi_descriptor_classes.get(address_type.hwi_descriptor_classes)
+            if existing is not None:
+                raise ValueError(
+                    f"{address_type.short_name} has the same hwi_descriptor_classes as {existing.short_name}"
+                )
+
+            purpose = self.purpose(address_type)
+            self._address_types += (address_type,)
+            self._by_name = MappingProxyType(
+                {**self._by_name, address_type.short_name.replace("-", "_"): address_type}
+            )
+            self._by_short_name = MappingProxyType(
+                {**self._by_short_name, address_type.short_name: address_type}
+            )
+            self._by_hwi_descriptor_classes = MappingProxyType(
+                {**self._by_hwi_descriptor_classes, address_type.hwi_descriptor_classes: address_type}
+            )
+            self._by_purpose = MappingProxyType(
+                {**self._by_purpose, purpose: self._by_purpose.get(purpose, ()) + (address_type,)}
+            )
+
+    @property
+    def address_types(self) -> tuple[AddressType, ...]:
+        "In the order of registration"
+        return self._address_types
+
+    def as_dict(self) -> Mapping[str, AddressType]:
+        "{attribute name in AddressTypes: address_type}, e.g. {'p2sh_p2wpkh': AddressTypes.p2sh_p2wpkh, ...}"
+        return self._by_name
+
+    def by_short_name(self, short_name: str) -> AddressType | None:
+        return self._by_short_name.get(short_name)
+
+    def by_purpose(self, purpose: int) -> tuple[AddressType, ...]:
+        "e.g. by_purpose(48) == (AddressTypes.p2sh_p2wsh, AddressTypes.p2wsh)"
+        return self._by_purpose.get(purpose, ())
+
+    def by_hwi_descriptors(self, descriptors: Sequence[Descriptor]) -> AddressType | None:
+        "The AddressType of a linear chain of descriptors (see _get_descriptor_instances), e.g. [WSHDescriptor, SortedMultisigDescriptor]"
+        address_type = self._by_hwi_descriptor_classes.get(
+            tuple(type(descriptor) for descriptor in descriptors)
+        )
+        if address_type is not None:
+            return address_type
+        # subclasses of the hwi descriptor classes
+        return _find_matching_address_type(descriptors, self._address_types)
+
+    def __contains__(self, address_type: AddressType) -> bool:
+        return self._by_short_name.get(address_type.short_name) is address_type
+
+    def __len__(self) -> int:
+        return len(self._address_types)
+
+
+address_type_registry = AddressTypeRegistry(
+    [v for k, v in AddressTypes.__dict__.items() if not k.startswith("_")]
+)
+
+
+def _registered_address_type(short_name: str) -> AddressType:
+    address_type = address_type_registry.by_short_name(short_name)
+    if address_type is None:
+        raise ValueError(f"The AddressType {short_name} is not registered")
+    return address_type
+
+
+def get_address_type_dicts() -> Mapping[str, AddressType]:
+    return address_type_registry.as_dict()
 
 
 def get_all_address_types() -> list[AddressType]:
-    return list(get_address_type_dicts().values())
+    return list(address_type_registry.address_types)
 
 
 def get_address_types(is_multisig: bool) -> list[AddressType]:
     return [a for a in get_all_address_types() if a.is_multisig == is_multisig]
 
 
+def get_key_origins(
+    network: bdk.Network, accounts: Iterable[int] = (0,), address_types: Iterable[AddressType] | None = None
+) -> list[str]:
+    "The key origins of all accounts for all (or the given) address types"
+    address_types = get_all_address_types() if address_types is None else list(address_types)
+    return [
+        address_type.key_origin_of_account(network, account)
+        for account in accounts
+        for address_type in address_types
+    ]
+
+
 def get_hwi_address_type(address_type: AddressType) -> HWIAddressType:
     # see https://hwi.readthedocs.io/en/latest/usage/api-usage.html#hwilib.common.AddressType
     if address_type.name in [AddressTypes.p2pkh.name]:
@@ -204,7 +384,26 @@ def get_hwi_address_type(address_type: AddressType) -> HWIAddressType:
     )
 
 
-class SimplePubKeyProvider:
+@functools.lru_cache(maxsize=4096)
+def _validated_xpub(xpub: str) -> str:
+    "Cached, because the deserialization is the slowest part of SimplePubKeyProvider.__init__"
+    if ExtendedKey.deserialize(xpub).to_string() != xpub:
+        raise ValueError(f"xpub {xpub} changed during deserialize/serialize!")
+    # the same xpub is validated many times (e.g. a cosigner in many descriptors).
+    # Returning the cached string lets all SimplePubKeyProviders share it.
+    return xpub
+
+
+class SimplePubKeyProvider(_Frozen):
+    "Immutable and hashable. Equal if xpub, fingerprint, key_origin and derivation_path are equal"
+
+    __slots__ = ("xpub", "fingerprint", "key_origin", "derivation_path", "_hash")
+    xpub: str
+    fingerprint: str
+    key_origin: str
+    derivation_path: str
+    _hash: int
+
     def __init__(
         self,
         xpub: str,
@@ -224,16 +423,35 @@ class SimplePubKeyProvider:
         Raises:
             ValueError: _description_
         """
-        xpub = xpub.strip()
-        self.xpub = ExtendedKey.deserialize(xpub).to_string()
-        if self.xpub != xpub:
-            raise ValueError(f"xpub {xpub} changed during deserialize/serialize!")
-
-        self.fingerprint = self.format_fingerprint(fingerprint)
+        xpub = _validated_xpub(xpub.strip())
+        fingerprint = self.format_fingerprint(fingerprint)
         # key_origin example: "m/84h/1h/0h"
-        self.key_origin = self.format_key_origin(key_origin)
+        key_origin = _formatted_key_origin(key_origin)
         # derivation_path example "/0/*"
-        self.derivation_path = self.format_derivation_path(derivation_path)
+        derivation_path = self.format_derivation_path(derivation_path)
+        self._set_slots(
+            xpub=xpub,
+            fingerprint=fingerprint,
+            key_origin=key_origin,
+            derivation_path=derivation_path,
+            _hash=hash((xpub, fingerprint, key_origin, derivation_path)),
+        )
+
+    def _key(self) -> tuple[str, str, str, str]:
+        return (self.xpub, self.fingerprint, self.key_origin, self.derivation_path)
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, SimplePubKeyProvider):
+            return NotImplemented
+        return self._hash == other._hash and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (self.__class__, self._key())
 
     @classmethod
     def format_derivation_path(cls, value: str) -> str:
@@ -356,7 +574,8 @@ class SimplePubKeyProvider:
         return value.upper()
 
     def clone(self) -> "SimplePubKeyProvider":
-        return SimplePubKeyProvider(self.xpub, self.fingerprint, self.key_origin, self.derivation_path)
+        "SimplePubKeyProvider is immutable, so there is nothing to copy"
+        return self
 
     def is_testnet(self):
         network_str = self.key_origin.split("/")[2]
@@ -416,6 +635,11 @@ class SimplePubKeyProvider:
         return f"{self.key_origin}/{0 if kind == bdk.KeychainKind.EXTERNAL else 1}/{index}"
 
 
+@functools.lru_cache(maxsize=4096)
+def _formatted_key_origin(key_origin: str) -> str:
+    return SimplePubKeyProvider.format_key_origin(key_origin)
+
+
 def _get_descriptor_instances(descriptor: Descriptor) -> list[Descriptor]:
     """
     Returns the linear chain of chained descriptors, and converts MultisigDescriptor into SortedMultisigDescriptor if possible.
@@ -447,7 +671,7 @@ def _get_descriptor_instances(descriptor: Descriptor) -> list[Descriptor]:
 
 
 def _find_matching_address_type(
-    descriptor_tuple: list[Descriptor], address_types: list[AddressType]
+    descriptor_tuple: Sequence[Descriptor], address_types: Iterable[AddressType]
 ) -> AddressType | None:
     for address_type in address_types:
         if len(descriptor_tuple) == len(address_type.hwi_descriptor_classes) and all(
@@ -458,23 +682,61 @@ def _find_matching_address_type(
     return None
 
 
-class DescriptorInfo:
+class DescriptorInfo(_Frozen):
+    """Immutable and hashable.
+
+    Equal if the address_type (the same instance), the spk_providers (in the same order)
+    and the threshold are equal.
+    """
+
+    __slots__ = ("address_type", "spk_providers", "threshold", "_hash")
+    address_type: AddressType
+    spk_providers: tuple[SimplePubKeyProvider, ...]
+    threshold: int
+    _hash: int
+
     def __init__(
         self,
         address_type: AddressType,
-        spk_providers: list[SimplePubKeyProvider],
+        spk_providers: Sequence[SimplePubKeyProvider],
         threshold=1,
     ) -> None:
-        self.address_type: AddressType = address_type
-        self.spk_providers: list[SimplePubKeyProvider] = spk_providers
-        self.threshold: int = threshold
-
-        if not self.address_type.is_multisig:
+        spk_providers = tuple(spk_providers)
+        if not address_type.is_multisig:
             assert len(spk_providers) <= 1
 
+        self._set_slots(
+            address_type=address_type,
+            spk_providers=spk_providers,
+            threshold=threshold,
+            _hash=hash((address_type, spk_providers, threshold)),
+        )
+
     def __repr__(self) -> str:
         return f"{self.__dict__}"
 
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, DescriptorInfo):
+            return NotImplemented
+        return (
+            self._hash == other._hash
+            and self.address_type is other.address_type
+            and self.threshold == other.threshold
+            and self.spk_providers == other.spk_providers
+        )
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (self.__class__, (self.address_type, self.spk_providers, self.threshold))
+
+    def clone(self) -> "DescriptorInfo":
+        "DescriptorInfo is immutable, so there is nothing to copy"
+        return self
+
     def get_hwi_descriptor(self, network: bdk.Network):
         # check that the key_origins of the spk_providers are matching the desired output address_type
         for spk_provider in self.spk_providers:
@@ -501,17 +763,22 @@ class DescriptorInfo:
 
         return hwi_descriptor
 
-    def get_descriptor_str(self, network: bdk.Network, hardened_char="h"):
+    def get_descriptor_str(
+        self, network: bdk.Network, hardened_char="h", cache: "DescriptorInfoCache | None" = None
+    ):
+        if cache is not None:
+            return cache.get_descriptor_str(self, network, hardened_char=hardened_char)
         return self.get_hwi_descriptor(network).to_string(hardened_char=hardened_char)
 
     @classmethod
-    def from_str(cls, descriptor_str: str) -> "DescriptorInfo":
+    def from_str(cls, descriptor_str: str, cache: "DescriptorInfoCache | None" = None) -> "DescriptorInfo":
         """
         Requres the descriptor_str to be a nested chain of descriptors, that have at most 1 branch
         If there are more than 1 subdescriptors (branches), it will raise an Exception
 
         Args:
             descriptor_str (str): _description_
+            cache (DescriptorInfoCache | None): If given, the parse result is memoised
 
         Raises:
             ValueError: _description_
@@ -519,11 +786,14 @@ class DescriptorInfo:
         Returns:
             DescriptorInfo: _description_
         """
+        if cache is not None:
+            return cache.from_str(descriptor_str)
+
         hwi_descriptor = parse_descriptor(descriptor_str)
         linear_chain_descriptors = _get_descriptor_instances(hwi_descriptor)
 
         # first we need to identify the address type
-        address_type = _find_matching_address_type(linear_chain_descriptors, get_all_address_types())
+        address_type = address_type_registry.by_hwi_descriptors(linear_chain_descriptors)
         if not address_type:
             supported_types = [address_type.short_name for address_type in get_all_address_types()]
             raise ValueError(
@@ -546,3 +816,65 @@ class DescriptorInfo:
             ],
             threshold=threshold,
         )
+
+
+class DescriptorInfoCache:
+    """Memoises DescriptorInfo.from_str and DescriptorInfo.get_descriptor_str for the last maxsize inputs.
+
+    Opt-in: pass it as cache to these methods (or as descriptor_cache to USBDevice, USBGui, SoftwareSigner).
+    from_str returns the cached DescriptorInfo itself, which is safe to share, because it is immutable.
+    """
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._infos: OrderedDict[str, DescriptorInfo] = OrderedDict()
+        self._descriptor_strs: OrderedDict[tuple[Hashable, ...], str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, entries: "OrderedDict[Any, Any]", key: Hashable) -> Any:
+        with self._lock:
+            value = entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entries.move_to_end(key)
+            return value
+
+    def _set(self, entries: "OrderedDict[Any, Any]", key: Hashable, value: Any) -> None:
+        with self._lock:
+            entries[key] = value
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+
+    def from_str(self, descriptor_str: str) -> DescriptorInfo:
+        key = "".join(descriptor_str.split())
+        info: DescriptorInfo | None = self._get(self._infos, key)
+        if info is None:
+            info = DescriptorInfo.from_str(descriptor_str)
+            self._set(self._infos, key, info)
+        return info
+
+    def get_descriptor_str(
+        self, descriptor_info: DescriptorInfo, network: bdk.Network, hardened_char="h"
+    ) -> str:
+        # DescriptorInfo is hashable (with a precomputed hash), so the key is cheap
+        key = (descriptor_info, network.name, hardened_char)
+        descriptor_str: str | None = self._get(self._descriptor_strs, key)
+        if descriptor_str is None:
+            descriptor_str = descriptor_info.get_descriptor_str(network, hardened_char=hardened_char)
+            self._set(self._descriptor_strs, key, descriptor_str)
+        return descriptor_str
+
+    def clear(self) -> None:
+        with self._lock:
+            self._infos.clear()
+            self._descriptor_strs.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._infos) + len(self._descriptor_strs)
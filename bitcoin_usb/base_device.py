@@ -0,0 +1,49 @@
+import logging
+from abc import abstractmethod
+
+import bdkpython as bdk
+from hwilib.common import Chain
+
+from .address_types import AddressType
+
+logger = logging.getLogger(__name__)
+
+
+def bdknetwork_to_chain(network: bdk.Network):
+    if network == bdk.Network.BITCOIN:
+        return Chain.MAIN
+    elif network == bdk.Network.REGTEST:
+        return Chain.REGTEST
+    elif network == bdk.Network.SIGNET:
+        return Chain.SIGNET
+    elif network in [bdk.Network.TESTNET, bdk.Network.TESTNET4]:
+        return Chain.TEST
+    raise ValueError(f"Could not convert the {network=}")
+
+
+class BaseDevice:
+    def __init__(self, network: bdk.Network) -> None:
+        self.network = network
+
+    @abstractmethod
+    def get_fingerprint(self) -> str:
+        pass
+
+    @abstractmethod
+    def get_xpubs(self) -> dict[AddressType, str]:
+        pass
+
+    @abstractmethod
+    def sign_psbt(self, psbt: bdk.Psbt) -> bdk.Psbt | None:
+        pass
+
+    @abstractmethod
+    def sign_message(self, message: str, bip32_path: str) -> str:
+        pass
+
+    @abstractmethod
+    def display_address(
+        self,
+        address_descriptor: str,
+    ) -> str:
+        pass
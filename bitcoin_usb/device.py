@@ -1,20 +1,19 @@
 import logging
 import threading
-from abc import abstractmethod
-from collections.abc import Callable
+import time
+from collections.abc import Callable, Iterable, Iterator
 from pathlib import Path
 from typing import Any
 
 import bdkpython as bdk
 import hwilib.commands as hwi_commands
 from bitcoin_safe_lib.async_tools.loop_in_thread import LoopInThread
-from hwilib.common import Chain
 from hwilib.devices.bitbox02 import Bitbox02Client, CLINoiseConfig
 from hwilib.devices.bitbox02_lib import bitbox02
 from hwilib.devices.bitbox02_lib.communication import devices as bitbox02devices
 from hwilib.devices.trezor import TrezorClient
+from hwilib.errors import ActionCanceledError
 from hwilib.hwwclient import HardwareWalletClient
-from hwilib.psbt import PSBT
 from PyQt6.QtCore import QEventLoop, QObject, Qt, QThread, pyqtSignal
 from PyQt6.QtWidgets import (
     QDialog,
@@ -27,15 +26,27 @@ from PyQt6.QtWidgets import (
 
 from bitcoin_usb.dialogs import Worker
 from bitcoin_usb.i18n import translate
+from bitcoin_usb.session_pool import DeviceSessionPool
 from bitcoin_usb.util import run_device_task, run_script
+from bitcoin_usb.xpub_cache import XpubCache
 
 from .address_types import (
     AddressType,
     DescriptorInfo,
+    DescriptorInfoCache,
+    SimplePubKeyProvider,
     SortedMultisigDescriptor,
     get_all_address_types,
     get_hwi_address_type,
 )
+from .base_device import BaseDevice, bdknetwork_to_chain
+from .psbt_tools import (
+    SlimmingReport,
+    hwi_psbt_from_bdk,
+    merge_hwi_signatures,
+    slim_hwi_psbt,
+    strip_hwi_psbt,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -158,44 +169,19 @@ class ThreadedCapturePrintDialogBitBox02(QDialog):
             self._thread.wait()
 
 
-def bdknetwork_to_chain(network: bdk.Network):
-    if network == bdk.Network.BITCOIN:
-        return Chain.MAIN
-    elif network == bdk.Network.REGTEST:
-        return Chain.REGTEST
-    elif network == bdk.Network.SIGNET:
-        return Chain.SIGNET
-    elif network in [bdk.Network.TESTNET, bdk.Network.TESTNET4]:
-        return Chain.TEST
-    raise ValueError(f"Could not convert the {network=}")
-
-
-class BaseDevice:
-    def __init__(self, network: bdk.Network) -> None:
-        self.network = network
-
-    @abstractmethod
-    def get_fingerprint(self) -> str:
-        pass
-
-    @abstractmethod
-    def get_xpubs(self) -> dict[AddressType, str]:
-        pass
-
-    @abstractmethod
-    def sign_psbt(self, psbt: bdk.Psbt) -> bdk.Psbt | None:
-        pass
+class XpubBatchResult:
+    def __init__(self) -> None:
+        # key_origin: xpub   (in the order of the requested key_origins)
+        self.xpubs: dict[str, str] = {}
+        # key_origin: seconds the device needed for this key_origin
+        self.timings: dict[str, float] = {}
 
-    @abstractmethod
-    def sign_message(self, message: str, bip32_path: str) -> str:
-        pass
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.timings.values())
 
-    @abstractmethod
-    def display_address(
-        self,
-        address_descriptor: str,
-    ) -> str:
-        pass
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.__dict__})"
 
 
 class DialogNoiseConfig(CLINoiseConfig):
@@ -235,6 +221,11 @@ class USBDevice(BaseDevice, QObject):
         network: bdk.Network,
         loop_in_thread: LoopInThread | None = None,
         initalization_label: str = "",
+        session_pool: DeviceSessionPool | None = None,
+        xpub_cache: XpubCache | None = None,
+        slim_psbts: bool = True,
+        descriptor_cache: DescriptorInfoCache | None = None,
+        slimming_reports: bool = False,
     ):
         QObject.__init__(self)
         BaseDevice.__init__(self, network=network)
@@ -242,6 +233,19 @@ class USBDevice(BaseDevice, QObject):
         self.selected_device = selected_device
         self.lock = threading.Lock()
         self.loop_in_thread = loop_in_thread
+        self.session_pool = session_pool
+        # set to False if the client must not be reused after this session (e.g. after a wipe)
+        self.keep_session = True
+        self.xpub_cache = xpub_cache
+        # the fingerprint and the cache spot check are only valid for the current client
+        self._fingerprint: str | None = None
+        self._xpub_cache_verified = False
+        # send only the data to the device, that it needs for signing (see slim_hwi_psbt)
+        self.slim_psbts = slim_psbts
+        # measuring the slimming costs 2 extra serializations per psbt, so it is opt-in
+        self.slimming_reports = slimming_reports
+        self.last_slimming_report: SlimmingReport | None = None
+        self.descriptor_cache = descriptor_cache
         self.client: HardwareWalletClient | None = None
 
     @staticmethod
@@ -284,11 +288,24 @@ class USBDevice(BaseDevice, QObject):
         return False
 
     def _init_client(self):
-        self.client = hwi_commands.get_client(
+        if self.session_pool is not None:
+            self.client = self.session_pool.acquire(
+                self.selected_device,
+                chain=bdknetwork_to_chain(self.network),
+                factory=self._create_client,
+            )
+        else:
+            self.client = self._create_client()
+
+    def _create_client(self) -> HardwareWalletClient:
+        client = hwi_commands.get_client(
             device_type=self.selected_device["type"],
             device_path=self.selected_device["path"],
             chain=bdknetwork_to_chain(self.network),
         )
+        if client is None:
+            raise Exception(f"Could not connect to the device {self.selected_device['type']}")
+        self.client = client
 
         if isinstance(self.client, TrezorClient):
             self.client.client.refresh_features()
@@ -334,6 +351,8 @@ class USBDevice(BaseDevice, QObject):
                     self.client.setup_device(label=self.initalization_label)
                     self.write_down_seed_ask_until_success(self.client)
 
+        return client
+
     def __enter__(self):
         self.lock.acquire()
         try:
@@ -346,7 +365,19 @@ class USBDevice(BaseDevice, QObject):
 
     def __exit__(self, exc_type, exc_value, traceback):
         if self.client:
-            self.client.close()
+            if self.session_pool is not None:
+                self.session_pool.release(
+                    self.selected_device,
+                    self.client,
+                    healthy=exc_type is None and self.keep_session,
+                )
+            else:
+                self.client.close()
+            self.client = None
+        self._fingerprint = None
+        self._xpub_cache_verified = False
+        if self.xpub_cache is not None:
+            self.xpub_cache.flush()
         self.lock.release()
         # Handle exceptions if necessary
         if exc_type is not None:
@@ -354,31 +385,103 @@ class USBDevice(BaseDevice, QObject):
 
     def wipe_device(self) -> bool:
         assert self.client
+        # the device needs a full re-initialization after a wipe
+        self.keep_session = False
+        if self.xpub_cache is not None:
+            try:
+                self.xpub_cache.invalidate(self.get_fingerprint())
+            except Exception as e:
+                # an uninitialized device has no fingerprint (and no cached xpubs)
+                logger.debug(f"Could not invalidate the xpub cache: {e}")
+        self._fingerprint = None
         return self.client.wipe_device()
 
     def get_fingerprint(self) -> str:
         assert self.client
-        return self.client.get_master_fingerprint().hex()
+        if self._fingerprint is None:
+            self._fingerprint = self.client.get_master_fingerprint().hex()
+        return self._fingerprint
 
     def get_xpubs(self) -> dict[AddressType, str]:
-        xpubs = {}
-        for address_type in get_all_address_types():
-            xpubs[address_type] = self.get_xpub(address_type.key_origin(self.network))
-        return xpubs
+        key_origins = {
+            address_type: address_type.key_origin(self.network) for address_type in get_all_address_types()
+        }
+        result = self.get_xpubs_batch(key_origins.values())
+        return {address_type: result.xpubs[key_origin] for address_type, key_origin in key_origins.items()}
+
+    def get_xpubs_batch(self, key_origins: Iterable[str]) -> XpubBatchResult:
+        """Retrieves the xpubs of all key_origins within the current session.
+
+        The key_origins are normalized (hardened char "h") and duplicates are requested only once.
+        HWI clients are strictly request/response, so the requests are sent one after another,
+        but without re-initializing the client in between.
+        """
+        assert self.client
+        result = XpubBatchResult()
+        for key_origin in key_origins:
+            key_origin = SimplePubKeyProvider.format_key_origin(key_origin)
+            if key_origin in result.xpubs:
+                continue
+            start = time.perf_counter()
+            result.xpubs[key_origin] = self.get_xpub(key_origin)
+            result.timings[key_origin] = time.perf_counter() - start
+        logger.debug(f"Retrieved {len(result.xpubs)} xpubs in {result.total_seconds:.3f}s")
+        return result
 
     def get_xpub(self, key_origin: str) -> str:
         assert self.client
-        return self.client.get_pubkey_at_path(key_origin).to_string()
+        if self.xpub_cache is None:
+            return self.client.get_pubkey_at_path(key_origin).to_string()
+
+        fingerprint = self.get_fingerprint()
+        cached_xpub = self.xpub_cache.get(fingerprint, key_origin, self.network)
+        if cached_xpub and self._xpub_cache_verified:
+            return cached_xpub
+
+        xpub = self.client.get_pubkey_at_path(key_origin).to_string()
+        if cached_xpub:
+            # the first cache hit of a session is checked against the device.
+            # A different xpub means the seed behind the fingerprint changed (or a passphrase collision)
+            if cached_xpub != xpub:
+                logger.warning(f"Cached xpub for {fingerprint} {key_origin} is outdated. Clearing the cache.")
+                self.xpub_cache.invalidate(fingerprint)
+            else:
+                self._xpub_cache_verified = True
+        self.xpub_cache.set(fingerprint, key_origin, self.network, xpub)
+        return xpub
 
     def sign_psbt(self, psbt: bdk.Psbt) -> bdk.Psbt:
         "Returns a signed psbt. However it still needs to be finalized by  a bdk wallet"
         assert self.client
-        hwi_psbt = PSBT()
-        hwi_psbt.deserialize(psbt.serialize())
+        hwi_psbt = hwi_psbt_from_bdk(psbt)
+        if self.slim_psbts and self.slimming_reports:
+            self.last_slimming_report = slim_hwi_psbt(hwi_psbt, fingerprint=self.get_fingerprint())
+            logger.debug(
+                f"Slimmed the psbt by {self.last_slimming_report.bytes_saved} bytes, "
+                f"saving ~{self.last_slimming_report.transfer_seconds_saved():.2f}s of transfer"
+            )
+        elif self.slim_psbts:
+            strip_hwi_psbt(hwi_psbt, fingerprint=self.get_fingerprint())
 
         signed_hwi_psbt = self.client.sign_tx(hwi_psbt)
+        return merge_hwi_signatures(psbt, signed_hwi_psbt, complete=not self.slim_psbts)
+
+    def sign_many(self, psbts: Iterable[bdk.Psbt]) -> Iterator[bdk.Psbt]:
+        """Signs the psbts one after another within the current session and yields each signed psbt
+        as soon as the device returns it.
 
-        return bdk.Psbt(signed_hwi_psbt.serialize())
+        If the user rejects a psbt on the device, the iteration stops (the remaining psbts are not
+        sent to the device).  The number of yielded psbts tells which were signed.
+        Other errors are raised.
+        """
+        assert self.client
+        for i, psbt in enumerate(psbts):
+            try:
+                signed_psbt = self.sign_psbt(psbt)
+            except ActionCanceledError:
+                logger.info(f"The user rejected psbt {i}. Stopping the batch after {i} signed psbts")
+                return
+            yield signed_psbt
 
     def sign_message(self, message: str, bip32_path: str) -> str:
         assert self.client
@@ -390,7 +493,7 @@ class USBDevice(BaseDevice, QObject):
     ) -> str:
         "Requires to have 1 derivation_path, like '/0/0', not '/<0;1>/*', and not '/0/*'"
         assert self.client
-        desc_infos = DescriptorInfo.from_str(address_descriptor)
+        desc_infos = DescriptorInfo.from_str(address_descriptor, cache=self.descriptor_cache)
 
         if desc_infos.address_type.is_multisig:
             pubkey_providers = [
@@ -0,0 +1,175 @@
+import logging
+from collections.abc import Callable
+from typing import Any
+
+from hwilib.devices import keepkey, ledger
+from hwilib.devices.bitbox02_lib.communication import devices as bitbox02_devices
+from hwilib.devices.ckcc.client import CKCC_PID, COINKITE_VID
+from hwilib.devices.digitalbitbox import DBB_DEVICE_ID, DBB_VENDOR_ID
+from hwilib.devices.jadepy.jade_serial import JadeSerialImpl
+from hwilib.devices.trezorlib.transport import DEV_TREZOR1, TREZORS
+
+logger = logging.getLogger(__name__)
+
+
+# a hidapi device info dict, like returned by hid.enumerate()
+HidDeviceInfo = dict[str, Any]
+# (vendor_id, product_id, path)
+UsbDeviceId = tuple[int, int, str]
+
+
+# the ids of the hwilib drivers, such that the classification matches hwi_commands.enumerate
+LEDGER_MODEL_IDS = ledger.LEDGER_MODEL_IDS
+LEDGER_LEGACY_PRODUCT_IDS = ledger.LEDGER_LEGACY_PRODUCT_IDS
+
+BITBOX02_PRODUCT_IDS = (0x2402, 0x2403)
+BITBOX02_MODELS = {
+    bitbox02_devices.BITBOX02MULTI: "bitbox02_multi",
+    bitbox02_devices.BITBOX02BTC: "bitbox02_btconly",
+    bitbox02_devices.BITBOX02PLUS_MULTI: "bitbox02_nova_multi",
+    bitbox02_devices.BITBOX02PLUS_BTC: "bitbox02_nova_btconly",
+}
+# the digital bitbox shares the product id with BitBox02 development bootloaders
+DIGITALBITBOX_PRODUCT_STRING = "digital bitbox"
+
+TREZOR_ONE_HID_ID = DEV_TREZOR1
+TREZOR_WEBUSB_IDS = TREZORS - {DEV_TREZOR1}  # incl. bootloader
+KEEPKEY_HID_IDS = keepkey.KEEPKEY_HID_IDS
+KEEPKEY_WEBUSB_IDS = keepkey.KEEPKEY_WEBUSB_IDS
+
+JADE_SERIAL_IDS = set(JadeSerialImpl.JADE_DEVICE_IDS)
+
+
+def _hid_enumerate() -> list[HidDeviceInfo]:
+    import hid
+
+    return hid.enumerate(0, 0)
+
+
+def _webusb_enumerate() -> list[UsbDeviceId]:
+    from hwilib.devices.trezorlib.transport.webusb import WebUsbTransport
+
+    result: list[UsbDeviceId] = []
+    for transport in WebUsbTransport.enumerate(usb_ids=TREZOR_WEBUSB_IDS | KEEPKEY_WEBUSB_IDS):
+        usb_device: Any = transport.device
+        result.append((usb_device.getVendorID(), usb_device.getProductID(), transport.get_path()))
+    return result
+
+
+def _serial_enumerate() -> list[UsbDeviceId]:
+    from serial.tools import list_ports
+
+    return [(port.vid, port.pid, port.device) for port in list_ports.comports() if port.vid and port.pid]
+
+
+def _device_entry(device_type: str, path: str, model: str) -> dict[str, Any]:
+    return {
+        "type": device_type,
+        "path": path,
+        "model": model,
+        "label": None,
+        "needs_pin_sent": False,
+        "needs_passphrase_sent": False,
+    }
+
+
+class DeviceEnumerator:
+    """Lists the connected hardware wallets without opening them.
+
+    The devices are classified by their USB vendor/product ids (the same ids the hwilib drivers use),
+    which requires 1 scan of the HID bus, plus 1 libusb scan (Trezor T/Safe and Keepkey use WebUSB)
+    and 1 serial port listing (Jade is a serial device).
+    The returned "type" and "path" are identical to hwi_commands.enumerate,
+    such that hwi_commands.get_client can open the device.
+
+    The scan functions can be replaced, e.g. with a fake HID backend for testing.
+    """
+
+    def __init__(
+        self,
+        hid_enumerate: Callable[[], list[HidDeviceInfo]] = _hid_enumerate,
+        webusb_enumerate: Callable[[], list[UsbDeviceId]] | None = _webusb_enumerate,
+        serial_enumerate: Callable[[], list[UsbDeviceId]] | None = _serial_enumerate,
+    ) -> None:
+        self.hid_enumerate = hid_enumerate
+        self.webusb_enumerate = webusb_enumerate
+        self.serial_enumerate = serial_enumerate
+
+    def enumerate(self) -> list[dict[str, Any]]:
+        devices: list[dict[str, Any]] = []
+
+        for info in self._scan(self.hid_enumerate):
+            device = self.classify_hid(info)
+            if device:
+                devices.append(device)
+
+        if self.webusb_enumerate:
+            for vendor_id, product_id, path in self._scan(self.webusb_enumerate):
+                device = self.classify_webusb(vendor_id, product_id, path)
+                if device:
+                    devices.append(device)
+
+        if self.serial_enumerate:
+            for vendor_id, product_id, path in self._scan(self.serial_enumerate):
+                if (vendor_id, product_id) in JADE_SERIAL_IDS:
+                    devices.append(_device_entry("jade", path, "jade"))
+
+        return devices
+
+    @staticmethod
+    def _scan(scan: Callable[[], list[Any]]) -> list[Any]:
+        try:
+            return scan()
+        except Exception as e:
+            # e.g. libusb is not installed
+            logger.debug(f"{scan} failed: {e}")
+            return []
+
+    @staticmethod
+    def classify_hid(info: HidDeviceInfo) -> dict[str, Any] | None:
+        vendor_id = info.get("vendor_id")
+        product_id = info.get("product_id", 0)
+        usage_page = info.get("usage_page")
+        interface_number = info.get("interface_number")
+        raw_path = info.get("path", b"")
+        path = raw_path.decode() if isinstance(raw_path, bytes) else str(raw_path)
+
+        if (vendor_id, product_id) == (COINKITE_VID, CKCC_PID):
+            return _device_entry("coldcard", path, "coldcard")
+
+        if vendor_id == ledger.LEDGER_VENDOR_ID:
+            if not (interface_number == 0 or usage_page == 0xFFA0):
+                return None
+            model = LEDGER_MODEL_IDS.get(product_id >> 8) or LEDGER_LEGACY_PRODUCT_IDS.get(product_id)
+            if not model:
+                return None
+            return _device_entry("ledger", path, model)
+
+        if vendor_id == DBB_VENDOR_ID:
+            if not (interface_number == 0 or usage_page == 0xFFFF):
+                return None
+            product_string = info.get("product_string") or ""
+            if product_id in BITBOX02_PRODUCT_IDS and product_string in BITBOX02_MODELS:
+                return _device_entry("bitbox02", path, BITBOX02_MODELS[product_string])
+            if product_id == DBB_DEVICE_ID and product_string.lower() == DIGITALBITBOX_PRODUCT_STRING:
+                return _device_entry("digitalbitbox", path, "digitalbitbox_01")
+            # e.g. a BitBox02 bootloader
+            return None
+
+        # trezorlib prefixes the hid path
+        is_wirelink = usage_page == 0xFF00 or interface_number == 0
+        if (vendor_id, product_id) == TREZOR_ONE_HID_ID and is_wirelink:
+            return _device_entry("trezor", f"hid:{path}", "trezor_1")
+        if (vendor_id, product_id) in KEEPKEY_HID_IDS and is_wirelink:
+            return _device_entry("keepkey", f"hid:{path}", "keepkey")
+
+        return None
+
+    @staticmethod
+    def classify_webusb(vendor_id: int, product_id: int, path: str) -> dict[str, Any] | None:
+        if (vendor_id, product_id) in TREZOR_WEBUSB_IDS:
+            # the exact model is only known after reading the features from the device
+            return _device_entry("trezor", path, "trezor")
+        if (vendor_id, product_id) in KEEPKEY_WEBUSB_IDS:
+            return _device_entry("keepkey", path, "keepkey")
+        return None
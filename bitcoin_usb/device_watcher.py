@@ -0,0 +1,273 @@
+import asyncio
+import inspect
+import logging
+import platform
+import select
+import socket
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from typing import Any
+
+from .device_enumerator import DeviceEnumerator
+
+logger = logging.getLogger(__name__)
+
+
+# (added, removed, devices)
+DevicesChangedCallback = Callable[[list[dict[str, Any]], list[dict[str, Any]], list[dict[str, Any]]], Any]
+
+# see linux/netlink.h
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_KERNEL_GROUP = 1
+# the subsystems in which hardware wallets appear
+UEVENT_SUBSYSTEMS = {"usb", "hidraw", "tty"}
+UEVENT_ACTIONS = {"add", "remove"}
+
+
+def device_key(device: dict[str, Any]) -> tuple[str, str]:
+    return (str(device.get("type")), str(device.get("path")))
+
+
+def parse_uevent(data: bytes) -> dict[str, str] | None:
+    """Parses a kernel uevent message  "ACTION@DEVPATH\\0KEY=VALUE\\0...".
+
+    Returns None for messages that are not kernel uevents (e.g. the ones of udevd).
+    """
+    parts = data.split(b"\0")
+    if not parts or b"@" not in parts[0]:
+        return None
+    properties: dict[str, str] = {}
+    for part in parts[1:]:
+        key, sep, value = part.partition(b"=")
+        if sep:
+            properties[key.decode(errors="replace")] = value.decode(errors="replace")
+    return properties
+
+
+class DeviceEventSource(ABC):
+    """Calls on_event, whenever the connected devices might have changed.
+
+    on_event is called from a background thread.
+    """
+
+    @abstractmethod
+    def start(self, on_event: Callable[[], None]) -> None:
+        pass
+
+    @abstractmethod
+    def stop(self) -> None:
+        pass
+
+
+class PollingEventSource(DeviceEventSource):
+    "Fallback for systems without hotplug events: triggers a re-enumeration every interval seconds"
+
+    def __init__(self, interval: float = 2) -> None:
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self, on_event: Callable[[], None]) -> None:
+        self._stop_event.clear()
+
+        def run() -> None:
+            while not self._stop_event.wait(self.interval):
+                on_event()
+
+        self._thread = threading.Thread(target=run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+
+class NetlinkEventSource(DeviceEventSource):
+    """Listens to the add/remove uevents of the linux kernel.
+
+    This needs no privileges and no libudev.
+    """
+
+    def __init__(self, stop_check_interval: float = 0.5) -> None:
+        self.stop_check_interval = stop_check_interval
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._socket: socket.socket | None = None
+
+    @staticmethod
+    def is_available() -> bool:
+        return platform.system() == "Linux" and hasattr(socket, "AF_NETLINK")
+
+    @staticmethod
+    def is_relevant(uevent: dict[str, str]) -> bool:
+        return uevent.get("ACTION") in UEVENT_ACTIONS and uevent.get("SUBSYSTEM") in UEVENT_SUBSYSTEMS
+
+    def start(self, on_event: Callable[[], None]) -> None:
+        # raises OSError if netlink is not permitted (e.g. in some containers)
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        sock.bind((0, UEVENT_KERNEL_GROUP))
+        self._socket = sock
+        self._stop_event.clear()
+
+        def run() -> None:
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([sock], [], [], self.stop_check_interval)
+                if not readable:
+                    continue
+                try:
+                    data = sock.recv(16384)
+                except OSError as e:
+                    # e.g. ENOBUFS if many events arrived at once. A refresh catches up with the missed events
+                    logger.debug(f"netlink recv failed: {e}")
+                    on_event()
+                    continue
+                uevent = parse_uevent(data)
+                if uevent and self.is_relevant(uevent):
+                    on_event()
+
+        self._thread = threading.Thread(target=run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._socket:
+            self._socket.close()
+            self._socket = None
+
+
+def default_event_source() -> DeviceEventSource:
+    if NetlinkEventSource.is_available():
+        return NetlinkEventSource()
+    return PollingEventSource()
+
+
+class DeviceWatcher:
+    """Keeps an up-to-date list of the connected devices (without unlocking them).
+
+    The list is refreshed whenever the event_source reports a change (default: kernel uevents on linux,
+    polling elsewhere), such that get_devices can answer instantly.
+
+    Listeners are called with (added, removed, devices) after every change.
+    A listener that is registered with an asyncio loop is called in that loop (coroutine functions are
+    scheduled as tasks), all other listeners are called in the watcher thread.
+    """
+
+    def __init__(
+        self,
+        enumerate_devices: Callable[[], list[dict[str, Any]]] | None = None,
+        event_source: DeviceEventSource | None = None,
+        debounce_seconds: float = 0.3,
+    ) -> None:
+        self.enumerate_devices = enumerate_devices if enumerate_devices else DeviceEnumerator().enumerate
+        self.event_source = event_source if event_source else default_event_source()
+        # 1 plug-in causes several uevents (usb device, interfaces, hidraw), and the device nodes
+        # appear only shortly after.  The events are therefore collected for debounce_seconds
+        self.debounce_seconds = debounce_seconds
+
+        self._devices: list[dict[str, Any]] | None = None
+        self._lock = threading.Lock()
+        self._listeners: list[tuple[DevicesChangedCallback, asyncio.AbstractEventLoop | None]] = []
+        self._changed_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    def add_listener(
+        self, callback: DevicesChangedCallback, loop: asyncio.AbstractEventLoop | None = None
+    ) -> None:
+        self._listeners.append((callback, loop))
+
+    def remove_listener(self, callback: DevicesChangedCallback) -> None:
+        self._listeners = [(c, loop) for c, loop in self._listeners if c != callback]
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+        self.refresh()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+        try:
+            self.event_source.start(self.notify)
+        except OSError as e:
+            logger.info(f"{self.event_source.__class__.__name__} is not available ({e}), polling instead")
+            self.event_source = PollingEventSource()
+            self.event_source.start(self.notify)
+
+    def stop(self) -> None:
+        if not self._thread:
+            return
+        self.event_source.stop()
+        self._stop_event.set()
+        self._changed_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def notify(self) -> None:
+        "Marks the device list as outdated. Called by the event source"
+        self._changed_event.set()
+
+    def _run(self) -> None:
+        while True:
+            self._changed_event.wait()
+            if self._stop_event.is_set():
+                return
+            if self._stop_event.wait(self.debounce_seconds):
+                return
+            self._changed_event.clear()
+            self.refresh()
+
+    def get_devices(self) -> list[dict[str, Any]]:
+        "Returns the cached device list.  Enumerates only if no list was cached yet"
+        with self._lock:
+            devices = self._devices
+        if devices is None:
+            devices = self.refresh()
+        return list(devices)
+
+    def refresh(self) -> list[dict[str, Any]]:
+        "Enumerates the devices, updates the cache and informs the listeners about changes"
+        try:
+            devices = self.enumerate_devices()
+        except Exception as e:
+            logger.error(f"Device enumeration failed: {e}")
+            with self._lock:
+                return list(self._devices or [])
+
+        with self._lock:
+            old_devices = self._devices or []
+            self._devices = devices
+
+        old_keys = {device_key(device) for device in old_devices}
+        new_keys = {device_key(device) for device in devices}
+        added = [device for device in devices if device_key(device) not in old_keys]
+        removed = [device for device in old_devices if device_key(device) not in new_keys]
+        if added or removed:
+            self._inform_listeners(added, removed, devices)
+        return list(devices)
+
+    def _inform_listeners(
+        self,
+        added: list[dict[str, Any]],
+        removed: list[dict[str, Any]],
+        devices: list[dict[str, Any]],
+    ) -> None:
+        for callback, loop in list(self._listeners):
+            try:
+                if loop is None:
+                    callback(added, removed, list(devices))
+                elif inspect.iscoroutinefunction(callback):
+                    asyncio.run_coroutine_threadsafe(callback(added, removed, list(devices)), loop)
+                else:
+                    loop.call_soon_threadsafe(callback, added, removed, list(devices))
+            except Exception as e:
+                logger.error(f"Device listener {callback} failed: {e}")
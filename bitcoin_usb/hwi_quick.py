@@ -6,7 +6,8 @@ from unittest.mock import MagicMock, patch
 import bdkpython as bdk
 import hwilib.commands as hwi_commands
 
-from .device import bdknetwork_to_chain
+from .base_device import bdknetwork_to_chain
+from .device_enumerator import DeviceEnumerator
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +20,11 @@ class HWIQuick:
     device A, and hwi tries to init the client for device B, the user is confused, because he
     just sees a blocking UI and doesnt notice device B.
 
-    In this class we therefore use hwilib, but mock the Client class, such that it doesnt
-    need to unlock the device and just returns dummy values.
+    enumerate() therefore only classifies the connected USB devices by their vendor/product ids
+    (see DeviceEnumerator), without opening them.
+
+    enumerate_with_mocks() is the previous approach: it runs hwilib.commands.enumerate,
+    but mocks the Client classes, such that it doesnt need to unlock the device and just returns dummy values.
 
     To really access the device only "type" and "path" are important, which HWIQuick does get:
         hwi_commands.get_client(
@@ -30,8 +34,13 @@ class HWIQuick:
         ).
     """
 
-    def __init__(self, network: bdk.Network) -> None:
+    def __init__(self, network: bdk.Network, device_enumerator: DeviceEnumerator | None = None) -> None:
         self.network = network
+        self.device_enumerator = device_enumerator if device_enumerator else DeviceEnumerator()
+
+    def enumerate(self) -> list[dict[str, Any]]:
+        "This enumerates the devices without unlocking them. It cannot retrieve the fingerprint"
+        return self.device_enumerator.enumerate()
 
     @staticmethod
     def mock_bitbox02_enumerate():
@@ -69,7 +78,7 @@ class HWIQuick:
     @patch("hwilib.devices.ledger.LedgerClient")
     @patch("hwilib.devices.trezor.TrezorClient")
     @patch("hwilib.devices.bitbox02.enumerate")
-    def enumerate(
+    def enumerate_with_mocks(
         self,
         bitbox02_enumerate,
         mock_trezor_client,
@@ -1,6 +1,5 @@
 import logging
-
-from PyQt6.QtCore import QCoreApplication
+import sys
 
 logger = logging.getLogger(__name__)
 
@@ -8,4 +7,9 @@ logger = logging.getLogger(__name__)
 # this function must eb named identical to QCoreApplication.translate
 # otherwise lupdate doesnt recognize it
 def translate(context, s) -> str:
-    return QCoreApplication.translate(context, s)
+    # Qt is only imported by the gui modules. Headless usage (without PyQt6 loaded)
+    # cannot have a translator installed, so the untranslated string is returned
+    qt_core = sys.modules.get("PyQt6.QtCore")
+    if qt_core is None:
+        return s
+    return qt_core.QCoreApplication.translate(context, s)
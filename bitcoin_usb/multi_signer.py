@@ -0,0 +1,138 @@
+import logging
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager
+from typing import Any
+
+import bdkpython as bdk
+
+from .base_device import BaseDevice
+from .psbt_analysis import PSBTAnalysis
+from .psbt_tools import combine_psbts
+
+logger = logging.getLogger(__name__)
+
+
+# opens the selected_device, e.g. USBDevice(selected_device, ...)
+OpenDevice = Callable[[dict[str, Any]], AbstractContextManager[BaseDevice]]
+
+
+class DeviceSignResult:
+    "The outcome of 1 device in sign_with_all"
+
+    def __init__(self, selected_device: dict[str, Any]) -> None:
+        self.selected_device = selected_device
+        self.fingerprint: str | None = selected_device.get("fingerprint")
+        # the psbt signed by this device, None if the device didn't sign
+        self.psbt: bdk.Psbt | None = None
+        # the device doesn't hold a key of the psbt, that still needs a signature
+        self.skipped = False
+        self.error: str | None = None
+        self.open_seconds = 0.0
+        self.sign_seconds = 0.0
+
+    @property
+    def seconds(self) -> float:
+        return self.open_seconds + self.sign_seconds
+
+    @property
+    def signed(self) -> bool:
+        return self.psbt is not None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.__dict__})"
+
+
+class MultiSignResult:
+    def __init__(self, psbt: bdk.Psbt | None, device_results: list[DeviceSignResult]) -> None:
+        # the merged psbt, None if no device signed
+        self.psbt = psbt
+        self.device_results = device_results
+
+    @property
+    def signed_fingerprints(self) -> list[str]:
+        return [r.fingerprint for r in self.device_results if r.signed and r.fingerprint]
+
+    @property
+    def failures(self) -> list[DeviceSignResult]:
+        return [r for r in self.device_results if r.error is not None]
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.__dict__})"
+
+
+def _nothing_to_sign(analysis: PSBTAnalysis, fingerprint: str | None) -> bool:
+    "Without key origins in the psbt, every device has to try"
+    return bool(fingerprint and analysis.fingerprints and not analysis.needs_signature(fingerprint))
+
+
+def _sign_with_device(
+    psbt_base64: str,
+    analysis: PSBTAnalysis,
+    selected_device: dict[str, Any],
+    open_device: OpenDevice,
+) -> DeviceSignResult:
+    result = DeviceSignResult(selected_device)
+    if _nothing_to_sign(analysis, result.fingerprint):
+        # known from the (slow) listing, so the device doesn't need to be opened
+        result.skipped = True
+        return result
+
+    start = time.perf_counter()
+    try:
+        with open_device(selected_device) as device:
+            result.fingerprint = device.get_fingerprint()
+            result.open_seconds = time.perf_counter() - start
+            if _nothing_to_sign(analysis, result.fingerprint):
+                result.skipped = True
+                return result
+
+            start = time.perf_counter()
+            # every device signs its own copy, bdk.Psbt is modified in place by some signers
+            signed_psbt = device.sign_psbt(bdk.Psbt(psbt_base64))
+            result.sign_seconds = time.perf_counter() - start
+            if signed_psbt is not None and signed_psbt.serialize() != psbt_base64:
+                result.psbt = signed_psbt
+    except Exception as e:
+        logger.error(f"Signing with {selected_device.get('type')} {selected_device.get('path')} failed: {e}")
+        result.error = str(e) or e.__class__.__name__
+    return result
+
+
+def sign_with_all(
+    psbt: bdk.Psbt,
+    devices: Iterable[dict[str, Any]],
+    open_device: OpenDevice,
+) -> MultiSignResult:
+    """Signs the psbt with every device that holds a key of it, all devices concurrently
+    (1 thread per device), and combines the partial signatures.
+
+    Devices that are not cosigners (or already signed) are closed again without signing. If the psbt doesn't
+    contain any key origins, every device is asked to sign.
+    A failing device doesn't stop the others, its error is reported in the result.
+    """
+    devices = list(devices)
+    psbt_base64 = psbt.serialize()
+    analysis = PSBTAnalysis.of(psbt)
+
+    device_results: list[DeviceSignResult] = []
+    if devices:
+        with ThreadPoolExecutor(max_workers=len(devices), thread_name_prefix="sign_with_all") as executor:
+            device_results = list(
+                executor.map(
+                    lambda selected_device: _sign_with_device(
+                        psbt_base64, analysis, selected_device, open_device
+                    ),
+                    devices,
+                )
+            )
+
+    combined = combine_psbts(result.psbt for result in device_results if result.psbt is not None)
+
+    for result in device_results:
+        logger.debug(
+            f"{result.selected_device.get('type')} {result.fingerprint}: signed={result.signed} "
+            f"skipped={result.skipped} error={result.error} in {result.seconds:.3f}s"
+        )
+    return MultiSignResult(psbt=combined.psbt, device_results=device_results)
@@ -0,0 +1,141 @@
+import importlib
+import logging
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any
+
+import hwilib.devices
+from hwilib.common import Chain
+from hwilib.errors import DEVICE_BUSY
+
+from .device_enumerator import DeviceEnumerator
+
+logger = logging.getLogger(__name__)
+
+
+# like hwilib.devices.<vendor>.enumerate(password, expert, chain, allow_emulators)
+VendorEnumerate = Callable[[str | None, bool, Chain, bool], list[dict[str, Any]]]
+
+
+def _import_vendor_enumerate(vendor: str) -> VendorEnumerate:
+    module = importlib.import_module(f"hwilib.devices.{vendor}")
+    return module.enumerate
+
+
+def _hwi_vendor_enumerators() -> dict[str, VendorEnumerate]:
+    def lazy(vendor: str) -> VendorEnumerate:
+        def f(
+            password: str | None, expert: bool, chain: Chain, allow_emulators: bool
+        ) -> list[dict[str, Any]]:
+            return _import_vendor_enumerate(vendor)(password, expert, chain, allow_emulators)
+
+        return f
+
+    return {vendor: lazy(vendor) for vendor in hwilib.devices.__all__}
+
+
+class ParallelHWIEnumerator:
+    """Like hwi_commands.enumerate (which unlocks the devices and retrieves the fingerprints),
+    but the vendor drivers run in parallel, such that the total latency is the one of the
+    slowest vendor and not the sum of all devices.
+
+    Each vendor gets device_timeout seconds per connected device (as found by the quick
+    DeviceEnumerator). The devices of a vendor that didn't answer in time are returned without
+    fingerprint and with an "error" (like hwi does for devices that could not be opened).
+    Python threads cannot be killed, so a hanging driver keeps running in the background,
+    its late result is discarded.
+
+    The results are cached for ttl_seconds, such that a second call shortly after doesn't
+    touch the USB bus again.
+    """
+
+    def __init__(
+        self,
+        device_timeout: float = 20,
+        ttl_seconds: float = 5,
+        vendor_enumerators: dict[str, VendorEnumerate] | None = None,
+        quick_enumerate: Callable[[], list[dict[str, Any]]] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        "clock is only used for the ttl of the cache"
+        self.device_timeout = device_timeout
+        self.ttl_seconds = ttl_seconds
+        self.vendor_enumerators = vendor_enumerators if vendor_enumerators else _hwi_vendor_enumerators()
+        self.quick_enumerate = quick_enumerate if quick_enumerate else DeviceEnumerator().enumerate
+        self.clock = clock
+
+        # {(chain, allow_emulators): (timestamp, devices)}
+        self._cache: dict[tuple[Chain, bool], tuple[float, list[dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def cached(self, chain: Chain = Chain.MAIN, allow_emulators: bool = False) -> list[dict[str, Any]] | None:
+        "Returns the cached result if it is younger than ttl_seconds"
+        with self._lock:
+            entry = self._cache.get((chain, allow_emulators))
+        if entry is None:
+            return None
+        timestamp, devices = entry
+        if self.clock() - timestamp > self.ttl_seconds:
+            return None
+        return [dict(device) for device in devices]
+
+    def invalidate(self) -> None:
+        "Call this if the devices or their fingerprints changed (plug events, wipe, ...)"
+        with self._lock:
+            self._cache.clear()
+
+    def enumerate(self, chain: Chain = Chain.MAIN, allow_emulators: bool = False) -> list[dict[str, Any]]:
+        devices = self.cached(chain=chain, allow_emulators=allow_emulators)
+        if devices is not None:
+            return devices
+
+        devices = self._enumerate_parallel(chain=chain, allow_emulators=allow_emulators)
+        with self._lock:
+            self._cache[(chain, allow_emulators)] = (self.clock(), devices)
+        return [dict(device) for device in devices]
+
+    def _enumerate_parallel(self, chain: Chain, allow_emulators: bool) -> list[dict[str, Any]]:
+        # the quick listing also initializes hidapi before it is used from several threads
+        quick_devices = self.quick_enumerate()
+        devices_per_vendor: dict[str, list[dict[str, Any]]] = {}
+        for device in quick_devices:
+            devices_per_vendor.setdefault(device["type"], []).append(device)
+
+        start = time.monotonic()
+        executor = ThreadPoolExecutor(
+            max_workers=max(len(self.vendor_enumerators), 1), thread_name_prefix="hwi_enumerate"
+        )
+        futures: dict[str, Future[list[dict[str, Any]]]] = {
+            vendor: executor.submit(f, None, False, chain, allow_emulators)
+            for vendor, f in self.vendor_enumerators.items()
+        }
+
+        result: list[dict[str, Any]] = []
+        # collect in the order of the vendors, such that the result order is like hwi_commands.enumerate
+        for vendor, future in futures.items():
+            number_devices = max(len(devices_per_vendor.get(vendor, [])), 1)
+            remaining = start + self.device_timeout * number_devices - time.monotonic()
+            try:
+                result.extend(future.result(timeout=max(remaining, 0)))
+            except FutureTimeoutError:
+                logger.warning(f"Enumerating the {vendor} devices timed out")
+                for device in devices_per_vendor.get(vendor, []):
+                    result.append(
+                        {
+                            **device,
+                            "error": f"Timed out after {self.device_timeout * number_devices}s",
+                            "code": DEVICE_BUSY,
+                        }
+                    )
+            except ImportError as e:
+                # like hwi_commands.enumerate
+                logger.warning(f"{e}, required for {vendor}. Ignore if you do not want this device.")
+            except Exception as e:
+                logger.error(f"Enumerating the {vendor} devices failed: {e}")
+
+        # don't wait for hanging drivers
+        executor.shutdown(wait=False, cancel_futures=True)
+        return result
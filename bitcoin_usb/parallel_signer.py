@@ -0,0 +1,195 @@
+import base64
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.context import BaseContext
+
+import bdkpython as bdk
+
+from .psbt_tools import (
+    PSBT_IN_FINAL_SCRIPTSIG,
+    PSBT_IN_FINAL_SCRIPTWITNESS,
+    PSBT_IN_NON_WITNESS_UTXO,
+    PSBT_IN_WITNESS_UTXO,
+    _read_compact_size,
+    _read_global_map,
+    split_psbt_maps,
+)
+from .software_signer import SoftwareSigner, SoftwareSignResult
+
+logger = logging.getLogger(__name__)
+
+
+# final_script_witness with 0 stack items.  bdk doesn't sign (or finalize) inputs that are finalized
+EMPTY_FINAL_SCRIPTWITNESS = bytes([1, PSBT_IN_FINAL_SCRIPTWITNESS, 1, 0])
+
+
+def _records(map_bytes: bytes) -> list[tuple[int, bytes]]:
+    "The (key type, record bytes) of a map, that ends with its separator"
+    records: list[tuple[int, bytes]] = []
+    pos = 0
+    while True:
+        start = pos
+        key_len, pos = _read_compact_size(map_bytes, pos)
+        if key_len == 0:
+            return records
+        key_type = map_bytes[pos]
+        pos += key_len
+        value_len, pos = _read_compact_size(map_bytes, pos)
+        pos += value_len
+        records.append((key_type, map_bytes[start:pos]))
+
+
+def _is_finalized(input_map: bytes) -> bool:
+    return any(
+        key_type in (PSBT_IN_FINAL_SCRIPTSIG, PSBT_IN_FINAL_SCRIPTWITNESS)
+        for key_type, _ in _records(input_map)
+    )
+
+
+def _placeholder_input_map(input_map: bytes) -> bytes:
+    """An input map, that bdk skips when signing.
+
+    It only keeps the previous output, which the taproot sighashes of the other inputs commit to.
+    """
+    records = _records(input_map)
+    kept = [record for key_type, record in records if key_type == PSBT_IN_WITNESS_UTXO]
+    if not kept:
+        kept = [record for key_type, record in records if key_type == PSBT_IN_NON_WITNESS_UTXO]
+    finals = [
+        record
+        for key_type, record in records
+        if key_type in (PSBT_IN_FINAL_SCRIPTSIG, PSBT_IN_FINAL_SCRIPTWITNESS)
+    ]
+    return b"".join(kept + (finals or [EMPTY_FINAL_SCRIPTWITNESS])) + b"\x00"
+
+
+# the signer of a worker process, created once by _init_worker
+_worker_signer: SoftwareSigner | None = None
+
+
+def _init_worker(mnemonic: str, receive_descriptor: str, change_descriptor: str, network_name: str) -> None:
+    global _worker_signer
+    _worker_signer = SoftwareSigner(
+        mnemonic=mnemonic,
+        receive_descriptor=receive_descriptor,
+        change_descriptor=change_descriptor,
+        network=bdk.Network[network_name],
+    )
+
+
+def _sign_in_worker(psbt_bytes: bytes) -> tuple[bytes, dict[int, set[str]]]:
+    assert _worker_signer is not None, "_init_worker was not called"
+    result = _worker_signer.sign(bdk.Psbt(base64.b64encode(psbt_bytes).decode()), psbt_bytes=psbt_bytes)
+    return base64.b64decode(result.psbt.serialize()), result.new_signatures
+
+
+class ParallelSoftwareSigner(SoftwareSigner):
+    """A SoftwareSigner, that splits the inputs of large psbts across a process pool.
+
+    Every worker process holds its own wallet (built from the same descriptors) and gets a copy of the
+    psbt, in which the inputs of the other workers are replaced by finalized placeholders.
+    The signed (and finalized) input maps of the workers are joined again, which gives the same psbt
+    as the serial SoftwareSigner.sign.
+
+    Psbts with fewer than 2 * min_inputs_per_worker inputs are signed in the calling process.
+    Unlike SoftwareSigner.sign, the signed psbt is a new object (and the given psbt is unchanged).
+
+    The worker processes start on the first parallel signing and are kept until close() (or wipe()).
+    """
+
+    def __init__(
+        self,
+        mnemonic: str,
+        receive_descriptor: str,
+        change_descriptor: str,
+        network: bdk.Network,
+        workers: int | None = None,
+        min_inputs_per_worker: int = 100,
+        mp_context: BaseContext | None = None,
+    ) -> None:
+        super().__init__(
+            mnemonic=mnemonic,
+            receive_descriptor=receive_descriptor,
+            change_descriptor=change_descriptor,
+            network=network,
+        )
+        self.workers = workers if workers else (os.cpu_count() or 1)
+        self.min_inputs_per_worker = min_inputs_per_worker
+        # spawn: forking a process with running (Qt, bdk) threads is not safe
+        self.mp_context = mp_context if mp_context else multiprocessing.get_context("spawn")
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=self.mp_context,
+                initializer=_init_worker,
+                initargs=(self.mnemonic, self.receive_descriptor, self.change_descriptor, self.network.name),
+            )
+        return self._executor
+
+    def close(self) -> None:
+        "Stops the worker processes (cancelling pending chunks), which hold the mnemonic and their wallets"
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def wipe(self) -> None:
+        self.close()
+        super().wipe()
+
+    def number_chunks(self, number_inputs: int) -> int:
+        return max(min(self.workers, number_inputs // self.min_inputs_per_worker), 1)
+
+    def sign(self, psbt: bdk.Psbt, psbt_bytes: bytes | None = None) -> SoftwareSignResult:
+        # wipe_when_released waits for the sign, so the worker processes are not stopped in between
+        with self.checkout():
+            return self._sign(psbt, psbt_bytes)
+
+    def _sign(self, psbt: bdk.Psbt, psbt_bytes: bytes | None) -> SoftwareSignResult:
+        data = psbt_bytes if psbt_bytes is not None else base64.b64decode(psbt.serialize())
+        number_inputs, _ = _read_global_map(data)
+        number_chunks = self.number_chunks(number_inputs)
+        if number_chunks <= 1:
+            return super().sign(psbt, psbt_bytes=data)
+
+        header, input_maps, output_maps = split_psbt_maps(data)
+
+        placeholders = [_placeholder_input_map(input_map) for input_map in input_maps]
+        bounds = [len(input_maps) * i // number_chunks for i in range(number_chunks + 1)]
+        chunk_psbts = [
+            b"".join(
+                [header, *placeholders[:start], *input_maps[start:stop], *placeholders[stop:], *output_maps]
+            )
+            for start, stop in zip(bounds[:-1], bounds[1:], strict=True)
+        ]
+        logger.debug(f"Signing {len(input_maps)} inputs in {number_chunks} processes")
+
+        signed_input_maps: list[bytes] = []
+        new_signatures: dict[int, set[str]] = {}
+        signed_header, signed_output_maps = header, output_maps
+        for i, (signed_bytes, chunk_new_signatures) in enumerate(
+            self._get_executor().map(_sign_in_worker, chunk_psbts)
+        ):
+            chunk_header, chunk_input_maps, chunk_output_maps = split_psbt_maps(signed_bytes)
+            if i == 0:
+                # wallet.sign can add the key origins of the own outputs, identical in all chunks
+                signed_header, signed_output_maps = chunk_header, chunk_output_maps
+            signed_input_maps += chunk_input_maps[bounds[i] : bounds[i + 1]]
+            new_signatures.update(
+                (index, keys)
+                for index, keys in chunk_new_signatures.items()
+                if bounds[i] <= index < bounds[i + 1]
+            )
+
+        signed_psbt = bdk.Psbt(
+            base64.b64encode(b"".join([signed_header, *signed_input_maps, *signed_output_maps])).decode()
+        )
+        return SoftwareSignResult(
+            psbt=signed_psbt,
+            new_signatures=new_signatures,
+            finalized=all(_is_finalized(input_map) for input_map in signed_input_maps),
+        )
@@ -0,0 +1,192 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import bdkpython as bdk
+
+from .address_types import DescriptorInfo, SimplePubKeyProvider
+from .psbt_tools import input_signatures
+
+logger = logging.getLogger(__name__)
+
+
+class KeyOrigin:
+    "A key of an input, as given by its bip32 (or taproot) derivation"
+
+    def __init__(self, input_index: int, pubkey: str, fingerprint: str, path: str) -> None:
+        self.input_index = input_index
+        # hex pubkey (xonly for taproot)
+        self.pubkey = pubkey
+        # formatted like SimplePubKeyProvider.fingerprint
+        self.fingerprint = fingerprint
+        # the full derivation path, e.g. "m/48h/1h/0h/2h/0/5"
+        self.path = path
+
+    @property
+    def key_origin(self) -> str:
+        "The path without the last 2 levels (change and address index), like SimplePubKeyProvider.key_origin"
+        return self.path.rsplit("/", 2)[0]
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.__dict__})"
+
+
+class PSBTAnalysis:
+    """Indexes the keys and signatures of a psbt, built from 1 pass over psbt.input().
+
+    All coverage queries are dictionary lookups.  Fingerprints can be given in any case,
+    they are returned formatted like SimplePubKeyProvider.fingerprint (upper case).
+
+    The analysis is a snapshot: after signing, get a new one with PSBTAnalysis.of(psbt).
+    """
+
+    def __init__(self, psbt: bdk.Psbt) -> None:
+        self.key_origins: list[KeyOrigin] = []
+        # per input: the signed keys (like psbt_tools.psbt_signature_keys)
+        self.signed_keys: list[set[str]] = []
+        # {fingerprint: {input index: pubkeys}}
+        self._keys_by_fingerprint: dict[str, dict[int, set[str]]] = {}
+        # {(fingerprint, key_origin): input indexes}
+        self._inputs_by_key_origin: dict[tuple[str, str], set[int]] = {}
+        # {fingerprint: input indexes with at least 1 unsigned key of the fingerprint}
+        self._missing_by_fingerprint: dict[str, set[int]] = {}
+
+        formatted_fingerprints: dict[str, str] = {}
+        for input_index, psbt_input in enumerate(psbt.input()):
+            signed = set(input_signatures(psbt_input))
+            self.signed_keys.append(signed)
+            # taproot script path signatures are stored as "<xonly pubkey>/<leaf hash>"
+            signed_pubkeys = {key.split("/", 1)[0] for key in signed}
+
+            key_sources = [(pubkey, key_source) for pubkey, key_source in psbt_input.bip32_derivation.items()]
+            key_sources += [
+                (xonly_pubkey, tap_key_origin.key_source)
+                for xonly_pubkey, tap_key_origin in psbt_input.tap_key_origins.items()
+            ]
+            for pubkey, key_source in key_sources:
+                fingerprint = formatted_fingerprints.get(key_source.fingerprint)
+                if fingerprint is None:
+                    fingerprint = SimplePubKeyProvider.format_fingerprint(key_source.fingerprint)
+                    formatted_fingerprints[key_source.fingerprint] = fingerprint
+                # bdk writes the path without "m/" and with "'" as hardened character
+                path_str = str(key_source.path)
+                path = "m/" + path_str.replace("'", "h") if path_str else "m"
+                key_origin = KeyOrigin(input_index, pubkey, fingerprint, path)
+                self.key_origins.append(key_origin)
+
+                self._keys_by_fingerprint.setdefault(fingerprint, {}).setdefault(input_index, set()).add(
+                    pubkey
+                )
+                self._inputs_by_key_origin.setdefault((fingerprint, key_origin.key_origin), set()).add(
+                    input_index
+                )
+                missing = self._missing_by_fingerprint.setdefault(fingerprint, set())
+                if pubkey not in signed_pubkeys:
+                    missing.add(input_index)
+        self.number_inputs = len(self.signed_keys)
+
+    @staticmethod
+    def _format_fingerprint(fingerprint: str) -> str:
+        return SimplePubKeyProvider.format_fingerprint(fingerprint)
+
+    @property
+    def fingerprints(self) -> set[str]:
+        "All fingerprints that have a key in any input"
+        return set(self._keys_by_fingerprint)
+
+    def is_cosigner(self, fingerprint: str) -> bool:
+        return self._format_fingerprint(fingerprint) in self._keys_by_fingerprint
+
+    def inputs_of(self, fingerprint: str, key_origin: str | None = None) -> set[int]:
+        "The inputs with a key of fingerprint (optionally only below key_origin, e.g. m/48h/1h/0h/2h)"
+        fingerprint = self._format_fingerprint(fingerprint)
+        if key_origin is not None:
+            key_origin = SimplePubKeyProvider.format_key_origin(key_origin)
+            return set(self._inputs_by_key_origin.get((fingerprint, key_origin), set()))
+        return set(self._keys_by_fingerprint.get(fingerprint, {}))
+
+    def pubkeys_of(self, fingerprint: str, input_index: int) -> set[str]:
+        return set(
+            self._keys_by_fingerprint.get(self._format_fingerprint(fingerprint), {}).get(input_index, set())
+        )
+
+    def missing_inputs(self, fingerprint: str) -> set[int]:
+        "The inputs, that still need a signature from fingerprint"
+        return set(self._missing_by_fingerprint.get(self._format_fingerprint(fingerprint), set()))
+
+    def signed_inputs(self, fingerprint: str) -> set[int]:
+        "The inputs, in which fingerprint signed all its keys"
+        fingerprint = self._format_fingerprint(fingerprint)
+        return set(self._keys_by_fingerprint.get(fingerprint, {})) - self._missing_by_fingerprint.get(
+            fingerprint, set()
+        )
+
+    def needs_signature(self, fingerprint: str) -> bool:
+        return bool(self._missing_by_fingerprint.get(self._format_fingerprint(fingerprint)))
+
+    def missing_fingerprints(self) -> set[str]:
+        "The fingerprints that still need to sign at least 1 input"
+        return {fingerprint for fingerprint, missing in self._missing_by_fingerprint.items() if missing}
+
+    def missing_spk_providers(self, descriptor_info: DescriptorInfo) -> list[SimplePubKeyProvider]:
+        "The cosigners of the descriptor that still need to sign"
+        return [
+            spk_provider
+            for spk_provider in descriptor_info.spk_providers
+            if self._inputs_by_key_origin.get((spk_provider.fingerprint, spk_provider.key_origin), set())
+            & self._missing_by_fingerprint.get(spk_provider.fingerprint, set())
+        ]
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(number_inputs={self.number_inputs}, fingerprints={self.fingerprints})"
+        )
+
+    @classmethod
+    def of(cls, psbt: bdk.Psbt) -> "PSBTAnalysis":
+        "Memoised: returns the analysis of an identical psbt, if it was analysed recently"
+        return _default_cache.get(psbt)
+
+
+class PSBTAnalysisCache:
+    """Keeps the analyses of the last maxsize psbts.
+
+    The psbt id is the hash of the serialized psbt, so a psbt gets a new analysis once it is signed.
+    Serializing is several times faster than psbt.input(), which the analysis needs.
+    """
+
+    def __init__(self, maxsize: int = 32) -> None:
+        self.maxsize = maxsize
+        self._analyses: OrderedDict[bytes, PSBTAnalysis] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def psbt_id(psbt: bdk.Psbt) -> bytes:
+        return hashlib.sha256(psbt.serialize().encode()).digest()
+
+    def get(self, psbt: bdk.Psbt) -> PSBTAnalysis:
+        psbt_id = self.psbt_id(psbt)
+        with self._lock:
+            analysis = self._analyses.get(psbt_id)
+            if analysis is not None:
+                self._analyses.move_to_end(psbt_id)
+                return analysis
+
+        analysis = PSBTAnalysis(psbt)
+        with self._lock:
+            self._analyses[psbt_id] = analysis
+            while len(self._analyses) > self.maxsize:
+                self._analyses.popitem(last=False)
+        return analysis
+
+    def clear(self) -> None:
+        with self._lock:
+            self._analyses.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._analyses)
+
+
+_default_cache = PSBTAnalysisCache()
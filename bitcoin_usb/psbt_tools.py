@@ -0,0 +1,502 @@
+import base64
+import copy
+import logging
+import time
+from collections.abc import Iterable
+
+import bdkpython as bdk
+from hwilib.psbt import PSBT, PartiallySignedInput, PartiallySignedOutput
+from hwilib.tx import CTransaction
+
+logger = logging.getLogger(__name__)
+
+
+def psbt_fingerprints(psbt: bdk.Psbt) -> set[str]:
+    "The master fingerprints of all keys that can sign an input of the psbt (from the key origins)"
+    fingerprints: set[str] = set()
+    for psbt_input in psbt.input():
+        for key_source in psbt_input.bip32_derivation.values():
+            fingerprints.add(key_source.fingerprint.lower())
+        for tap_key_origin in psbt_input.tap_key_origins.values():
+            fingerprints.add(tap_key_origin.key_source.fingerprint.lower())
+    return fingerprints
+
+
+# Conversion between bdk.Psbt and hwilib PSBT
+#
+# bdk only accepts and returns base64 strings, so 1 base64 step remains at the bdk boundary
+# (which is fast, it is implemented in C).  The expensive parts are avoided:
+# - hwilib PSBT.serialize concatenates bytes with +=, which is quadratic in the number of inputs
+# - parsing the full signed psbt again in bdk (incl. all previous transactions), although the
+#   device only added signatures
+
+
+def hwi_psbt_from_bdk(psbt: bdk.Psbt) -> PSBT:
+    hwi_psbt = PSBT()
+    hwi_psbt.deserialize(psbt.serialize())
+    return hwi_psbt
+
+
+def hwi_unsigned_tx(hwi_psbt: PSBT) -> CTransaction:
+    "The unsigned tx of hwi_psbt. Version 2 psbts have no tx, it is built from the input and output maps"
+    if hwi_psbt.version < 2:
+        return hwi_psbt.tx
+    # get_unsigned_tx sets an attribute of the psbt, and doesn't set the lock time of the tx
+    tx = copy.copy(hwi_psbt).get_unsigned_tx()
+    tx.nLockTime = hwi_psbt.compute_lock_time()
+    tx.rehash()
+    return tx
+
+
+def hwi_psbt_to_v0(hwi_psbt: PSBT) -> PSBT:
+    """hwi_psbt, or for other versions a version 0 copy (like convert_to_v0, which changes the psbt in place).
+
+    The input and output maps are shallow copies, their fields are shared with hwi_psbt.
+    """
+    if hwi_psbt.version == 0:
+        return hwi_psbt
+    result = copy.copy(hwi_psbt)
+    result.inputs = [copy.copy(psbt_input) for psbt_input in hwi_psbt.inputs]
+    result.outputs = [copy.copy(psbt_output) for psbt_output in hwi_psbt.outputs]
+    result.tx = hwi_unsigned_tx(hwi_psbt)
+    result._convert_version(0)
+    result.explicit_version = False
+    return result
+
+
+def hwi_psbt_to_bytes(hwi_psbt: PSBT) -> bytes:
+    "Like hwi_psbt.serialize(), but in linear time and without base64"
+    if hwi_psbt.version >= 2:
+        # the global map of version 2 contains the number of inputs and outputs, so it cannot be
+        # serialized without them
+        return base64.b64decode(hwi_psbt.serialize())
+    # the global map is serialized by hwilib (without the input and output maps, so it stays small)
+    global_map = copy.copy(hwi_psbt)
+    global_map.inputs = []
+    global_map.outputs = []
+    chunks = [base64.b64decode(global_map.serialize())]
+    chunks += [psbt_input.serialize() for psbt_input in hwi_psbt.inputs]
+    chunks += [psbt_output.serialize() for psbt_output in hwi_psbt.outputs]
+    return b"".join(chunks)
+
+
+def bdk_psbt_from_hwi(hwi_psbt: PSBT) -> bdk.Psbt:
+    "bdk only supports version 0, so other versions are converted"
+    return bdk.Psbt(base64.b64encode(hwi_psbt_to_bytes(hwi_psbt_to_v0(hwi_psbt))).decode())
+
+
+def hwi_signatures_only(hwi_psbt: PSBT) -> PSBT:
+    "A version 0 copy of hwi_psbt (of any version) that contains only the unsigned tx and the signatures"
+    result = PSBT()
+    result.tx = hwi_unsigned_tx(hwi_psbt)
+    for psbt_input in hwi_psbt.inputs:
+        signatures = PartiallySignedInput(version=0)
+        signatures.partial_sigs = psbt_input.partial_sigs
+        signatures.tap_key_sig = psbt_input.tap_key_sig
+        signatures.tap_script_sigs = psbt_input.tap_script_sigs
+        signatures.musig2_pub_nonces = psbt_input.musig2_pub_nonces
+        signatures.musig2_partial_sigs = psbt_input.musig2_partial_sigs
+        signatures.final_script_sig = psbt_input.final_script_sig
+        signatures.final_script_witness = psbt_input.final_script_witness
+        result.inputs.append(signatures)
+    result.outputs = [PartiallySignedOutput(version=0) for _ in hwi_psbt.outputs]
+    return result
+
+
+def merge_hwi_signatures(psbt: bdk.Psbt, signed_hwi_psbt: PSBT, complete=True) -> bdk.Psbt:
+    """Returns psbt combined with the signatures of signed_hwi_psbt.
+
+    Only the signatures are converted to bdk, all other data is taken from the already parsed psbt.
+    If the psbts cannot be combined, the full signed_hwi_psbt is converted instead.
+    This fallback is only possible if signed_hwi_psbt is complete (e.g. not slimmed), otherwise
+    the error is raised.
+    """
+    try:
+        return psbt.combine(bdk_psbt_from_hwi(hwi_signatures_only(signed_hwi_psbt)))
+    except Exception as e:
+        if not complete:
+            raise
+        logger.warning(f"Could not combine the signatures with the original psbt: {e}")
+    return bdk_psbt_from_hwi(signed_hwi_psbt)
+
+
+# full speed USB HID: 64 byte reports, 1 per millisecond.  Only used to estimate the transfer time
+USB_HID_BYTES_PER_SECOND = 64_000
+
+
+class SlimmingReport:
+    def __init__(self, original_bytes: int, slim_bytes: int, seconds: float) -> None:
+        self.original_bytes = original_bytes
+        self.slim_bytes = slim_bytes
+        # the time needed for slimming
+        self.seconds = seconds
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.slim_bytes
+
+    def transfer_seconds_saved(self, bytes_per_second: float = USB_HID_BYTES_PER_SECOND) -> float:
+        "Estimated, the real throughput depends on the device and its protocol"
+        return self.bytes_saved / bytes_per_second
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.__dict__})"
+
+
+def _is_taproot_input(psbt_input: PartiallySignedInput) -> bool:
+    if psbt_input.witness_utxo is None:
+        return False
+    script = psbt_input.witness_utxo.scriptPubKey
+    return len(script) == 34 and script[:2] == b"\x51\x20"
+
+
+def strip_hwi_psbt(
+    hwi_psbt: PSBT,
+    fingerprint: str | None = None,
+    strip_foreign_derivations: bool = False,
+) -> None:
+    """Removes (in place) the data, that the device with fingerprint doesn't need for signing:
+
+    - signatures of other keys (the own signatures are kept, hwilib uses them to skip signed inputs)
+    - unknown and proprietary fields
+    - the previous transactions (non_witness_utxo), if all inputs are taproot. With segwit v0 inputs
+      present, the devices also need them for the taproot inputs.
+    - only if strip_foreign_derivations: the bip32 derivations of other keys in the inputs.
+      Off by default: the multisig signing of Trezor and Keepkey (in hwilib) and the multisig checks
+      of Coldcard need the derivations of all cosigners.
+
+    The signatures of the device must be merged into the original psbt (merge_hwi_signatures).
+    """
+    fingerprint_bytes = bytes.fromhex(fingerprint) if fingerprint else None
+    all_taproot = all(_is_taproot_input(psbt_input) for psbt_input in hwi_psbt.inputs)
+
+    hwi_psbt.unknown = {}
+    for psbt_input in hwi_psbt.inputs:
+        psbt_input.unknown = {}
+        if all_taproot:
+            psbt_input.non_witness_utxo = None
+        if fingerprint_bytes is None:
+            continue
+        own_pubkeys = {
+            pubkey
+            for pubkey, origin in psbt_input.hd_keypaths.items()
+            if origin.fingerprint == fingerprint_bytes
+        }
+        psbt_input.partial_sigs = {
+            pubkey: sig for pubkey, sig in psbt_input.partial_sigs.items() if pubkey in own_pubkeys
+        }
+        if strip_foreign_derivations:
+            psbt_input.hd_keypaths = {
+                pubkey: origin for pubkey, origin in psbt_input.hd_keypaths.items() if pubkey in own_pubkeys
+            }
+    for psbt_output in hwi_psbt.outputs:
+        psbt_output.unknown = {}
+
+
+def slim_hwi_psbt(
+    hwi_psbt: PSBT,
+    fingerprint: str | None = None,
+    strip_foreign_derivations: bool = False,
+) -> SlimmingReport:
+    """strip_hwi_psbt, and reports the saved bytes.
+
+    Measuring serializes the psbt twice, so use strip_hwi_psbt if the report isn't needed.
+    """
+    start = time.perf_counter()
+    original_bytes = len(hwi_psbt_to_bytes(hwi_psbt))
+    strip_hwi_psbt(hwi_psbt, fingerprint=fingerprint, strip_foreign_derivations=strip_foreign_derivations)
+    return SlimmingReport(
+        original_bytes=original_bytes,
+        slim_bytes=len(hwi_psbt_to_bytes(hwi_psbt)),
+        seconds=time.perf_counter() - start,
+    )
+
+
+def input_signatures(psbt_input: bdk.Input) -> dict[str, bytes]:
+    """All signatures of the input by signing key.
+    The keys are the hex pubkeys, "<xonly pubkey>" for the taproot key path and
+    "<xonly pubkey>/<leaf hash>" for taproot script paths."""
+    signatures = dict(psbt_input.partial_sigs)
+    if psbt_input.tap_key_sig is not None and psbt_input.tap_internal_key is not None:
+        signatures[psbt_input.tap_internal_key] = psbt_input.tap_key_sig
+    for tap_key, sig in psbt_input.tap_script_sigs.items():
+        signatures[f"{tap_key.xonly_pubkey}/{tap_key.tap_leaf_hash}"] = sig
+    return signatures
+
+
+def _input_key_fingerprints(psbt_input: bdk.Input) -> dict[str, str]:
+    "The fingerprints of all keys with a key origin in the input, by (xonly) pubkey"
+    fingerprints = {
+        pubkey: key_source.fingerprint.lower() for pubkey, key_source in psbt_input.bip32_derivation.items()
+    }
+    for xonly_pubkey, tap_key_origin in psbt_input.tap_key_origins.items():
+        fingerprints[xonly_pubkey] = tap_key_origin.key_source.fingerprint.lower()
+    return fingerprints
+
+
+class SignatureConflict:
+    "2 psbts contain different signatures of the same key for the same input"
+
+    def __init__(self, input_index: int, key: str, psbt_index: int) -> None:
+        self.input_index = input_index
+        self.key = key
+        # the psbt (position in the combined iterable), whose signature was discarded
+        self.psbt_index = psbt_index
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.__dict__})"
+
+
+class InputCoverage:
+    def __init__(self, index: int, signed_keys: set[str], key_fingerprints: dict[str, str]) -> None:
+        self.index = index
+        self.signed_keys = signed_keys
+        # all keys with a known key origin: {pubkey: fingerprint}
+        self.key_fingerprints = key_fingerprints
+
+    @property
+    def missing_keys(self) -> set[str]:
+        return set(self.key_fingerprints) - self.signed_keys
+
+    @property
+    def signed_fingerprints(self) -> set[str]:
+        return {self.key_fingerprints[key] for key in self.signed_keys if key in self.key_fingerprints}
+
+    @property
+    def missing_fingerprints(self) -> set[str]:
+        return {self.key_fingerprints[key] for key in self.missing_keys}
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.__dict__})"
+
+
+class CombineResult:
+    def __init__(self) -> None:
+        self.psbt: bdk.Psbt | None = None
+        self.number_psbts = 0
+        # identical signatures, that were contained in several psbts
+        self.duplicate_signatures = 0
+        self.conflicts: list[SignatureConflict] = []
+        self.coverage: list[InputCoverage] = []
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.__dict__})"
+
+
+def _restore_key_path_fields(combined: bdk.Psbt, known: bdk.Psbt, input_indexes: set[int]) -> bdk.Psbt:
+    """combined, with the tap_key_sig and the final fields of known in the inputs input_indexes.
+
+    Unlike the signatures of the other keys, combine keeps these fields of self, not of the argument.
+    """
+    hwi_combined = hwi_psbt_from_bdk(combined)
+    hwi_known = hwi_psbt_from_bdk(known)
+    for input_index in input_indexes:
+        combined_input = hwi_combined.inputs[input_index]
+        known_input = hwi_known.inputs[input_index]
+        if known_input.tap_key_sig:
+            combined_input.tap_key_sig = known_input.tap_key_sig
+        if known_input.final_script_sig:
+            combined_input.final_script_sig = known_input.final_script_sig
+        if not known_input.final_script_witness.is_null():
+            combined_input.final_script_witness = known_input.final_script_witness
+    return bdk_psbt_from_hwi(hwi_combined)
+
+
+def combine_psbts(psbts: Iterable[bdk.Psbt]) -> CombineResult:
+    """Combines partially signed psbts of the same unsigned transaction in 1 pass.
+
+    Only the combined psbt and an index of the known signatures are kept, so psbts can be streamed
+    (e.g. from a generator) and the memory doesn't grow with the number of psbts.
+    - identical signatures are counted and psbts without new signatures are skipped
+    - if a key signed differently in 2 psbts, the first signature is kept and the conflict reported
+
+    Raises an error if a psbt is for another transaction.
+    """
+    result = CombineResult()
+    # per input: {key: signature}
+    known_signatures: list[dict[str, bytes]] = []
+    for psbt_index, psbt in enumerate(psbts):
+        result.number_psbts += 1
+        inputs = psbt.input()
+        if result.psbt is None:
+            result.psbt = psbt
+            known_signatures = [input_signatures(psbt_input) for psbt_input in inputs]
+            continue
+        if len(inputs) != len(known_signatures):
+            raise ValueError(f"psbt {psbt_index} has {len(inputs)} inputs instead of {len(known_signatures)}")
+
+        has_new_signatures = False
+        conflicting_inputs: set[int] = set()
+        for input_index, psbt_input in enumerate(inputs):
+            known = known_signatures[input_index]
+            for key, sig in input_signatures(psbt_input).items():
+                known_sig = known.get(key)
+                if known_sig is None:
+                    known[key] = sig
+                    has_new_signatures = True
+                elif known_sig == sig:
+                    result.duplicate_signatures += 1
+                else:
+                    conflicting_inputs.add(input_index)
+                    result.conflicts.append(
+                        SignatureConflict(input_index=input_index, key=key, psbt_index=psbt_index)
+                    )
+        if has_new_signatures:
+            # the partial_sigs and tap_script_sigs of the argument take precedence, so the known ones are kept
+            # on conflicts.  combine also checks that the unsigned transactions are identical
+            combined = psbt.combine(result.psbt)
+            if conflicting_inputs:
+                combined = _restore_key_path_fields(combined, result.psbt, conflicting_inputs)
+            result.psbt = combined
+
+    if result.psbt is not None:
+        result.coverage = [
+            InputCoverage(
+                index=input_index,
+                signed_keys=set(known_signatures[input_index]),
+                key_fingerprints=_input_key_fingerprints(psbt_input),
+            )
+            for input_index, psbt_input in enumerate(result.psbt.input())
+        ]
+    for conflict in result.conflicts:
+        logger.warning(f"Discarded a conflicting signature: {conflict}")
+    return result
+
+
+# BIP174 key types
+PSBT_GLOBAL_UNSIGNED_TX = 0x00
+PSBT_IN_NON_WITNESS_UTXO = 0x00
+PSBT_IN_WITNESS_UTXO = 0x01
+PSBT_IN_PARTIAL_SIG = 0x02
+PSBT_IN_FINAL_SCRIPTSIG = 0x07
+PSBT_IN_FINAL_SCRIPTWITNESS = 0x08
+PSBT_IN_TAP_KEY_SIG = 0x13
+PSBT_IN_TAP_SCRIPT_SIG = 0x14
+PSBT_IN_TAP_INTERNAL_KEY = 0x17
+# the key types, whose key data is the signing key
+_SIGNATURE_KEY_TYPES = {PSBT_IN_PARTIAL_SIG, PSBT_IN_TAP_SCRIPT_SIG}
+
+
+def _read_compact_size(data: bytes, pos: int) -> tuple[int, int]:
+    "Returns (value, position after it)"
+    first = data[pos]
+    if first < 0xFD:
+        return first, pos + 1
+    size = 1 << (first - 0xFC)
+    return int.from_bytes(data[pos + 1 : pos + 1 + size], "little"), pos + 1 + size
+
+
+def _read_global_map(data: bytes) -> tuple[int, int]:
+    "Returns (number of inputs, position of the first input map) of a serialized psbt"
+    # magic bytes b"psbt\xff"
+    pos = 5
+    number_inputs: int | None = None
+    while True:
+        key_len, pos = _read_compact_size(data, pos)
+        if key_len == 0:
+            break
+        key_type = data[pos]
+        pos += key_len
+        value_len, pos = _read_compact_size(data, pos)
+        if key_type == PSBT_GLOBAL_UNSIGNED_TX:
+            # version (4 bytes) followed by the number of inputs (the unsigned tx has no witness marker)
+            number_inputs, _ = _read_compact_size(data, pos + 4)
+        pos += value_len
+    if number_inputs is None:
+        raise ValueError("Only psbt version 0 is supported")
+    return number_inputs, pos
+
+
+def _skip_map(data: bytes, pos: int) -> int:
+    "Returns the position after the map (incl. its separator) starting at pos"
+    while True:
+        key_len, pos = _read_compact_size(data, pos)
+        if key_len == 0:
+            return pos
+        pos += key_len
+        value_len, pos = _read_compact_size(data, pos)
+        pos += value_len
+
+
+def split_psbt_maps(data: bytes) -> tuple[bytes, list[bytes], list[bytes]]:
+    """Splits a serialized psbt (version 0) into its header with the global map, the input maps and
+    the output maps.  Every map includes its separator, so b"".join(...) of all parts is the psbt again."""
+    number_inputs, pos = _read_global_map(data)
+    header = data[:pos]
+    input_maps: list[bytes] = []
+    for _ in range(number_inputs):
+        end = _skip_map(data, pos)
+        input_maps.append(data[pos:end])
+        pos = end
+    output_maps: list[bytes] = []
+    while pos < len(data):
+        end = _skip_map(data, pos)
+        output_maps.append(data[pos:end])
+        pos = end
+    return header, input_maps, output_maps
+
+
+def _input_signature_keys(data: bytes, pos: int) -> tuple[set[str], int]:
+    "The signing keys of the input map starting at pos (like psbt_signature_keys), and the position after it"
+    keys: set[str] = set()
+    has_tap_key_sig = False
+    tap_internal_key: str | None = None
+    while True:
+        key_len, pos = _read_compact_size(data, pos)
+        if key_len == 0:
+            break
+        key_type = data[pos]
+        key_data = data[pos + 1 : pos + key_len] if key_type in _SIGNATURE_KEY_TYPES else b""
+        pos += key_len
+        value_len, pos = _read_compact_size(data, pos)
+        if key_type == PSBT_IN_PARTIAL_SIG:
+            keys.add(key_data.hex())
+        elif key_type == PSBT_IN_TAP_KEY_SIG:
+            has_tap_key_sig = True
+        elif key_type == PSBT_IN_TAP_SCRIPT_SIG:
+            keys.add(f"{key_data[:32].hex()}/{key_data[32:].hex()}")
+        elif key_type == PSBT_IN_TAP_INTERNAL_KEY:
+            tap_internal_key = data[pos : pos + value_len].hex()
+        pos += value_len
+    if has_tap_key_sig and tap_internal_key is not None:
+        keys.add(tap_internal_key)
+    return keys, pos
+
+
+def psbt_signature_keys(psbt: bdk.Psbt) -> list[set[str]]:
+    """The signing keys of all signatures per input, with the same keys as in combine_psbts.
+
+    Only the map keys of the serialized psbt are read, the values (previous transactions, scripts, ...)
+    are skipped.  This is several times faster than psbt.input(), which converts every field.
+    """
+    data = base64.b64decode(psbt.serialize())
+    number_inputs, pos = _read_global_map(data)
+
+    result: list[set[str]] = []
+    for _ in range(number_inputs):
+        keys, pos = _input_signature_keys(data, pos)
+        result.append(keys)
+    return result
+
+
+def new_signature_keys(data: bytes, signed_data: bytes) -> dict[int, set[str]]:
+    """{input index: signing keys} of the signatures in signed_data, that are not in data.
+
+    Both are the serialized psbt (version 0), before and after signing.  Only the input maps that
+    changed are parsed, the others are only compared bytewise.
+    """
+    _, input_maps, _ = split_psbt_maps(data)
+    _, signed_input_maps, _ = split_psbt_maps(signed_data)
+    if len(input_maps) != len(signed_input_maps):
+        raise ValueError(f"The signed psbt has {len(signed_input_maps)} inputs instead of {len(input_maps)}")
+
+    result: dict[int, set[str]] = {}
+    for input_index, (input_map, signed_input_map) in enumerate(
+        zip(input_maps, signed_input_maps, strict=True)
+    ):
+        if input_map == signed_input_map:
+            continue
+        new_keys = _input_signature_keys(signed_input_map, 0)[0] - _input_signature_keys(input_map, 0)[0]
+        if new_keys:
+            result[input_index] = new_keys
+    return result
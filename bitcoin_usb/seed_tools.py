@@ -1,4 +1,9 @@
 import logging
+import multiprocessing
+from collections import Counter
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.context import BaseContext
 
 import bdkpython as bdk
 from mnemonic import Mnemonic
@@ -15,11 +20,108 @@ def get_mnemonic_seed(mnemonic: str):
     return mnemo.to_seed(mnemonic)
 
 
+class DerivationContext:
+    """The root key of a mnemonic, for many derivations.
+
+    Creating the root key stretches the seed (PBKDF2 with 2048 rounds), which is by far the most
+    expensive part of a derivation.  A DerivationContext does this once and serves the fingerprint,
+    xpubs and secret keys from it.  The derived secret keys are cached per key origin.
+
+    Note: it holds the secret root key in memory.
+    """
+
+    def __init__(self, mnemonic: str, network: bdk.Network, passphrase: str = "") -> None:
+        self.network = network
+        self.root_secret_key = bdk.DescriptorSecretKey(
+            network, bdk.Mnemonic.from_string(mnemonic), passphrase
+        )
+        # master fingerprint
+        self.fingerprint: str = self.root_secret_key.as_public().master_fingerprint()
+        self._derived_secrets: dict[str, bdk.DescriptorSecretKey] = {}
+
+    def derive_secret(self, key_origin: str) -> bdk.DescriptorSecretKey:
+        """The secret key at key_origin, e.g. [7c85f2b5/84'/1'/0']tprv.../*
+
+        It is derived from the nearest cached ancestor (see derive_many), not necessarily from the root.
+        """
+        key_origin = SimplePubKeyProvider.format_key_origin(key_origin)
+        derived_secret = self._derived_secrets.get(key_origin)
+        if derived_secret is not None:
+            return derived_secret
+
+        levels = key_origin.split("/")[1:]
+        for i in range(len(levels) - 1, 0, -1):
+            ancestor = self._derived_secrets.get("/".join(["m", *levels[:i]]))
+            if ancestor is not None:
+                derived_secret = ancestor.derive(bdk.DerivationPath("/".join(["m", *levels[i:]])))
+                break
+        else:
+            derived_secret = self.root_secret_key.derive(bdk.DerivationPath(key_origin))
+        self._derived_secrets[key_origin] = derived_secret
+        return derived_secret
+
+    def derive_many(self, key_origins: Iterable[str]) -> dict[str, str]:
+        """Returns {key_origin: xpub}.
+
+        The key origins are derived as a tree: every node, that is shared by several key origins
+        (like m/48h/1h/0h by p2sh-p2wsh and p2wsh, or m/84h/1h by all accounts), is derived only once.
+        """
+        key_origins = list(key_origins)
+        normalized = {SimplePubKeyProvider.format_key_origin(key_origin) for key_origin in key_origins}
+        # number of key origins below each node
+        counts = Counter(
+            "/".join(levels[:i])
+            for levels in (key_origin.split("/") for key_origin in normalized)
+            for i in range(2, len(levels))
+        )
+        shared_nodes = sorted(
+            (node for node, count in counts.items() if count >= 2), key=lambda n: n.count("/")
+        )
+        for node in shared_nodes:
+            self.derive_secret(node)
+        return {key_origin: self.derive(key_origin)[0] for key_origin in key_origins}
+
+    def derive(self, key_origin: str) -> tuple[str, str]:
+        "Returns (xpub at key_origin, master fingerprint), like seed_tools.derive"
+        pub_str = strip_derivation_path(str(self.derive_secret(key_origin).as_public()))
+        assert "]" in pub_str
+
+        xpub = pub_str.split("]")[1]  # only take xpub, not key_origin
+        return xpub, self.fingerprint
+
+    def derive_spk_provider(self, key_origin: str, derivation_path: str = "/0/*") -> SimplePubKeyProvider:
+        xpub, fingerprint = self.derive(key_origin)
+        return SimplePubKeyProvider(
+            xpub=xpub,
+            fingerprint=fingerprint,
+            key_origin=key_origin,
+            derivation_path=derivation_path,
+        )
+
+    def discard(self, key_origin: str) -> None:
+        "Removes the cached secret key at key_origin"
+        self._derived_secrets.pop(SimplePubKeyProvider.format_key_origin(key_origin), None)
+
+    def wipe(self) -> None:
+        """Drops the root key and all derived secret keys, the context cannot derive afterwards.
+
+        Python cannot overwrite the memory of the objects, but without references bdk frees them.
+        """
+        self._derived_secrets.clear()
+        del self.root_secret_key
+
+
+def strip_derivation_path(s: str) -> str:
+    return s[:-2] if s.endswith("/*") else s
+
+
 def derive(mnemonic: str, key_origin: str, network: bdk.Network) -> tuple[str, str]:
     """returns:
             xpub  (at key_origin)
             fingerprint  (at root)
 
+    For several derivations of the same mnemonic use a DerivationContext, which stretches the seed only once.
+
     Args:
         mnemonic (str): _description_
         key_origin (str): _description_
@@ -31,30 +133,72 @@ def derive(mnemonic: str, key_origin: str, network: bdk.Network) -> tuple[str, s
     Returns:
         Tuple[str, str]: xpub, fingerprint  (where fingerprint is the master fingerprint)
     """
-
-    def strip_derivation_path(s: str) -> str:
-        return s[:-2] if s.endswith("/*") else s
-
-    bdk_mnemonic = bdk.Mnemonic.from_string(mnemonic)
-    root_secret_key = bdk.DescriptorSecretKey(network, bdk_mnemonic, "")
-    fingerprint = root_secret_key.as_public().master_fingerprint()
-    derived_secret = root_secret_key.derive(bdk.DerivationPath(key_origin))
-
-    pub_str = strip_derivation_path(str(derived_secret.as_public()))
-    assert "]" in pub_str
-
-    xpub = pub_str.split("]")[1]  # only take xpub, not key_origin
-
-    return xpub, fingerprint
+    return DerivationContext(mnemonic, network).derive(key_origin)
 
 
 def derive_spk_provider(
     mnemonic: str, key_origin: str, network: bdk.Network, derivation_path: str = "/0/*"
 ) -> SimplePubKeyProvider:
-    xpub, fingerprint = derive(mnemonic, key_origin, network)
-    return SimplePubKeyProvider(
-        xpub=xpub,
-        fingerprint=fingerprint,
-        key_origin=key_origin,
-        derivation_path=derivation_path,
+    return DerivationContext(mnemonic, network).derive_spk_provider(
+        key_origin, derivation_path=derivation_path
     )
+
+
+def _independent_subtrees(key_origins: Iterable[str]) -> list[list[str]]:
+    """Groups the key origins by the first level, at which they diverge.
+    The groups don't share any node below their common ancestor."""
+    by_levels = {
+        key_origin: SimplePubKeyProvider.format_key_origin(key_origin).split("/")
+        for key_origin in key_origins
+    }
+    if not by_levels:
+        return []
+    common = 0
+    all_levels = list(by_levels.values())
+    while all(len(levels) > common and levels[common] == all_levels[0][common] for levels in all_levels):
+        common += 1
+    groups: dict[tuple[str, ...], list[str]] = {}
+    for key_origin, levels in by_levels.items():
+        groups.setdefault(tuple(levels[: common + 1]), []).append(key_origin)
+    return list(groups.values())
+
+
+def _derive_many_in_worker(mnemonic: str, network_name: str, key_origins: list[str]) -> dict[str, str]:
+    return DerivationContext(mnemonic, bdk.Network[network_name]).derive_many(key_origins)
+
+
+def derive_many(
+    mnemonic: str,
+    key_origins: Iterable[str],
+    network: bdk.Network,
+    workers: int = 1,
+    mp_context: BaseContext | None = None,
+) -> dict[str, str]:
+    """Returns {key_origin: xpub}, see DerivationContext.derive_many.
+
+    With workers > 1 the independent subtrees are derived in worker processes (each stretches the
+    seed once). This only pays off for thousands of key origins, a derivation step takes ~0.1 ms.
+    Note: the mnemonic is sent to the worker processes.
+    """
+    key_origins = list(key_origins)
+    subtrees = _independent_subtrees(key_origins)
+    if workers <= 1 or len(subtrees) <= 1:
+        return DerivationContext(mnemonic, network).derive_many(key_origins)
+
+    # the largest subtrees first, each into the currently smallest chunk
+    chunks: list[list[str]] = [[] for _ in range(min(workers, len(subtrees)))]
+    for subtree in sorted(subtrees, key=len, reverse=True):
+        min(chunks, key=len).extend(subtree)
+
+    result: dict[str, str] = {}
+    with ProcessPoolExecutor(
+        max_workers=len(chunks), mp_context=mp_context if mp_context else multiprocessing.get_context("spawn")
+    ) as executor:
+        for xpubs in executor.map(
+            _derive_many_in_worker,
+            [mnemonic] * len(chunks),
+            [network.name] * len(chunks),
+            chunks,
+        ):
+            result.update(xpubs)
+    return result
@@ -0,0 +1,225 @@
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from hwilib.common import Chain
+from hwilib.hwwclient import HardwareWalletClient
+
+logger = logging.getLogger(__name__)
+
+
+SessionKey = tuple[str, str]
+
+
+class DeviceSession:
+    def __init__(self, key: SessionKey, client: HardwareWalletClient, chain: Chain, now: float) -> None:
+        self.key = key
+        self.client = client
+        self.chain = chain
+        self.created_at = now
+        self.last_used = now
+        # held while a USBDevice is using the client
+        self.lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(key={self.key}, chain={self.chain}, last_used={self.last_used})"
+
+
+class DeviceSessionPool:
+    """Keeps initialized HardwareWalletClient handles alive between operations.
+
+    hwi_commands.get_client opens the HID handle, and the first command does
+    the device specific handshake (Trezor refresh_features, BitBox02 noise pairing).
+    Reusing the client for back-to-back operations on the same device skips all of that.
+
+    Sessions are keyed by (device type, device path).
+    A session is closed if
+        - it was not used for max_idle_seconds  (evict_idle)
+        - the device is not listed anymore  (retain_only)
+        - an operation on it failed  (release with healthy=False)
+        - it is discarded  (discard, close_all, or an acquire for another chain)
+
+    A session that is in use is never closed under the running operation: it is removed from the pool
+    and its client is closed when the operation calls release().
+    """
+
+    def __init__(self, max_idle_seconds: float = 60, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_idle_seconds = max_idle_seconds
+        self.clock = clock
+        self._sessions: dict[SessionKey, DeviceSession] = {}
+        # {id(client): session} of the sessions that were removed while in use, closed by release
+        self._retired: dict[int, DeviceSession] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_of(selected_device: dict[str, Any]) -> SessionKey:
+        return (str(selected_device["type"]), str(selected_device["path"]))
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, selected_device: dict[str, Any]) -> bool:
+        return self.key_of(selected_device) in self._sessions
+
+    def _remove(self, session: DeviceSession) -> DeviceSession | None:
+        """Call with self._lock held, after the session was removed from self._sessions.
+
+        Returns the session (with its lock held by the caller) if it can be closed now.
+        A session in use is closed by release instead.
+        """
+        if session.lock.acquire(blocking=False):
+            return session
+        self._retired[id(session.client)] = session
+        return None
+
+    def acquire(
+        self,
+        selected_device: dict[str, Any],
+        chain: Chain,
+        factory: Callable[[], HardwareWalletClient],
+    ) -> HardwareWalletClient:
+        """Returns a warm client for the device, or creates one with factory.
+
+        The session is reserved until release() is called.
+        """
+        self.evict_idle()
+        key = self.key_of(selected_device)
+
+        other_chain_session: DeviceSession | None = None
+        with self._lock:
+            session = self._sessions.get(key)
+            if session and session.chain != chain:
+                # the client was created for a different network
+                other_chain_session = self._remove(self._sessions.pop(key))
+                session = None
+        if other_chain_session:
+            self._close_session(other_chain_session)
+
+        if session:
+            session.lock.acquire()
+            # the session could have been evicted while waiting for the lock
+            if self._sessions.get(key) is session:
+                session.last_used = self.clock()
+                logger.debug(f"Reusing the device session {session}")
+                return session.client
+            session.lock.release()
+
+        client = factory()
+        session = DeviceSession(key=key, client=client, chain=chain, now=self.clock())
+        session.lock.acquire()
+        previous: DeviceSession | None = None
+        with self._lock:
+            previous = self._sessions.get(key)
+            self._sessions[key] = session
+            if previous is not None:
+                previous = self._remove(previous)
+        if previous:
+            self._close_session(previous)
+        logger.debug(f"Created the device session {session}")
+        return client
+
+    def release(self, selected_device: dict[str, Any], client: HardwareWalletClient, healthy=True) -> None:
+        """Hands the client back to the pool.
+
+        If healthy is False (e.g. the operation raised), the client is closed and dropped,
+        such that the next operation starts with a freshly initialized client.
+        """
+        key = self.key_of(selected_device)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None or session.client is not client:
+                # not pooled (anymore), so nobody else will close it
+                session = self._retired.pop(id(client), None)
+                if session is not None and session.client is not client:
+                    session = None
+                retired = True
+            else:
+                retired = not healthy
+                if retired:
+                    self._sessions.pop(key)
+
+        if retired:
+            self._close_client(client)
+        if session is None:
+            return
+        session.last_used = self.clock()
+        # this releases the lock, that the operation took in acquire
+        session.lock.release()
+
+    def discard(self, selected_device: dict[str, Any]) -> bool:
+        "Closes the session of the device (if any). Returns True if a session was removed."
+        with self._lock:
+            session = self._sessions.pop(self.key_of(selected_device), None)
+            if not session:
+                return False
+            closable = self._remove(session)
+        if closable:
+            self._close_session(closable)
+        return True
+
+    def evict_idle(self) -> int:
+        "Closes all sessions that are not in use and idle for longer than max_idle_seconds"
+        now = self.clock()
+        evicted: list[DeviceSession] = []
+        with self._lock:
+            for key, session in list(self._sessions.items()):
+                if now - session.last_used < self.max_idle_seconds:
+                    continue
+                # skip sessions that are currently used
+                if not session.lock.acquire(blocking=False):
+                    continue
+                self._sessions.pop(key)
+                evicted.append(session)
+
+        for session in evicted:
+            logger.debug(f"Evicting the idle device session {session}")
+            self._close_session(session)
+        return len(evicted)
+
+    def retain_only(self, devices: Iterable[dict[str, Any]]) -> int:
+        """Removes the sessions of all devices that are not in devices.
+
+        Call this with a fresh enumeration result to detect disconnected devices.
+        Returns the number of removed sessions.
+        """
+        connected = {self.key_of(device) for device in devices}
+        number_removed = 0
+        disconnected: list[DeviceSession] = []
+        with self._lock:
+            for key in list(self._sessions.keys()):
+                if key in connected:
+                    continue
+                number_removed += 1
+                closable = self._remove(self._sessions.pop(key))
+                if closable:
+                    disconnected.append(closable)
+
+        for session in disconnected:
+            logger.debug(f"The device of session {session} was disconnected")
+            self._close_session(session)
+        return number_removed + self.evict_idle()
+
+    def close_all(self) -> None:
+        "Closes all sessions. The sessions in use are closed when their operation ends"
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            closable = [session for session in sessions if self._remove(session)]
+        for session in closable:
+            self._close_session(session)
+
+    @classmethod
+    def _close_session(cls, session: DeviceSession) -> None:
+        "Closes a session, whose lock is held by the caller (see _remove)"
+        cls._close_client(session.client)
+        session.lock.release()
+
+    @staticmethod
+    def _close_client(client: HardwareWalletClient) -> None:
+        try:
+            client.close()
+        except Exception as e:
+            # the device may already be unplugged
+            logger.debug(f"Closing the client failed: {e}")
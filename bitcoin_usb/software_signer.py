@@ -1,20 +1,58 @@
+import base64
+import hashlib
+import hmac
 import logging
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
 
 import bdkpython as bdk
 from hwilib.descriptor import parse_descriptor
 
 from .address_types import (
     AddressType,
-    AddressTypes,
     DescriptorInfo,
+    DescriptorInfoCache,
+    SimplePubKeyProvider,
     get_all_address_types,
 )
-from .device import BaseDevice
-from .seed_tools import derive
+from .base_device import BaseDevice
+from .psbt_analysis import PSBTAnalysis
+from .psbt_tools import new_signature_keys
+from .seed_tools import DerivationContext, strip_derivation_path
 
 logger = logging.getLogger(__name__)
 
 
+# the defaults of bdk, except try_finalize
+SIGN_OPTIONS_WITHOUT_FINALIZE = bdk.SignOptions(
+    trust_witness_utxo=False,
+    assume_height=None,
+    allow_all_sighashes=False,
+    try_finalize=False,
+    sign_with_tap_internal_key=True,
+    allow_grinding=True,
+)
+
+
+class SoftwareSignResult:
+    def __init__(self, psbt: bdk.Psbt, new_signatures: dict[int, set[str]], finalized: bool) -> None:
+        self.psbt = psbt
+        # {input index: signing keys}  (keys like in psbt_tools.psbt_signature_keys)
+        self.new_signatures = new_signatures
+        # all inputs are finalized (which removes the partial signatures from the psbt)
+        self.finalized = finalized
+
+    @property
+    def signed_inputs(self) -> list[int]:
+        return sorted(self.new_signatures)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.__dict__})"
+
+
 class SoftwareSigner(BaseDevice):
     def __init__(
         self,
@@ -22,39 +60,103 @@ class SoftwareSigner(BaseDevice):
         receive_descriptor: str,
         change_descriptor: str,
         network: bdk.Network,
+        descriptor_cache: DescriptorInfoCache | None = None,
     ) -> None:
         super().__init__(network=network)
         self.mnemonic = mnemonic
+        self.descriptor_cache = descriptor_cache
+        self.receive_descriptor = receive_descriptor
+        self.change_descriptor = change_descriptor
+        self.derivation_context = DerivationContext(mnemonic, network)
+        # built on the first access of self.wallet
+        self._wallet: bdk.Wallet | None = None
+        self._wallet_lock = threading.Lock()
+        self.wiped = False
+        # the checkouts in progress (e.g. signs in other threads), that wipe_when_released waits for
+        self._checkouts = 0
+        self._wipe_on_release = False
 
-        self.wallet = bdk.Wallet(
-            descriptor=self._bdk_descriptor_with_secrets(
-                descriptor_public=receive_descriptor,
-                mnemonic_str=mnemonic,
-                network=network,
-            ),
-            change_descriptor=self._bdk_descriptor_with_secrets(
-                descriptor_public=change_descriptor,
-                mnemonic_str=mnemonic,
-                network=network,
-            ),
-            network=self.network,
-            persister=bdk.Persister.new_in_memory(),
-        )
+    @property
+    def wallet(self) -> bdk.Wallet:
+        with self._wallet_lock:
+            if self.wiped:
+                raise ValueError("The signer was wiped")
+            if self._wallet is None:
+                self._wallet = bdk.Wallet(
+                    descriptor=self._bdk_descriptor_with_secrets(
+                        descriptor_public=self.receive_descriptor,
+                        mnemonic_str=self.mnemonic,
+                        network=self.network,
+                        derivation_context=self.derivation_context,
+                        descriptor_cache=self.descriptor_cache,
+                    ),
+                    change_descriptor=self._bdk_descriptor_with_secrets(
+                        descriptor_public=self.change_descriptor,
+                        mnemonic_str=self.mnemonic,
+                        network=self.network,
+                        derivation_context=self.derivation_context,
+                        descriptor_cache=self.descriptor_cache,
+                    ),
+                    network=self.network,
+                    persister=bdk.Persister.new_in_memory(),
+                )
+            return self._wallet
+
+    def _retain(self) -> None:
+        with self._wallet_lock:
+            if self.wiped:
+                raise ValueError("The signer was wiped")
+            self._checkouts += 1
+
+    def _release(self) -> None:
+        with self._wallet_lock:
+            self._checkouts -= 1
+            wipe = self._wipe_on_release and not self._checkouts
+            if wipe:
+                # no new checkouts until wipe() is done
+                self.wiped = True
+        if wipe:
+            self.wipe()
+
+    @contextmanager
+    def checkout(self) -> Iterator["SoftwareSigner"]:
+        "Within the with block, wipe_when_released doesn't wipe the signer"
+        self._retain()
+        try:
+            yield self
+        finally:
+            self._release()
+
+    def wipe_when_released(self) -> None:
+        "Like wipe, but waits until all checkouts (e.g. signs in other threads) are released"
+        with self._wallet_lock:
+            if self._checkouts:
+                self._wipe_on_release = True
+                return
+        self.wipe()
+
+    def wipe(self) -> None:
+        """Drops the wallet, the mnemonic and all secret keys. The signer cannot sign afterwards.
+
+        Python cannot overwrite the memory of str objects, this only removes the references of the signer.
+        """
+        with self._wallet_lock:
+            self.wiped = True
+            self._wallet = None
+            self.mnemonic = ""
+            self.derivation_context.wipe()
 
     def derive(self, key_origin: str):
-        xpub, fingerprint = derive(self.mnemonic, key_origin, self.network)
+        xpub, fingerprint = self.derivation_context.derive(key_origin)
         return xpub
 
     def get_fingerprint(self) -> str:
-        # it doesn't mattrer which AddressTypes i choose, because the fingerprint is identical for all
-        address_type = AddressTypes.p2wsh
-        xpub, fingerprint = derive(self.mnemonic, address_type.key_origin(self.network), self.network)
-        return fingerprint
+        return self.derivation_context.fingerprint
 
     def get_xpubs(self) -> dict[AddressType, str]:
         xpubs = {}
         for address_type in get_all_address_types():
-            xpub, fingerprint = derive(self.mnemonic, address_type.key_origin(self.network), self.network)
+            xpub, fingerprint = self.derivation_context.derive(address_type.key_origin(self.network))
             xpubs[address_type] = xpub
         return xpubs
 
@@ -64,6 +166,8 @@ class SoftwareSigner(BaseDevice):
         mnemonic_str: str,
         descriptor_public: str,
         network: bdk.Network,
+        derivation_context: DerivationContext | None = None,
+        descriptor_cache: DescriptorInfoCache | None = None,
     ) -> bdk.Descriptor:
         """
         Uses the mnemonic to create a descriptor with secrets from a descriptor without secrets
@@ -76,19 +180,16 @@ class SoftwareSigner(BaseDevice):
             bdk.Descriptor: _description_
         """
 
-        def strip_derivation_path(s: str) -> str:
-            return s[:-2] if s.endswith("/*") else s
-
-        mnemonic = bdk.Mnemonic.from_string(mnemonic_str)
-        root_secret_key = bdk.DescriptorSecretKey(network, mnemonic, "")
-        info = DescriptorInfo.from_str(descriptor_public)
+        if derivation_context is None:
+            derivation_context = DerivationContext(mnemonic_str, network)
+        info = DescriptorInfo.from_str(descriptor_public, cache=descriptor_cache)
 
         # bdk works with hardened_char="'" by default and we need to ensure descriptor_with_secret then also has hardened_char="'"
         # descriptor_with_secret: "wpkh([7c85f2b5/84'/1'/0']tpub..../0/*)"
         descriptor_with_secret = parse_descriptor(descriptor_public).to_string_no_checksum(hardened_char="'")
         for spk_provider in info.spk_providers:
             # derived_secret = "[7c85f2b5/84'/1'/0']tpriv..../*"
-            derived_secret = root_secret_key.derive(bdk.DerivationPath(spk_provider.key_origin))
+            derived_secret = derivation_context.derive_secret(spk_provider.key_origin)
             # derived_pub_str = "[7c85f2b5/84'/1'/0']tpub...."
             derived_pub_str = strip_derivation_path(str(derived_secret.as_public()))
             if spk_provider.xpub in derived_pub_str:
@@ -99,14 +200,30 @@ class SoftwareSigner(BaseDevice):
 
         return bdk.Descriptor(descriptor=descriptor_with_secret, network=network)
 
+    def sign(self, psbt: bdk.Psbt, psbt_bytes: bytes | None = None) -> "SoftwareSignResult":
+        """Signs psbt (in place) and reports which inputs got new signatures for which keys.
+
+        The signatures are compared before finalizing, because finalizing removes them from the inputs.
+        psbt_bytes is the serialized psbt, if the caller has it already.
+        """
+        with self.checkout():
+            wallet = self.wallet
+            if psbt_bytes is None:
+                psbt_bytes = base64.b64decode(psbt.serialize())
+            wallet.sign(psbt=psbt, sign_options=SIGN_OPTIONS_WITHOUT_FINALIZE)
+            new_signatures = new_signature_keys(psbt_bytes, base64.b64decode(psbt.serialize()))
+            finalized = wallet.finalize_psbt(psbt=psbt, sign_options=None)
+        return SoftwareSignResult(psbt=psbt, new_signatures=new_signatures, finalized=finalized)
+
     def sign_psbt(self, psbt: bdk.Psbt) -> bdk.Psbt | None:
+        "The psbt, if it is fully signed or was changed, e.g. by finalizing some of the inputs"
         previous_serialized = psbt.serialize()
-        fully_signed = self.wallet.sign(psbt=psbt, sign_options=None)
-        if fully_signed:
-            return psbt
+        result = self.sign(psbt, psbt_bytes=base64.b64decode(previous_serialized))
+        if result.finalized or result.new_signatures:
+            return result.psbt
         if psbt.serialize() == previous_serialized:
             return None
-        return psbt
+        return result.psbt
 
     def sign_message(self, message: str, bip32_path: str) -> str:
         raise NotImplementedError("")
@@ -116,3 +233,228 @@ class SoftwareSigner(BaseDevice):
         address_descriptor: str,
     ) -> str:
         raise NotImplementedError()
+
+
+class SeedSigner(BaseDevice):
+    """Signs the psbts of any wallet of a seed, without knowing the descriptors.
+
+    The keys are found through the bip32_derivation and tap_key_origins of the inputs.
+    For every account key origin of the seed (the key path without the last 2 levels, e.g. m/48h/1h/0h/2h)
+    a small bdk wallet is built: wpkh(account/0/*) for ecdsa keys and tr(account/0/*) for taproot keys.
+    bdk signs every input, that contains a key of the wallet's xprv, independent of the wallet's descriptor.
+    The max_wallets most recently used account wallets are kept.
+
+    The psbt is not finalized, because the descriptors are unknown.
+    Taproot script path spends are not signed (the tr wallet only signs with the internal key).
+    """
+
+    # the chains (change index), that the account wallets can sign
+    chains = (0, 1)
+
+    def __init__(self, mnemonic: str, network: bdk.Network, max_wallets: int = 32) -> None:
+        super().__init__(network=network)
+        self.derivation_context = DerivationContext(mnemonic, network)
+        self.max_wallets = max_wallets
+        # {(account key origin, is taproot): wallet}
+        self._wallets: OrderedDict[tuple[str, bool], bdk.Wallet] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def derive(self, key_origin: str):
+        xpub, fingerprint = self.derivation_context.derive(key_origin)
+        return xpub
+
+    def get_fingerprint(self) -> str:
+        return self.derivation_context.fingerprint
+
+    def get_xpubs(self) -> dict[AddressType, str]:
+        xpubs = {}
+        for address_type in get_all_address_types():
+            xpub, fingerprint = self.derivation_context.derive(address_type.key_origin(self.network))
+            xpubs[address_type] = xpub
+        return xpubs
+
+    def _account_wallet(self, key_origin: str, is_taproot: bool) -> bdk.Wallet:
+        key = (key_origin, is_taproot)
+        wallet = self._wallets.get(key)
+        if wallet is not None:
+            self._wallets.move_to_end(key)
+            return wallet
+
+        # account_secret = "[7c85f2b5/48'/1'/0'/2']tprv...."
+        account_secret = strip_derivation_path(str(self.derivation_context.derive_secret(key_origin)))
+        template = "tr" if is_taproot else "wpkh"
+        receive_chain, change_chain = self.chains
+        wallet = bdk.Wallet(
+            descriptor=bdk.Descriptor(f"{template}({account_secret}/{receive_chain}/*)", self.network),
+            change_descriptor=bdk.Descriptor(f"{template}({account_secret}/{change_chain}/*)", self.network),
+            network=self.network,
+            persister=bdk.Persister.new_in_memory(),
+        )
+        self._wallets[key] = wallet
+        while len(self._wallets) > self.max_wallets:
+            (evicted_key_origin, _), _ = self._wallets.popitem(last=False)
+            if all(evicted_key_origin != key_origin for key_origin, _ in self._wallets):
+                self.derivation_context.discard(evicted_key_origin)
+        return wallet
+
+    def account_key_origins(self, psbt: bdk.Psbt) -> set[tuple[str, bool]]:
+        "The (account key origin, is taproot) of the own keys, that still need to sign"
+        analysis = PSBTAnalysis.of(psbt)
+        fingerprint = SimplePubKeyProvider.format_fingerprint(self.get_fingerprint())
+        missing_inputs = analysis.missing_inputs(fingerprint)
+        result: set[tuple[str, bool]] = set()
+        for key_origin in analysis.key_origins:
+            if key_origin.fingerprint != fingerprint or key_origin.input_index not in missing_inputs:
+                continue
+            levels = key_origin.path.split("/")
+            if len(levels) < 3 or not levels[-2].isdigit() or int(levels[-2]) not in self.chains:
+                logger.debug(f"Cannot sign {key_origin}, it is not on a receive or change chain")
+                continue
+            # x-only pubkeys (32 bytes) are taproot keys
+            result.add((key_origin.key_origin, len(key_origin.pubkey) == 64))
+        return result
+
+    def sign(self, psbt: bdk.Psbt, psbt_bytes: bytes | None = None) -> SoftwareSignResult:
+        """Signs psbt (in place) with the account wallets of all own keys in psbt.
+
+        psbt_bytes is the serialized psbt, if the caller has it already.
+        """
+        with self._lock:
+            wallets = [
+                self._account_wallet(key_origin, is_taproot)
+                for key_origin, is_taproot in sorted(self.account_key_origins(psbt))
+            ]
+        if not wallets:
+            return SoftwareSignResult(psbt=psbt, new_signatures={}, finalized=False)
+
+        if psbt_bytes is None:
+            psbt_bytes = base64.b64decode(psbt.serialize())
+        for wallet in wallets:
+            wallet.sign(psbt=psbt, sign_options=SIGN_OPTIONS_WITHOUT_FINALIZE)
+        new_signatures = new_signature_keys(psbt_bytes, base64.b64decode(psbt.serialize()))
+        return SoftwareSignResult(psbt=psbt, new_signatures=new_signatures, finalized=False)
+
+    def sign_psbt(self, psbt: bdk.Psbt) -> bdk.Psbt | None:
+        result = self.sign(psbt)
+        return result.psbt if result.new_signatures else None
+
+    def sign_message(self, message: str, bip32_path: str) -> str:
+        raise NotImplementedError("")
+
+    def display_address(
+        self,
+        address_descriptor: str,
+    ) -> str:
+        raise NotImplementedError()
+
+
+SignerKey = tuple[bytes, str, str, str]
+
+
+class SoftwareSignerRegistry:
+    """Reuses SoftwareSigners (and their wallets) across requests.
+
+    Signers are keyed by (mnemonic digest, receive descriptor, change descriptor, network).
+    The registry keeps the maxsize most recently used signers and wipes the evicted ones,
+    so a signer must not be kept by the caller beyond the current request.
+    Concurrent services should use checkout(): an evicted signer is only wiped after its checkouts
+    (and signs in progress) are released.
+
+    The mnemonic digest is keyed with a random secret of the registry, so it cannot be brute forced
+    from the key alone.
+    """
+
+    def __init__(self, maxsize: int = 16, signer_class: type[SoftwareSigner] = SoftwareSigner) -> None:
+        self.maxsize = maxsize
+        self.signer_class = signer_class
+        self._signers: OrderedDict[SignerKey, SoftwareSigner] = OrderedDict()
+        self._secret = os.urandom(32)
+        self._lock = threading.Lock()
+
+    def key_of(
+        self, mnemonic: str, receive_descriptor: str, change_descriptor: str, network: bdk.Network
+    ) -> SignerKey:
+        normalized_mnemonic = " ".join(mnemonic.split())
+        digest = hmac.new(self._secret, normalized_mnemonic.encode(), hashlib.sha256).digest()
+        return (digest, receive_descriptor, change_descriptor, network.name)
+
+    def get(
+        self, mnemonic: str, receive_descriptor: str, change_descriptor: str, network: bdk.Network
+    ) -> SoftwareSigner:
+        "Returns the registered signer, or creates one (its wallet is only built on the first sign)"
+        return self._get(mnemonic, receive_descriptor, change_descriptor, network, retain=False)
+
+    @contextmanager
+    def checkout(
+        self, mnemonic: str, receive_descriptor: str, change_descriptor: str, network: bdk.Network
+    ) -> Iterator[SoftwareSigner]:
+        "Like get, but the signer is not wiped (e.g. evicted by another thread) within the with block"
+        signer = self._get(mnemonic, receive_descriptor, change_descriptor, network, retain=True)
+        try:
+            yield signer
+        finally:
+            signer._release()
+
+    def _get(
+        self,
+        mnemonic: str,
+        receive_descriptor: str,
+        change_descriptor: str,
+        network: bdk.Network,
+        retain: bool,
+    ) -> SoftwareSigner:
+        "retain: checks the signer out, while it is registered (so it cannot be wiped in between)"
+        key = self.key_of(mnemonic, receive_descriptor, change_descriptor, network)
+        with self._lock:
+            signer = self._signers.get(key)
+            if signer is not None:
+                self._signers.move_to_end(key)
+                if retain:
+                    signer._retain()
+                return signer
+
+        signer = self.signer_class(
+            mnemonic=mnemonic,
+            receive_descriptor=receive_descriptor,
+            change_descriptor=change_descriptor,
+            network=network,
+        )
+        evicted: list[SoftwareSigner] = []
+        with self._lock:
+            # another thread may have created the same signer in the meantime
+            existing = self._signers.get(key)
+            if existing is not None:
+                self._signers.move_to_end(key)
+                evicted.append(signer)
+                signer = existing
+            else:
+                self._signers[key] = signer
+                while len(self._signers) > self.maxsize:
+                    evicted.append(self._signers.popitem(last=False)[1])
+            if retain:
+                signer._retain()
+        for evicted_signer in evicted:
+            evicted_signer.wipe_when_released()
+        return signer
+
+    def remove(
+        self, mnemonic: str, receive_descriptor: str, change_descriptor: str, network: bdk.Network
+    ) -> None:
+        with self._lock:
+            signer = self._signers.pop(
+                self.key_of(mnemonic, receive_descriptor, change_descriptor, network), None
+            )
+        if signer is not None:
+            signer.wipe_when_released()
+
+    def clear(self) -> None:
+        "Wipes all signers (the checked out ones when they are released)"
+        with self._lock:
+            signers = list(self._signers.values())
+            self._signers.clear()
+        for signer in signers:
+            signer.wipe_when_released()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._signers)
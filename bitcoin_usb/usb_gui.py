@@ -2,6 +2,7 @@ import logging
 import platform
 import re
 import tempfile
+from collections.abc import Iterable
 from functools import partial
 from pathlib import Path
 from typing import Any, cast
@@ -13,15 +14,20 @@ from bitcoin_safe_lib.gui.qt.signal_tracker import SignalProtocol
 from bitcoin_safe_lib.gui.qt.util import question_dialog
 from bitcoin_safe_lib.util_os import xdg_open_file
 from hwilib.devices.bitbox02 import Bitbox02Client
-from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
 from PyQt6.QtWidgets import QMessageBox, QPushButton
 
-from bitcoin_usb.address_types import AddressType
+from bitcoin_usb.address_types import AddressType, DescriptorInfoCache
+from bitcoin_usb.device_watcher import DeviceWatcher
 from bitcoin_usb.dialogs import DeviceDialog, ThreadedWaitingDialog, get_message_box
 from bitcoin_usb.hwi_quick import HWIQuick
+from bitcoin_usb.multi_signer import MultiSignResult, sign_with_all
+from bitcoin_usb.parallel_enumerator import ParallelHWIEnumerator
+from bitcoin_usb.session_pool import DeviceSessionPool
 from bitcoin_usb.util import run_device_task
+from bitcoin_usb.xpub_cache import XpubCache
 
-from .device import USBDevice, bdknetwork_to_chain
+from .device import USBDevice, XpubBatchResult, bdknetwork_to_chain
 from .i18n import translate
 
 logger = logging.getLogger(__name__)
@@ -49,6 +55,8 @@ class USBMultisigRegisteringNotSupported(Exception):
 
 class USBGui(QObject):
     signal_end_hwi_blocker = cast(SignalProtocol[[]], pyqtSignal())
+    # (added, removed, devices), only emitted if a device_watcher is given
+    signal_devices_changed = cast(SignalProtocol[[list, list, list]], pyqtSignal(list, list, list))
 
     def __init__(
         self,
@@ -58,7 +66,27 @@ class USBGui(QObject):
         autoselect_if_1_device=False,
         initalization_label="",
         parent=None,
+        session_idle_timeout: float | None = None,
+        xpub_cache: XpubCache | None = None,
+        device_watcher: DeviceWatcher | None = None,
+        hwi_enumerator: ParallelHWIEnumerator | None = None,
+        descriptor_cache: DescriptorInfoCache | None = None,
     ) -> None:
+        """
+        Args:
+            session_idle_timeout (float | None): Opt-in. Seconds an initialized device client is kept open
+                after an operation, such that the next operation on the same device skips the
+                initialization.  While a client is open, other apps (e.g. the vendor app) cannot use the device.
+                None (default) closes the client after every operation.
+            xpub_cache (XpubCache | None): If given, xpubs are retrieved from the device only once
+                per (fingerprint, key_origin, network).
+            device_watcher (DeviceWatcher | None): If given (and started), get_devices answers from
+                its cached device list instead of enumerating the devices again.
+            hwi_enumerator (ParallelHWIEnumerator | None): If given, slow_hwi_listing queries the
+                vendors in parallel and caches the result shortly.  Otherwise hwi_commands.enumerate is used.
+            descriptor_cache (DescriptorInfoCache | None): If given, the parsed address descriptors
+                (e.g. of display_address) are memoised.
+        """
         super().__init__()
         self.autoselect_if_1_device = autoselect_if_1_device
         self.network = network
@@ -66,10 +94,54 @@ class USBGui(QObject):
         self._parent = parent
         self.initalization_label = clean_string(initalization_label)
         self.allow_emulators_only_for_testnet_works = allow_emulators_only_for_testnet_works
+        self.xpub_cache = xpub_cache
+        self.descriptor_cache = descriptor_cache
+
+        self.session_pool: DeviceSessionPool | None = None
+        self.timer_evict_sessions: QTimer | None = None
+        if session_idle_timeout is not None:
+            self.session_pool = DeviceSessionPool(max_idle_seconds=session_idle_timeout)
+            self.timer_evict_sessions = QTimer(self)
+            self.timer_evict_sessions.setInterval(max(int(session_idle_timeout * 1000 / 2), 1000))
+            self.timer_evict_sessions.timeout.connect(self.session_pool.evict_idle)
+            self.timer_evict_sessions.start()
+
+        self.hwi_enumerator = hwi_enumerator
+        self.device_watcher = device_watcher
+        if self.device_watcher is not None:
+            # the watcher calls from its own thread. The signal delivers it to the thread of the receivers
+            self.device_watcher.add_listener(self.signal_devices_changed.emit)
+            self.signal_devices_changed.connect(self._on_devices_changed)
+
+    def _on_devices_changed(
+        self, added: list[dict[str, Any]], removed: list[dict[str, Any]], devices: list[dict[str, Any]]
+    ) -> None:
+        if self.hwi_enumerator is not None:
+            self.hwi_enumerator.invalidate()
+        if removed and self.session_pool is not None:
+            # close the sessions of unplugged devices
+            self.session_pool.retain_only(devices)
 
     def set_initalization_label(self, value: str):
         self.initalization_label = clean_string(value)
 
+    def _usb_device(self, selected_device: dict[str, Any], in_worker_thread=False) -> USBDevice:
+        return USBDevice(
+            selected_device=selected_device,
+            network=self.network,
+            # a worker thread must not spin a Qt event loop, it can block itself
+            loop_in_thread=None if in_worker_thread else self.loop_in_thread,
+            initalization_label=self.initalization_label,
+            session_pool=self.session_pool,
+            xpub_cache=self.xpub_cache,
+            descriptor_cache=self.descriptor_cache,
+        )
+
+    def close_sessions(self) -> None:
+        "Closes all device clients that are kept open (the ones in use, after their operation)"
+        if self.session_pool is not None:
+            self.session_pool.close_all()
+
     def get_devices(self, slow_hwi_listing=False) -> list[dict[str, Any]]:
         "Returns the found devices WITHOUT unlocking them first.  Misses the fingerprints"
         allow_emulators = False
@@ -84,19 +156,40 @@ class USBGui(QObject):
                         bdk.Network.TESTNET,
                         bdk.Network.SIGNET,
                     ]
+                chain = bdknetwork_to_chain(self.network)
 
-                devices = ThreadedWaitingDialog(
-                    partial(
-                        hwi_commands.enumerate,
-                        allow_emulators=allow_emulators,
-                        chain=bdknetwork_to_chain(self.network),
-                    ),
-                    title=self.tr("Unlock USB devices"),
-                    message=self.tr("Please unlock USB devices"),
-                ).get_result()
+                cached_devices = (
+                    self.hwi_enumerator.cached(chain=chain, allow_emulators=allow_emulators)
+                    if self.hwi_enumerator is not None
+                    else None
+                )
+                if cached_devices is not None:
+                    devices = cached_devices
+                else:
+                    # enumerating opens every device, which must not compete with open sessions.
+                    # Sessions in use are closed when their operation ends.
+                    self.close_sessions()
+                    devices = ThreadedWaitingDialog(
+                        partial(
+                            (
+                                self.hwi_enumerator.enumerate
+                                if self.hwi_enumerator is not None
+                                else hwi_commands.enumerate
+                            ),
+                            allow_emulators=allow_emulators,
+                            chain=chain,
+                        ),
+                        title=self.tr("Unlock USB devices"),
+                        message=self.tr("Please unlock USB devices"),
+                    ).get_result()
+            elif self.device_watcher is not None and self.device_watcher.is_running:
+                devices = self.device_watcher.get_devices()
             else:
                 devices = HWIQuick(network=self.network).enumerate()
 
+            if self.session_pool is not None:
+                # close the sessions of unplugged devices
+                self.session_pool.retain_only(devices)
         except Exception as e:
             logger.error(str(e))
         return devices
@@ -145,12 +238,7 @@ class USBGui(QObject):
             return None
 
         try:
-            with USBDevice(
-                selected_device=selected_device,
-                network=self.network,
-                loop_in_thread=self.loop_in_thread,
-                initalization_label=self.initalization_label,
-            ) as dev:
+            with self._usb_device(selected_device) as dev:
                 return run_device_task(loop_in_thread=self.loop_in_thread, task=partial(dev.sign_psbt, psbt))
         except Exception as e:
             if not self.handle_exception_sign(e):
@@ -160,6 +248,64 @@ class USBGui(QObject):
 
         return None
 
+    def sign_many(self, psbts: Iterable[bdk.Psbt], slow_hwi_listing=False) -> list[bdk.Psbt]:
+        """Signs all psbts with 1 device in 1 session (1 unlock) and returns the signed psbts.
+
+        The signing stops when the user rejects a psbt on the device, so fewer psbts than given can be returned.
+        The device is closed (and signal_end_hwi_blocker emitted) before this returns.
+        """
+        selected_device = self.get_device(slow_hwi_listing=slow_hwi_listing)
+        if not selected_device:
+            return []
+
+        signed_psbts: list[bdk.Psbt] = []
+        try:
+            with self._usb_device(selected_device) as dev:
+                psbt_iterator = dev.sign_many(psbts)
+                # 1 device task per psbt, such that the gui stays responsive between the psbts
+                while True:
+                    signed_psbt = run_device_task(
+                        loop_in_thread=self.loop_in_thread, task=partial(next, psbt_iterator, None)
+                    )
+                    if signed_psbt is None:
+                        break
+                    signed_psbts.append(signed_psbt)
+        except Exception as e:
+            if not self.handle_exception_sign(e):
+                raise
+        finally:
+            self.signal_end_hwi_blocker.emit()
+        return signed_psbts
+
+    def sign_with_all(self, psbt: bdk.Psbt, slow_hwi_listing=False) -> MultiSignResult | None:
+        """Signs with all connected devices that hold a key of the psbt (concurrently)
+        and returns the combined psbt, with the latency and errors per device."""
+        devices = self.get_devices(slow_hwi_listing=slow_hwi_listing)
+        if not devices:
+            get_message_box(
+                translate("bitcoin_usb", "No USB devices found"),
+                title=translate("bitcoin_usb", "USB Devices"),
+            ).exec()
+            self.signal_end_hwi_blocker.emit()
+            return None
+
+        try:
+            return run_device_task(
+                loop_in_thread=self.loop_in_thread,
+                task=partial(
+                    sign_with_all,
+                    psbt,
+                    devices,
+                    open_device=partial(self._usb_device, in_worker_thread=True),
+                ),
+            )
+        except Exception as e:
+            if not self.handle_exception_sign(e):
+                raise
+        finally:
+            self.signal_end_hwi_blocker.emit()
+        return None
+
     def get_fingerprint_and_xpubs(
         self, slow_hwi_listing=False
     ) -> tuple[dict[str, Any], str, dict[AddressType, str]] | None:
@@ -168,12 +314,7 @@ class USBGui(QObject):
             return None
 
         try:
-            with USBDevice(
-                selected_device=selected_device,
-                network=self.network,
-                loop_in_thread=self.loop_in_thread,
-                initalization_label=self.initalization_label,
-            ) as dev:
+            with self._usb_device(selected_device) as dev:
 
                 def f():
                     return (selected_device, dev.get_fingerprint(), dev.get_xpubs())
@@ -194,12 +335,7 @@ class USBGui(QObject):
             return None
 
         try:
-            with USBDevice(
-                selected_device=selected_device,
-                network=self.network,
-                loop_in_thread=self.loop_in_thread,
-                initalization_label=self.initalization_label,
-            ) as dev:
+            with self._usb_device(selected_device) as dev:
 
                 def f():
                     return (selected_device, dev.get_fingerprint(), dev.get_xpub(key_origin))
@@ -212,18 +348,35 @@ class USBGui(QObject):
             self.signal_end_hwi_blocker.emit()
         return None
 
+    def get_fingerprint_and_xpubs_batch(
+        self, key_origins: list[str], slow_hwi_listing=False
+    ) -> tuple[dict[str, Any], str, XpubBatchResult] | None:
+        "Retrieves the xpubs of many key_origins (e.g. from get_key_origins) in 1 device session"
+        selected_device = self.get_device(slow_hwi_listing=slow_hwi_listing)
+        if not selected_device:
+            return None
+
+        try:
+            with self._usb_device(selected_device) as dev:
+
+                def f():
+                    return (selected_device, dev.get_fingerprint(), dev.get_xpubs_batch(key_origins))
+
+                return run_device_task(loop_in_thread=self.loop_in_thread, task=f)
+        except Exception as e:
+            if not self.handle_exception_get_fingerprint_and_xpubs(e):
+                raise
+        finally:
+            self.signal_end_hwi_blocker.emit()
+        return None
+
     def sign_message(self, message: str, bip32_path: str, slow_hwi_listing=False) -> str | None:
         selected_device = self.get_device(slow_hwi_listing=slow_hwi_listing)
         if not selected_device:
             return None
 
         try:
-            with USBDevice(
-                selected_device=selected_device,
-                network=self.network,
-                loop_in_thread=self.loop_in_thread,
-                initalization_label=self.initalization_label,
-            ) as dev:
+            with self._usb_device(selected_device) as dev:
                 return run_device_task(
                     loop_in_thread=self.loop_in_thread, task=partial(dev.sign_message, message, bip32_path)
                 )
@@ -240,12 +393,7 @@ class USBGui(QObject):
             return None
 
         try:
-            with USBDevice(
-                selected_device=selected_device,
-                network=self.network,
-                loop_in_thread=self.loop_in_thread,
-                initalization_label=self.initalization_label,
-            ) as dev:
+            with self._usb_device(selected_device) as dev:
                 return run_device_task(
                     loop_in_thread=self.loop_in_thread, task=partial(dev.display_address, address_descriptor)
                 )
@@ -261,13 +409,11 @@ class USBGui(QObject):
         if not selected_device:
             return None
 
+        if self.hwi_enumerator is not None:
+            # the fingerprint changes
+            self.hwi_enumerator.invalidate()
         try:
-            with USBDevice(
-                selected_device=selected_device,
-                network=self.network,
-                loop_in_thread=self.loop_in_thread,
-                initalization_label=self.initalization_label,
-            ) as dev:
+            with self._usb_device(selected_device) as dev:
                 return run_device_task(loop_in_thread=self.loop_in_thread, task=dev.wipe_device)
         except Exception as e:
             if not self.handle_exception_wipe(e):
@@ -282,12 +428,7 @@ class USBGui(QObject):
             return None
 
         try:
-            with USBDevice(
-                selected_device=selected_device,
-                network=self.network,
-                loop_in_thread=self.loop_in_thread,
-                initalization_label=self.initalization_label,
-            ) as dev:
+            with self._usb_device(selected_device) as dev:
                 if isinstance(dev.client, Bitbox02Client):
                     return run_device_task(
                         loop_in_thread=self.loop_in_thread, task=partial(dev.write_down_seed, dev.client)
@@ -318,12 +459,7 @@ class USBGui(QObject):
             )
 
         try:
-            with USBDevice(
-                selected_device=selected_device,
-                network=self.network,
-                loop_in_thread=self.loop_in_thread,
-                initalization_label=self.initalization_label,
-            ) as dev:
+            with self._usb_device(selected_device) as dev:
                 return run_device_task(
                     loop_in_thread=self.loop_in_thread, task=partial(dev.display_address, address_descriptor)
                 )
@@ -336,6 +472,8 @@ class USBGui(QObject):
 
     def set_network(self, network: bdk.Network):
         self.network = network
+        # the clients were created for the old network
+        self.close_sessions()
 
     def handle_exception_get_fingerprint_and_xpubs(self, exception: Exception) -> bool:
         self.show_error_message(str(exception))
@@ -3,10 +3,10 @@ import logging
 import subprocess
 import sys
 from collections.abc import Callable
-from typing import TypeVar
+from typing import TYPE_CHECKING, TypeVar
 
-from bitcoin_safe_lib.async_tools.loop_in_thread import LoopInThread
-from PyQt6.QtCore import QEventLoop
+if TYPE_CHECKING:
+    from bitcoin_safe_lib.async_tools.loop_in_thread import LoopInThread
 
 logger = logging.getLogger(__name__)
 
@@ -35,10 +35,13 @@ def run_script(script_name, args: list[str]):
     return stdout, stderr
 
 
-def run_device_task(loop_in_thread: LoopInThread | None, task: Callable[[], T]) -> T | None:
+def run_device_task(loop_in_thread: "LoopInThread | None", task: Callable[[], T]) -> T | None:
     if not loop_in_thread:
         return task()
 
+    # imported here, such that util can be used without Qt
+    from PyQt6.QtCore import QEventLoop
+
     loop = QEventLoop()
     done = False
     result: list[T] = []
@@ -0,0 +1,104 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+import bdkpython as bdk
+
+from .address_types import SimplePubKeyProvider
+
+logger = logging.getLogger(__name__)
+
+
+class XpubCache:
+    """Stores xpubs by (fingerprint, key_origin, network).
+
+    The xpub at a key_origin never changes for a given seed (identified by its master fingerprint),
+    so a device only needs to be asked once.
+
+    If path is given, the cache is persisted as a small json file.
+    Note: xpubs are privacy sensitive (they reveal all addresses of a wallet).
+    """
+
+    version = 1
+
+    def __init__(self, path: Path | str | None = None) -> None:
+        self.path = Path(path) if path else None
+        # {fingerprint: {network_name: {key_origin: xpub}}}
+        self._data: dict[str, dict[str, dict[str, str]]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def _normalize(fingerprint: str, key_origin: str) -> tuple[str, str]:
+        return (
+            SimplePubKeyProvider.format_fingerprint(fingerprint),
+            SimplePubKeyProvider.format_key_origin(key_origin),
+        )
+
+    def get(self, fingerprint: str, key_origin: str, network: bdk.Network) -> str | None:
+        fingerprint, key_origin = self._normalize(fingerprint, key_origin)
+        with self._lock:
+            return self._data.get(fingerprint, {}).get(network.name, {}).get(key_origin)
+
+    def set(self, fingerprint: str, key_origin: str, network: bdk.Network, xpub: str) -> None:
+        fingerprint, key_origin = self._normalize(fingerprint, key_origin)
+        with self._lock:
+            network_entries = self._data.setdefault(fingerprint, {}).setdefault(network.name, {})
+            if network_entries.get(key_origin) == xpub:
+                return
+            network_entries[key_origin] = xpub
+            self._dirty = True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(
+                len(network_entries)
+                for networks in self._data.values()
+                for network_entries in networks.values()
+            )
+
+    def invalidate(self, fingerprint: str | None = None) -> None:
+        """Removes all entries of fingerprint (or all entries if fingerprint is None)
+        and writes the cache immediately.
+
+        Call this whenever the seed behind a fingerprint may have changed, e.g. on wipe_device.
+        """
+        with self._lock:
+            if fingerprint is None:
+                self._data.clear()
+            else:
+                self._data.pop(SimplePubKeyProvider.format_fingerprint(fingerprint), None)
+            self._dirty = True
+        self.flush()
+
+    def flush(self) -> None:
+        "Writes the cache to path, if anything changed"
+        with self._lock:
+            if not self._dirty or not self.path:
+                self._dirty = False
+                return
+            content = json.dumps({"version": self.version, "xpubs": self._data}, indent=2, sort_keys=True)
+            self._dirty = False
+
+        # write atomically, such that a crash never leaves a half written file
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_text(content)
+        os.replace(tmp_path, self.path)
+
+    def _load(self) -> None:
+        if not self.path or not self.path.exists():
+            return
+        try:
+            content = json.loads(self.path.read_text())
+            if content.get("version") != self.version:
+                logger.warning(
+                    f"Ignoring {self.path}, because of the unknown version {content.get('version')}"
+                )
+                return
+            self._data = content["xpubs"]
+        except Exception as e:
+            logger.warning(f"Could not load the xpub cache {self.path}: {e}")
@@ -0,0 +1,64 @@
+import importlib
+from typing import Any
+
+import bdkpython as bdk
+import pytest
+
+from bitcoin_usb.address_types import AddressTypes, DescriptorInfo
+from bitcoin_usb.seed_tools import derive_spk_provider
+
+# The CI also runs these benchmarks against the code of the base commit of a pull request, which can
+# lack newer APIs.  So this module only imports long existing APIs, and the benchmarks get everything
+# else with require, which skips the benchmark if the code doesn't provide it.
+
+network = bdk.Network.REGTEST
+
+# the numbers of cosigners of the benchmarked multisig descriptors
+COSIGNERS = [1, 3, 5]
+
+# 5 cosigners need 5 seeds.  The first 3 are the seeds of tests/test_multi_signer.py
+all_seeds = [
+    "spider manual inform reject arch raccoon betray moon document across main build",
+    "similar seek stock parent depart rug adjust acoustic oppose sell roast hockey",
+    "debris yellow child maze hen lamp law venue pluck ketchup melody sick",
+    "abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon about",
+    "legal winner thank year wave sausage worth useful legal winner thank yellow",
+]
+seeds = all_seeds[:3]
+
+
+def require(module: str, *names: str) -> Any:
+    """The attributes names (e.g. "SoftwareSigner" or "SoftwareSigner.wipe") of module.
+
+    Skips the benchmark (or the benchmark module, if called at module level) if they don't exist.
+    Returns a tuple for several names.
+    """
+    try:
+        values = []
+        for name in names:
+            value: Any = importlib.import_module(module)
+            for attribute in name.split("."):
+                value = getattr(value, attribute)
+            values.append(value)
+    except (ImportError, AttributeError) as e:
+        pytest.skip(f"Not supported by this code: {e}", allow_module_level=True)
+    return values[0] if len(values) == 1 else tuple(values)
+
+
+def multisig_descriptor(number_cosigners: int, derivation_path: str = "/0/*") -> str:
+    address_type = AddressTypes.p2wsh
+    spk_providers = [
+        derive_spk_provider(seed, address_type.key_origin(network), network, derivation_path=derivation_path)
+        for seed in all_seeds[:number_cosigners]
+    ]
+    return DescriptorInfo(
+        address_type=address_type,
+        spk_providers=spk_providers,
+        threshold=(number_cosigners + 1) // 2,
+    ).get_descriptor_str(network)
+
+
+@pytest.fixture(scope="session", params=COSIGNERS, ids=lambda n: f"{n}_cosigners")
+def multisig_descriptors(request) -> tuple[str, str]:
+    "(receive descriptor, change descriptor)"
+    return multisig_descriptor(request.param), multisig_descriptor(request.param, derivation_path="/1/*")
@@ -0,0 +1,168 @@
+import tracemalloc
+from collections.abc import Callable
+
+import bdkpython as bdk
+import pytest
+from hwilib.descriptor import parse_descriptor
+
+pytest.importorskip("pytest_benchmark")
+
+from bitcoin_usb.address_types import (  # noqa: E402
+    AddressTypes,
+    DescriptorInfo,
+    SimplePubKeyProvider,
+    _find_matching_address_type,
+    _get_descriptor_instances,
+    get_all_address_types,
+)
+from bitcoin_usb.seed_tools import derive, derive_spk_provider  # noqa: E402
+
+from .conftest import network, require, seeds  # noqa: E402
+
+single_sig_types = [AddressTypes.p2pkh, AddressTypes.p2sh_p2wpkh, AddressTypes.p2wpkh, AddressTypes.p2tr]
+
+
+def test_descriptor_info_from_str(benchmark, multisig_descriptors):
+    receive_descriptor, _ = multisig_descriptors
+    info = benchmark(DescriptorInfo.from_str, receive_descriptor)
+    assert info.address_type.name == AddressTypes.p2wsh.name
+
+
+def test_get_descriptor_str(benchmark, multisig_descriptors):
+    info = DescriptorInfo.from_str(multisig_descriptors[0])
+    assert benchmark(info.get_descriptor_str, network)
+
+
+@pytest.mark.parametrize("address_type", single_sig_types, ids=lambda a: a.short_name)
+def test_single_sig_descriptor_info_from_str(benchmark, address_type):
+    spk_provider = derive_spk_provider(seeds[0], address_type.key_origin(network), network)
+    descriptor = DescriptorInfo(address_type, [spk_provider]).get_descriptor_str(network)
+    info = benchmark(DescriptorInfo.from_str, descriptor)
+    assert info.address_type.name == address_type.name
+
+
+@pytest.mark.parametrize("account", [0, 1000])
+def test_derive(benchmark, account):
+    require("bitcoin_usb.address_types", "AddressType.key_origin_of_account")
+    key_origin = AddressTypes.p2wsh.key_origin_of_account(network, account)
+    xpub, fingerprint = benchmark(derive, seeds[0], key_origin, network)
+    assert fingerprint == "7c85f2b5"
+
+
+@pytest.mark.parametrize("account", [0, 1000])
+def test_derivation_context_derive(benchmark, account):
+    "The seed is stretched once, every round derives a new key origin"
+    DerivationContext = require("bitcoin_usb.seed_tools", "DerivationContext")
+    context = DerivationContext(seeds[0], network)
+    key_origins = (AddressTypes.p2wsh.key_origin_of_account(network, account + i) for i in range(10**6))
+
+    xpub, fingerprint = benchmark(lambda: context.derive(next(key_origins)))
+    assert fingerprint == "7c85f2b5"
+
+
+@pytest.mark.parametrize("number_accounts", [1, 10, 50])
+@pytest.mark.parametrize("tree", [False, True], ids=["one_by_one", "tree"])
+def test_derive_many(benchmark, number_accounts, tree):
+    "All address types for number_accounts accounts, derived one by one or as a tree"
+    DerivationContext = require("bitcoin_usb.seed_tools", "DerivationContext")
+    get_key_origins = require("bitcoin_usb.address_types", "get_key_origins")
+    key_origins = get_key_origins(network, accounts=range(number_accounts))
+
+    def run() -> dict[str, str]:
+        context = DerivationContext(seeds[0], network)
+        if tree:
+            return context.derive_many(key_origins)
+        return {key_origin: context.derive(key_origin)[0] for key_origin in key_origins}
+
+    assert len(benchmark(run)) == len(key_origins)
+
+
+@pytest.mark.parametrize("number_providers", [1, 10, 100])
+def test_simple_pubkey_provider(benchmark, number_providers):
+    require("bitcoin_usb.address_types", "AddressType.key_origin_of_account")
+    spk_provider = derive_spk_provider(seeds[0], AddressTypes.p2wsh.key_origin(network), network)
+    args = [
+        (
+            spk_provider.xpub,
+            spk_provider.fingerprint.lower(),
+            AddressTypes.p2wsh.key_origin_of_account(network, account).replace("h", "'"),
+        )
+        for account in range(number_providers)
+    ]
+
+    def parse() -> list[SimplePubKeyProvider]:
+        return [SimplePubKeyProvider(*arg) for arg in args]
+
+    assert len(benchmark(parse)) == number_providers
+
+
+@pytest.mark.parametrize("number_addresses", [100, 1000])
+def test_address_generator(benchmark, multisig_descriptors, number_addresses):
+    AddressGenerator = require("bitcoin_usb.address_generator", "AddressGenerator")
+    descriptor_info = DescriptorInfo.from_str(multisig_descriptors[0])
+
+    def run():
+        return AddressGenerator(descriptor_info, network).receive_addresses(0, number_addresses)
+
+    assert len(benchmark(run)) == number_addresses
+
+
+def test_derive_address_without_chain_node(benchmark, multisig_descriptors):
+    "The baseline of test_address_generator: bdk derives every address from the account xpubs"
+    descriptor = bdk.Descriptor(multisig_descriptors[0], network)
+    benchmark(lambda: [descriptor.derive_address(index, network) for index in range(100)])
+
+
+def test_descriptor_info_from_str_cached(benchmark, multisig_descriptors):
+    DescriptorInfoCache = require("bitcoin_usb.address_types", "DescriptorInfoCache")
+    cache = DescriptorInfoCache()
+    info = benchmark(DescriptorInfo.from_str, multisig_descriptors[0], cache=cache)
+    assert info.address_type.name == AddressTypes.p2wsh.name
+
+
+def test_get_descriptor_str_cached(benchmark, multisig_descriptors):
+    DescriptorInfoCache = require("bitcoin_usb.address_types", "DescriptorInfoCache")
+    cache = DescriptorInfoCache()
+    info = DescriptorInfo.from_str(multisig_descriptors[0])
+    assert benchmark(info.get_descriptor_str, network, cache=cache)
+
+
+@pytest.mark.parametrize("value_type", [SimplePubKeyProvider, DescriptorInfo], ids=lambda t: t.__name__)
+def test_value_type(benchmark, value_type):
+    "The construction time, and the memory per instance (in extra_info), when holding many instances"
+    spk_providers = [
+        derive_spk_provider(seed, AddressTypes.p2wsh.key_origin(network), network) for seed in seeds
+    ]
+    info = DescriptorInfo(AddressTypes.p2wsh, spk_providers, threshold=2)
+    spk_provider = spk_providers[0]
+    create: Callable[[], object] = (
+        (lambda: SimplePubKeyProvider(spk_provider.xpub, spk_provider.fingerprint, spk_provider.key_origin))
+        if value_type is SimplePubKeyProvider
+        else (lambda: DescriptorInfo(info.address_type, info.spk_providers, info.threshold))
+    )
+
+    create()
+    tracemalloc.start()
+    try:
+        instances = [create() for _ in range(1000)]
+        allocated, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    benchmark.extra_info["bytes_per_instance"] = allocated / len(instances)
+
+    assert isinstance(benchmark(create), value_type)
+
+
+@pytest.mark.parametrize("registry", [False, True], ids=["scan", "registry"])
+def test_find_address_type(benchmark, multisig_descriptors, registry):
+    "The AddressType lookup of DescriptorInfo.from_str, before (linear isinstance scan) and with the registry"
+    if registry:
+        address_type_registry = require("bitcoin_usb.address_types", "address_type_registry")
+    descriptors = _get_descriptor_instances(parse_descriptor(multisig_descriptors[0]))
+
+    def find():
+        if registry:
+            return address_type_registry.by_hwi_descriptors(descriptors)
+        return _find_matching_address_type(descriptors, get_all_address_types())
+
+    assert benchmark(find).name == AddressTypes.p2wsh.name
@@ -0,0 +1,31 @@
+import bdkpython as bdk
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from bitcoin_usb.hwi_quick import HWIQuick  # noqa: E402
+
+from .conftest import require  # noqa: E402
+
+DeviceEnumerator = require("bitcoin_usb.device_enumerator", "DeviceEnumerator")
+hid_devices = require("tests.test_device_enumerator", "hid_devices")
+
+
+@pytest.mark.parametrize("number_hid_devices", [0, 6, 60])
+def test_hwi_quick_enumerate(benchmark, number_hid_devices):
+    "A fake HID backend with number_hid_devices devices (incl. keyboards and the 2. Ledger interface)"
+    devices = [
+        {**device, "path": f"/dev/hidraw{i}".encode()}
+        for i, device in enumerate(hid_devices * (number_hid_devices // len(hid_devices)))
+    ]
+    hwi_quick = HWIQuick(
+        network=bdk.Network.REGTEST,
+        device_enumerator=DeviceEnumerator(
+            hid_enumerate=lambda: devices,
+            webusb_enumerate=lambda: [],
+            serial_enumerate=lambda: [],
+        ),
+    )
+    result = benchmark(hwi_quick.enumerate)
+    # per copy of hid_devices: keyboard and the 2. ledger interface are filtered out
+    assert len(result) == 4 * number_hid_devices // len(hid_devices)
@@ -0,0 +1,80 @@
+import bdkpython as bdk
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from bitcoin_usb.software_signer import SoftwareSigner  # noqa: E402
+
+from .conftest import network, require, seeds  # noqa: E402
+
+
+def multisig_wallet() -> tuple[str, str, str]:
+    "(receive descriptor, change descriptor, psbt) of tests/test_multi_signer.py"
+    return require(
+        "tests.test_multi_signer", "multisig_descriptor", "multisig_change_descriptor", "multisig_psbt"
+    )
+
+
+def test_software_signer_construction(benchmark, multisig_descriptors):
+    "Including the wallet, which is built on first use"
+    receive_descriptor, change_descriptor = multisig_descriptors
+
+    def run() -> SoftwareSigner:
+        signer = SoftwareSigner(
+            mnemonic=seeds[0],
+            receive_descriptor=receive_descriptor,
+            change_descriptor=change_descriptor,
+            network=network,
+        )
+        assert signer.wallet
+        return signer
+
+    signer = benchmark(run)
+    assert signer.get_fingerprint() == "7c85f2b5"
+
+
+def test_signer_registry_get(benchmark, multisig_descriptors):
+    receive_descriptor, change_descriptor = multisig_descriptors
+    SoftwareSignerRegistry = require("bitcoin_usb.software_signer", "SoftwareSignerRegistry")
+    registry = SoftwareSignerRegistry()
+    signer = registry.get(seeds[0], receive_descriptor, change_descriptor, network)
+    assert signer.wallet
+
+    assert benchmark(registry.get, seeds[0], receive_descriptor, change_descriptor, network) is signer
+
+
+def test_get_xpubs(benchmark):
+    multisig_descriptor, multisig_change_descriptor, _ = multisig_wallet()
+    signer = SoftwareSigner(
+        mnemonic=seeds[0],
+        receive_descriptor=multisig_descriptor,
+        change_descriptor=multisig_change_descriptor,
+        network=network,
+    )
+    assert len(benchmark(signer.get_xpubs)) == 6
+
+
+@pytest.mark.parametrize("number_inputs", [1, 10, 100])
+@pytest.mark.parametrize("signer_class", ["SoftwareSigner", "SeedSigner"])
+def test_sign_psbt(benchmark, number_inputs, signer_class):
+    bdk_psbt_from_hwi = require("bitcoin_usb.psbt_tools", "bdk_psbt_from_hwi")
+    large_hwi_psbt = require("tests.test_psbt_tools", "large_hwi_psbt")
+    multisig_descriptor, multisig_change_descriptor, multisig_psbt = multisig_wallet()
+    if signer_class == "SeedSigner":
+        SeedSigner = require("bitcoin_usb.software_signer", "SeedSigner")
+        signer = SeedSigner(mnemonic=seeds[0], network=network)
+    else:
+        signer = SoftwareSigner(
+            mnemonic=seeds[0],
+            receive_descriptor=multisig_descriptor,
+            change_descriptor=multisig_change_descriptor,
+            network=network,
+        )
+    psbt_base64 = bdk_psbt_from_hwi(large_hwi_psbt(bdk.Psbt(multisig_psbt), number_inputs)).serialize()
+
+    # every round signs an unsigned psbt (the parsing is not measured)
+    def setup():
+        return (bdk.Psbt(psbt_base64),), {}
+
+    signed = benchmark.pedantic(signer.sign_psbt, setup=setup, rounds=5)
+    assert signed
@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config: pytest.Config) -> None:
+    # plain test runs execute every benchmark (tests/benchmarks) only once, as a test.
+    # They are measured with --benchmark-only or --benchmark-enable
+    if config.pluginmanager.hasplugin("benchmark") and not (
+        config.getoption("benchmark_only") or config.getoption("benchmark_enable")
+    ):
+        config.option.benchmark_disable = True
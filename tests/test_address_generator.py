@@ -0,0 +1,79 @@
+import bdkpython as bdk
+import pytest
+
+from bitcoin_usb.address_generator import AddressGenerator
+from bitcoin_usb.address_types import DescriptorInfo, get_all_address_types
+from bitcoin_usb.seed_tools import derive_spk_provider
+
+from .test_multi_signer import multisig_change_descriptor, multisig_descriptor, seeds
+
+network = bdk.Network.REGTEST
+
+
+def expected_addresses(descriptor: str, start: int, stop: int) -> list[str]:
+    bdk_descriptor = bdk.Descriptor(descriptor, network)
+    return [str(bdk_descriptor.derive_address(index, network)) for index in range(start, stop)]
+
+
+@pytest.mark.parametrize(
+    "address_type", get_all_address_types(), ids=lambda address_type: address_type.short_name
+)
+def test_all_address_types(address_type):
+    descriptor_info = DescriptorInfo(
+        address_type=address_type,
+        spk_providers=[
+            derive_spk_provider(seed, address_type.key_origin(network), network)
+            for seed in (seeds if address_type.is_multisig else seeds[:1])
+        ],
+        threshold=2 if address_type.is_multisig else 1,
+    )
+    generator = AddressGenerator(descriptor_info, network)
+    receive_descriptor = descriptor_info.get_descriptor_str(network)
+
+    assert generator.receive_addresses(0, 5) == expected_addresses(receive_descriptor, 0, 5)
+    assert generator.change_addresses(0, 5) == expected_addresses(
+        receive_descriptor.split("#")[0].replace("/0/*", "/1/*"), 0, 5
+    )
+
+
+def test_incremental_and_gaps():
+    generator = AddressGenerator(DescriptorInfo.from_str(multisig_descriptor), network)
+    expected = expected_addresses(multisig_descriptor, 0, 30)
+
+    assert generator.receive_addresses(0, 10) == expected[:10]
+    assert generator.number_cached(bdk.KeychainKind.EXTERNAL) == 10
+    # only the new addresses are derived
+    assert generator.receive_addresses(5, 20) == expected[5:20]
+    assert generator.number_cached(bdk.KeychainKind.EXTERNAL) == 20
+    assert generator.address(bdk.KeychainKind.EXTERNAL, 3) == expected[3]
+    assert generator.receive_addresses(20, 20) == []
+
+    # a range after a gap is not cached
+    assert generator.receive_addresses(25, 30) == expected[25:30]
+    assert generator.number_cached(bdk.KeychainKind.EXTERNAL) == 20
+
+    # the change addresses don't depend on the derivation path of the descriptor
+    assert generator.change_addresses(0, 3) == expected_addresses(multisig_change_descriptor, 0, 3)
+    assert generator.number_cached(bdk.KeychainKind.INTERNAL) == 3
+
+
+def test_seed():
+    generator = AddressGenerator(DescriptorInfo.from_str(multisig_descriptor), network)
+    expected = expected_addresses(multisig_descriptor, 0, 15)
+
+    generator.seed(bdk.KeychainKind.EXTERNAL, expected[:10])
+    assert generator.number_cached(bdk.KeychainKind.EXTERNAL) == 10
+    # the seeded addresses are not revealed twice
+    assert generator.receive_addresses(5, 15) == expected[5:15]
+    assert generator.number_cached(bdk.KeychainKind.EXTERNAL) == 15
+    # fewer addresses don't shrink the cache
+    generator.seed(bdk.KeychainKind.EXTERNAL, expected[:3])
+    assert generator.number_cached(bdk.KeychainKind.EXTERNAL) == 15
+
+
+def test_multipath_descriptor_and_root_xpub():
+    descriptor = "wpkh([45f35351]tpubDEY3tNWvDs8J6xAmwoirxgff61gPN1V6U5numeb6xjvZRB883NPPpRYHt2A6fUE3YyzDLezFfuosBdXsdXJhJUcpqYWF9EEBmWqG3rG8sdy/<0;1>/*)"
+    generator = AddressGenerator(DescriptorInfo.from_str(descriptor), network)
+
+    assert generator.receive_addresses(0, 3) == expected_addresses(descriptor.replace("<0;1>", "0"), 0, 3)
+    assert generator.change_addresses(0, 3) == expected_addresses(descriptor.replace("<0;1>", "1"), 0, 3)
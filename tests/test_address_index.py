@@ -0,0 +1,83 @@
+import bdkpython as bdk
+
+from bitcoin_usb.address_index import AddressIndex
+from bitcoin_usb.address_types import DescriptorInfo
+
+from .test_address_generator import expected_addresses
+from .test_multi_signer import multisig_change_descriptor, multisig_descriptor
+
+network = bdk.Network.REGTEST
+
+
+def test_lookup():
+    index = AddressIndex(DescriptorInfo.from_str(multisig_descriptor), network, lookahead=20)
+    receive_address = expected_addresses(multisig_descriptor, 7, 8)[0]
+    change_address = expected_addresses(multisig_change_descriptor, 19, 20)[0]
+
+    location = index.lookup(receive_address)
+    assert location
+    assert location.keychain == bdk.KeychainKind.EXTERNAL
+    assert location.index == 7
+    assert location.bip32_paths == {
+        "7C85F2B5": "m/48h/1h/0h/2h/0/7",
+        "34BE20D9": "m/48h/1h/0h/2h/0/7",
+        "3B8ADFC3": "m/48h/1h/0h/2h/0/7",
+    }
+
+    # by scriptPubKey and in upper case
+    script_pubkey = bdk.Address(change_address, network).script_pubkey().to_bytes()
+    for query in [script_pubkey, change_address.upper()]:
+        location = index.lookup(query)
+        assert location
+        assert (location.keychain, location.index) == (bdk.KeychainKind.INTERNAL, 19)
+
+    assert index.lookup("not an address") is None
+    assert index.lookup(b"\x00") is None
+
+
+def test_extend():
+    index = AddressIndex(DescriptorInfo.from_str(multisig_descriptor), network, lookahead=5)
+    address = expected_addresses(multisig_descriptor, 12, 13)[0]
+    assert index.lookahead == 5
+    assert address not in index
+
+    index.extend(15)
+    assert index.lookahead == 15
+    assert address in index
+    # the window never shrinks
+    index.extend(3)
+    assert index.lookahead == 15
+
+
+def test_address_descriptor():
+    index = AddressIndex(DescriptorInfo.from_str(multisig_descriptor), network, lookahead=5)
+    address = expected_addresses(multisig_change_descriptor, 3, 4)[0]
+    location = index.lookup(address)
+    assert location
+
+    address_descriptor = index.address_descriptor(location)
+    assert "/1/3," in address_descriptor
+    assert str(bdk.Descriptor(address_descriptor, network).derive_address(0, network)) == address
+
+
+def test_persistence(tmp_path):
+    path = tmp_path / "addresses.json"
+    descriptor_info = DescriptorInfo.from_str(multisig_descriptor)
+    index = AddressIndex(descriptor_info, network, lookahead=10, path=path)
+    index.flush()
+
+    loaded = AddressIndex(descriptor_info, network, lookahead=10, path=path)
+    # the loaded addresses are cached by the address generator, without deriving them
+    assert loaded.address_generator.number_cached(bdk.KeychainKind.EXTERNAL) == 10
+    location = loaded.lookup(expected_addresses(multisig_descriptor, 9, 10)[0])
+    assert location and location.index == 9
+
+    # the loaded window can be extended, in a batch (which caches the new addresses)
+    loaded.extend(12)
+    assert loaded.address_generator.number_cached(bdk.KeychainKind.EXTERNAL) == 12
+    location = loaded.lookup(expected_addresses(multisig_descriptor, 11, 12)[0])
+    assert location and location.index == 11
+
+    # another descriptor ignores the file
+    other = AddressIndex(DescriptorInfo.from_str(multisig_change_descriptor), network, lookahead=1, path=path)
+    assert other.lookahead == 1
@@ -1,9 +1,24 @@
+import pickle
+
 import bdkpython as bdk
 import pytest
+from hwilib.descriptor import SHDescriptor, parse_descriptor
 from hwilib.errors import BadArgumentError
 from hwilib.key import HARDENED_FLAG
 
-from bitcoin_usb.address_types import AddressTypes, SimplePubKeyProvider
+from bitcoin_usb.address_types import (
+    AddressType,
+    AddressTypeRegistry,
+    AddressTypes,
+    DescriptorInfo,
+    SimplePubKeyProvider,
+    SortedMultisigDescriptor,
+    _get_descriptor_instances,
+    address_type_registry,
+    get_address_type_dicts,
+    get_all_address_types,
+    get_key_origins,
+)
 
 # test seeds
 # seed1: spider manual inform reject arch raccoon betray moon document across main build
@@ -39,6 +54,80 @@ def test_address_types():
     assert AddressTypes.p2wsh.key_origin(bdk.Network.BITCOIN) == "m/48h/0h/0h/2h"
 
 
+def test_key_origin_of_account():
+    for address_type in get_all_address_types():
+        assert address_type.key_origin_of_account(network, 0) == address_type.key_origin(network)
+
+    assert AddressTypes.p2wpkh.key_origin_of_account(bdk.Network.BITCOIN, 5) == "m/84h/0h/5h"
+    assert AddressTypes.p2wsh.key_origin_of_account(bdk.Network.REGTEST, 1) == "m/48h/1h/1h/2h"
+
+    assert get_key_origins(network, accounts=[0, 1], address_types=[AddressTypes.p2tr]) == [
+        "m/86h/1h/0h",
+        "m/86h/1h/1h",
+    ]
+
+
+def test_address_type_registry():
+    assert get_address_type_dicts()["p2sh_p2wpkh"] is AddressTypes.p2sh_p2wpkh
+    assert get_address_type_dicts() is get_address_type_dicts()
+    assert get_all_address_types() == [
+        AddressTypes.p2pkh,
+        AddressTypes.p2sh_p2wpkh,
+        AddressTypes.p2wpkh,
+        AddressTypes.p2tr,
+        AddressTypes.p2sh_p2wsh,
+        AddressTypes.p2wsh,
+    ]
+
+    assert address_type_registry.by_short_name("p2sh-p2wpkh") is AddressTypes.p2sh_p2wpkh
+    assert address_type_registry.by_short_name("p2sh") is None
+    assert address_type_registry.by_purpose(86) == (AddressTypes.p2tr,)
+    assert address_type_registry.by_purpose(48) == (AddressTypes.p2sh_p2wsh, AddressTypes.p2wsh)
+    assert address_type_registry.by_purpose(45) == ()
+    for address_type in get_all_address_types():
+        assert address_type in address_type_registry
+        # registered AddressTypes can be pickled
+        assert pickle.loads(pickle.dumps(address_type)) is address_type
+
+    # register a legacy multisig (BIP45) in a separate registry
+    p2sh = AddressType(
+        "p2sh",
+        "Multi Sig (Legacy/p2sh)",
+        is_multisig=True,
+        key_origin=lambda network: "m/45h",
+        hwi_descriptor_classes=(SHDescriptor, SortedMultisigDescriptor),
+    )
+    registry = AddressTypeRegistry(get_all_address_types())
+    address_types = registry.address_types
+    registry.register(p2sh)
+    assert len(registry) == len(address_type_registry) + 1
+    assert len(address_types) == len(address_type_registry)
+    assert registry.by_purpose(45) == (p2sh,)
+    assert registry.as_dict()["p2sh"] is p2sh
+    assert p2sh not in address_type_registry
+
+    descriptor = "sh(sortedmulti(2,[45f35351/45h]tpubDEY3tNWvDs8J6xAmwoirxgff61gPN1V6U5numeb6xjvZRB883NPPpRYHt2A6fUE3YyzDLezFfuosBdXsdXJhJUcpqYWF9EEBmWqG3rG8sdy/0/*,[829074ff/45h]tpubDDx9arPwEvHGnnkKN1YJXFE4W6JZXyVX9HGjZW75nWe1FCsTYu2k3i7VtCwhGR9zj6UUYnseZUnwL7T6Znru3NmXkcjEQxMqRx7Rxz8rPp4/0/*))"
+    descriptors = _get_descriptor_instances(parse_descriptor(descriptor))
+    assert registry.by_hwi_descriptors(descriptors) is p2sh
+    assert address_type_registry.by_hwi_descriptors(descriptors) is None
+    with pytest.raises(ValueError):
+        DescriptorInfo.from_str(descriptor)
+
+    with pytest.raises(ValueError):
+        registry.register(p2sh)
+    with pytest.raises(ValueError):
+        # the same hwi_descriptor_classes as p2wsh
+        registry.register(
+            AddressType(
+                "p2wsh-copy",
+                "copy",
+                is_multisig=True,
+                key_origin=AddressTypes.p2wsh.key_origin,
+                hwi_descriptor_classes=AddressTypes.p2wsh.hwi_descriptor_classes,
+            )
+        )
+
+
 def test_SimplePubKeyProvider():
     assert SimplePubKeyProvider.format_derivation_path("/ 0'/15 ") == "/0h/15"
     assert SimplePubKeyProvider.format_derivation_path("/ 1/15 ") == "/1/15"
@@ -8,7 +8,14 @@ from bitcoin_usb.address_types import (
     get_all_address_types,
     logging,
 )
-from bitcoin_usb.seed_tools import derive_spk_provider
+from bitcoin_usb.address_types import get_key_origins
+from bitcoin_usb.seed_tools import (
+    DerivationContext,
+    _independent_subtrees,
+    derive,
+    derive_many,
+    derive_spk_provider,
+)
 
 # test seeds
 # seed1: spider manual inform reject arch raccoon betray moon document across main build
@@ -223,3 +230,45 @@ def test_get_network_index():
     assert SimplePubKeyProvider.get_network_index("m/48h/1/0h/2h") == None
 
     assert SimplePubKeyProvider.get_network_index("m/4") == None
+
+
+def test_derivation_context():
+    seed = "spider manual inform reject arch raccoon betray moon document across main build"
+    context = DerivationContext(seed, network)
+    assert context.fingerprint == "7c85f2b5"
+
+    for address_type in get_all_address_types():
+        key_origin = address_type.key_origin(network)
+        assert context.derive(key_origin) == derive(seed, key_origin, network)
+        assert str(context.derive_spk_provider(key_origin)) == str(
+            derive_spk_provider(seed, key_origin, network)
+        )
+
+    # the derived secrets are cached
+    assert context.derive_secret("m/84h/1h/0h") is context.derive_secret("m/84h/1h/0h")
+
+
+def test_derive_many():
+    seed = "spider manual inform reject arch raccoon betray moon document across main build"
+    key_origins = get_key_origins(network, accounts=range(3)) + ["m/48'/1'/0'/2'"]
+
+    context = DerivationContext(seed, network)
+    xpubs = context.derive_many(key_origins)
+
+    assert set(xpubs) == set(key_origins)
+    for key_origin, xpub in xpubs.items():
+        assert xpub == derive(seed, key_origin, network)[0]
+    # the shared nodes were derived once and cached
+    assert "m/48h/1h/0h" in context._derived_secrets
+    assert "m/84h/1h" in context._derived_secrets
+
+    assert derive_many(seed, key_origins, network, workers=2) == xpubs
+
+
+def test_independent_subtrees():
+    subtrees = _independent_subtrees(["m/84h/1h/0h", "m/84h/1h/1h", "m/48h/1h/0h/2h", "m/48h/1h/0h/1h"])
+    assert sorted(subtrees) == [["m/48h/1h/0h/2h", "m/48h/1h/0h/1h"], ["m/84h/1h/0h", "m/84h/1h/1h"]]
+
+    subtrees = _independent_subtrees(["m/84h/1h/0h", "m/84h/1h/1h"])
+    assert sorted(subtrees) == [["m/84h/1h/0h"], ["m/84h/1h/1h"]]
+    assert _independent_subtrees([]) == []
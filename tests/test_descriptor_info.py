@@ -1,7 +1,16 @@
+import copy
+import pickle
+
+import bdkpython as bdk
 import pytest
 from hwilib.descriptor import parse_descriptor
 
-from bitcoin_usb.address_types import DescriptorInfo
+from bitcoin_usb.address_types import (
+    AddressTypes,
+    DescriptorInfo,
+    DescriptorInfoCache,
+    SimplePubKeyProvider,
+)
 
 
 def test_xpub_at_root():
@@ -205,3 +214,80 @@ def test_unsupported_type2():
 
     # Compare the exception message
     assert exception_message == "Can only have sh() at top level"
+
+
+def test_descriptor_info_cache():
+    s = "wsh(sortedmulti(2,[45f35351/48h/1h/0h/2h]tpubDEY3tNWvDs8J6xAmwoirxgff61gPN1V6U5numeb6xjvZRB883NPPpRYHt2A6fUE3YyzDLezFfuosBdXsdXJhJUcpqYWF9EEBmWqG3rG8sdy/<0;1>/*,[829074ff/48h/1h/0h/2h]tpubDDx9arPwEvHGnnkKN1YJXFE4W6JZXyVX9HGjZW75nWe1FCsTYu2k3i7VtCwhGR9zj6UUYnseZUnwL7T6Znru3NmXkcjEQxMqRx7Rxz8rPp4/<0;1>/*))"
+    cache = DescriptorInfoCache(maxsize=2)
+
+    descriptor_info = DescriptorInfo.from_str(s, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+    # whitespace doesn't matter
+    assert DescriptorInfo.from_str(f" {s.replace(',', ', ')}\n", cache=cache).threshold == 2
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # the cache returns the shared instance, which cannot be changed
+    with pytest.raises(AttributeError):
+        descriptor_info.threshold = 1
+    with pytest.raises(AttributeError):
+        descriptor_info.spk_providers[0].fingerprint = "00000000"
+    cached = DescriptorInfo.from_str(s, cache=cache)
+    assert cached is descriptor_info
+    assert cached == DescriptorInfo.from_str(s)
+
+    network = bdk.Network.REGTEST
+    descriptor_str = cached.get_descriptor_str(network, cache=cache)
+    assert descriptor_str == cached.get_descriptor_str(network)
+    assert cached.clone().get_descriptor_str(network, cache=cache) == descriptor_str
+    assert cached.get_descriptor_str(network, hardened_char="'", cache=cache) != descriptor_str
+    assert (cache.hits, cache.misses) == (3, 3)
+
+    # the least recently used entries are evicted
+    DescriptorInfo.from_str(s.replace("sortedmulti(2", "sortedmulti(1"), cache=cache)
+    DescriptorInfo.from_str(s.replace("/<0;1>/*", "/0/*"), cache=cache)
+    DescriptorInfo.from_str(s, cache=cache)
+    assert (cache.hits, cache.misses) == (3, 6)
+    assert len(cache) == 4
+
+    cache.clear()
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_value_types():
+    s = "wsh(sortedmulti(2,[45f35351/48h/1h/0h/2h]tpubDEY3tNWvDs8J6xAmwoirxgff61gPN1V6U5numeb6xjvZRB883NPPpRYHt2A6fUE3YyzDLezFfuosBdXsdXJhJUcpqYWF9EEBmWqG3rG8sdy/<0;1>/*,[829074ff/48h/1h/0h/2h]tpubDDx9arPwEvHGnnkKN1YJXFE4W6JZXyVX9HGjZW75nWe1FCsTYu2k3i7VtCwhGR9zj6UUYnseZUnwL7T6Znru3NmXkcjEQxMqRx7Rxz8rPp4/<0;1>/*))"
+    info, other = (
+        DescriptorInfo.from_str(s),
+        DescriptorInfo.from_str(s.replace("h/", "'/").replace("h]", "']")),
+    )
+    spk_provider = info.spk_providers[0]
+
+    # equal values are equal and have the same hash
+    assert info is not other
+    assert info == other and hash(info) == hash(other)
+    assert len({info, other, info.clone(), copy.deepcopy(info)}) == 1
+    assert spk_provider == SimplePubKeyProvider(
+        xpub=spk_provider.xpub,
+        fingerprint=spk_provider.fingerprint.lower(),
+        key_origin="m/48'/1'/0'/2'",
+        derivation_path=spk_provider.derivation_path,
+    )
+    assert info != DescriptorInfo(info.address_type, info.spk_providers[::-1], info.threshold)
+    assert info != DescriptorInfo(info.address_type, info.spk_providers, 1)
+    assert info != DescriptorInfo(AddressTypes.p2sh_p2wsh, info.spk_providers, info.threshold)
+    assert spk_provider != info.spk_providers[1] and spk_provider != spk_provider.xpub
+
+    # immutable, and without an instance __dict__
+    for obj in [info, spk_provider, AddressTypes.p2wsh]:
+        assert obj.clone() is obj and copy.copy(obj) is obj
+        assert not hasattr(obj, "__weakref__")
+        with pytest.raises(AttributeError):
+            obj.new_attribute = 1  # type: ignore[attr-defined]
+    with pytest.raises(AttributeError):
+        del spk_provider.xpub
+    assert isinstance(info.spk_providers, tuple)
+    assert list(info.__dict__) == ["address_type", "spk_providers", "threshold"]
+    assert list(spk_provider.__dict__) == ["xpub", "fingerprint", "key_origin", "derivation_path"]
+
+    assert pickle.loads(pickle.dumps(spk_provider)) == spk_provider
+    assert pickle.loads(pickle.dumps(info)) == info
@@ -0,0 +1,154 @@
+import bdkpython as bdk
+from hwilib.errors import ActionCanceledError
+
+from bitcoin_usb.address_types import get_all_address_types, get_key_origins
+from bitcoin_usb.device import USBDevice
+from bitcoin_usb.seed_tools import derive
+
+from .test_psbt_tools import p2wsh_2_2of3, p2wsh_psbt_0_2of3, p2wsh_psbt_1_2of3
+
+# test seeds
+# seed1: spider manual inform reject arch raccoon betray moon document across main build
+
+network = bdk.Network.REGTEST
+seed = "spider manual inform reject arch raccoon betray moon document across main build"
+
+
+class FakeXpub:
+    def __init__(self, xpub: str) -> None:
+        self.xpub = xpub
+
+    def to_string(self) -> str:
+        return self.xpub
+
+
+class FakeSoftwareClient:
+    "Answers like a HardwareWalletClient, but derives from a seed"
+
+    def __init__(self) -> None:
+        self.requested_paths: list[str] = []
+
+    def get_pubkey_at_path(self, key_origin: str):
+        self.requested_paths.append(key_origin)
+        xpub, fingerprint = derive(seed, key_origin, network)
+        return FakeXpub(xpub)
+
+    def get_master_fingerprint(self) -> bytes:
+        return bytes.fromhex("7c85f2b5")
+
+    def close(self):
+        pass
+
+
+def get_usb_device() -> USBDevice:
+    dev = USBDevice(selected_device={"type": "fake", "path": "fake"}, network=network)
+    dev.client = FakeSoftwareClient()  # type: ignore
+    return dev
+
+
+def test_get_xpubs_batch():
+    dev = get_usb_device()
+    key_origins = get_key_origins(network, accounts=range(3))
+    assert len(key_origins) == 3 * len(get_all_address_types())
+
+    # duplicates and "'" are normalized
+    result = dev.get_xpubs_batch(key_origins + ["m/84'/1'/0'"])
+
+    assert list(result.xpubs.keys()) == key_origins
+    assert dev.client.requested_paths == key_origins  # type: ignore
+    assert set(result.timings.keys()) == set(key_origins)
+    assert result.total_seconds >= 0
+    assert result.xpubs["m/84h/1h/2h"] == derive(seed, "m/84h/1h/2h", network)[0]
+
+
+def test_get_xpubs():
+    dev = get_usb_device()
+    xpubs = dev.get_xpubs()
+    assert set(xpubs.keys()) == set(get_all_address_types())
+    for address_type, xpub in xpubs.items():
+        assert xpub == derive(seed, address_type.key_origin(network), network)[0]
+
+
+class FakeSigningClient(FakeSoftwareClient):
+    "Returns the psbts unchanged, and the user rejects the psbt at reject_index"
+
+    def __init__(self, reject_index: int | None = None) -> None:
+        super().__init__()
+        self.reject_index = reject_index
+        self.signed = 0
+
+    def sign_tx(self, psbt):
+        if self.signed == self.reject_index:
+            raise ActionCanceledError("sign_tx canceled")
+        self.signed += 1
+        return psbt
+
+
+def test_sign_many():
+    dev = get_usb_device()
+    dev.client = FakeSigningClient()  # type: ignore
+    psbts = [p2wsh_psbt_0_2of3, p2wsh_psbt_1_2of3, p2wsh_2_2of3]
+
+    signed_psbts = dev.sign_many(psbts)
+    # incrementally
+    assert next(signed_psbts).serialize() == psbts[0].serialize()
+    assert dev.client.signed == 1  # type: ignore
+    assert [p.serialize() for p in signed_psbts] == [p.serialize() for p in psbts[1:]]
+
+
+def test_sign_many_stops_on_rejection():
+    dev = get_usb_device()
+    dev.client = FakeSigningClient(reject_index=1)  # type: ignore
+    psbts = [p2wsh_psbt_0_2of3, p2wsh_psbt_1_2of3, p2wsh_2_2of3]
+
+    assert len(list(dev.sign_many(psbts))) == 1
+    assert dev.client.signed == 1  # type: ignore
+
+
+class FakeCosignerClient(FakeSoftwareClient):
+    "Adds a (fake) signature for its key, like a cosigner device"
+
+    def __init__(self, fingerprint: str) -> None:
+        super().__init__()
+        self.fingerprint = bytes.fromhex(fingerprint)
+        self.received_partial_sigs = None
+
+    def get_master_fingerprint(self) -> bytes:
+        return self.fingerprint
+
+    def sign_tx(self, psbt):
+        self.received_partial_sigs = [dict(psbt_input.partial_sigs) for psbt_input in psbt.inputs]
+        for psbt_input in psbt.inputs:
+            for pubkey, origin in psbt_input.hd_keypaths.items():
+                if origin.fingerprint == self.fingerprint:
+                    # any valid DER signature
+                    psbt_input.partial_sigs[pubkey] = next(
+                        iter(p2wsh_2_2of3.input()[0].partial_sigs.values())
+                    )
+        return psbt
+
+
+def test_sign_psbt_slimmed():
+    dev = get_usb_device()
+    dev.client = FakeCosignerClient("26ebf92a")  # type: ignore
+
+    signed = dev.sign_psbt(p2wsh_2_2of3)
+
+    # the device didn't receive the signatures of the other cosigners
+    assert dev.client.received_partial_sigs == [{}]  # type: ignore
+    # the slimming is only measured on request
+    assert dev.last_slimming_report is None
+    # but they are in the result
+    assert len(signed.input()[0].partial_sigs) == 3
+    assert signed.input()[0].non_witness_utxo == p2wsh_2_2of3.input()[0].non_witness_utxo
+
+
+def test_sign_psbt_slimming_report():
+    dev = get_usb_device()
+    dev.slimming_reports = True
+    dev.client = FakeCosignerClient("26ebf92a")  # type: ignore
+
+    dev.sign_psbt(p2wsh_2_2of3)
+
+    assert dev.client.received_partial_sigs == [{}]  # type: ignore
+    assert dev.last_slimming_report and dev.last_slimming_report.bytes_saved > 0
@@ -0,0 +1,110 @@
+import bdkpython as bdk
+
+from bitcoin_usb.device_enumerator import DeviceEnumerator
+from bitcoin_usb.hwi_quick import HWIQuick
+
+hid_devices = [
+    # a keyboard
+    {
+        "vendor_id": 0x046D,
+        "product_id": 0xC31C,
+        "interface_number": 0,
+        "usage_page": 1,
+        "path": b"/dev/hidraw0",
+    },
+    {
+        "vendor_id": 0xD13E,
+        "product_id": 0xCC10,
+        "interface_number": 0,
+        "usage_page": 0xFFA0,
+        "path": b"/dev/hidraw1",
+    },
+    # ledger nano s plus exposes 2 interfaces, only 1 is the wallet
+    {
+        "vendor_id": 0x2C97,
+        "product_id": 0x5011,
+        "interface_number": 0,
+        "usage_page": 0xFFA0,
+        "path": b"/dev/hidraw2",
+    },
+    {
+        "vendor_id": 0x2C97,
+        "product_id": 0x5011,
+        "interface_number": 1,
+        "usage_page": 0xF1D0,
+        "path": b"/dev/hidraw3",
+    },
+    {
+        "vendor_id": 0x03EB,
+        "product_id": 0x2403,
+        "interface_number": 0,
+        "usage_page": 0xFFFF,
+        "product_string": "BitBox02BTC",
+        "path": b"/dev/hidraw4",
+    },
+    {
+        "vendor_id": 0x534C,
+        "product_id": 0x0001,
+        "interface_number": 0,
+        "usage_page": 0xFF00,
+        "path": b"/dev/hidraw5",
+    },
+]
+
+
+def fake_enumerator() -> DeviceEnumerator:
+    return DeviceEnumerator(
+        hid_enumerate=lambda: hid_devices,
+        webusb_enumerate=lambda: [(0x1209, 0x53C1, "webusb:001:4")],
+        serial_enumerate=lambda: [(0x10C4, 0xEA60, "/dev/ttyUSB0"), (0x1234, 0x0001, "/dev/ttyUSB1")],
+    )
+
+
+def test_enumerate():
+    devices = fake_enumerator().enumerate()
+
+    assert [(d["type"], d["path"], d["model"]) for d in devices] == [
+        ("coldcard", "/dev/hidraw1", "coldcard"),
+        ("ledger", "/dev/hidraw2", "ledger_nano_s_plus"),
+        ("bitbox02", "/dev/hidraw4", "bitbox02_btconly"),
+        ("trezor", "hid:/dev/hidraw5", "trezor_1"),
+        ("trezor", "webusb:001:4", "trezor"),
+        ("jade", "/dev/ttyUSB0", "jade"),
+    ]
+    for device in devices:
+        assert device["needs_pin_sent"] is False
+        assert device["needs_passphrase_sent"] is False
+
+
+def test_failing_scan_is_skipped():
+    def broken():
+        raise OSError("libusb not found")
+
+    enumerator = DeviceEnumerator(
+        hid_enumerate=lambda: hid_devices[1:2], webusb_enumerate=broken, serial_enumerate=None
+    )
+    assert [d["type"] for d in enumerator.enumerate()] == ["coldcard"]
+
+
+def test_hwi_quick_uses_enumerator():
+    hwi_quick = HWIQuick(network=bdk.Network.REGTEST, device_enumerator=fake_enumerator())
+    assert len(hwi_quick.enumerate()) == 6
+
+
+def test_bitbox_product_id_is_shared():
+    def bitbox_hid(product_string: str) -> dict:
+        return {
+            "vendor_id": 0x03EB,
+            "product_id": 0x2402,
+            "interface_number": 0,
+            "usage_page": 0xFFFF,
+            "product_string": product_string,
+            "path": b"/dev/hidraw6",
+        }
+
+    assert DeviceEnumerator.classify_hid(bitbox_hid("bb02-bootloader")) is None
+    assert DeviceEnumerator.classify_hid(bitbox_hid("unknown")) is None
+    bitbox02 = DeviceEnumerator.classify_hid(bitbox_hid("BitBox02"))
+    assert bitbox02 and bitbox02["model"] == "bitbox02_multi"
+    digitalbitbox = DeviceEnumerator.classify_hid(bitbox_hid("Digital Bitbox"))
+    assert digitalbitbox and digitalbitbox["type"] == "digitalbitbox"
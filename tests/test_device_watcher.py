@@ -0,0 +1,157 @@
+import asyncio
+import threading
+
+import pytest
+
+from bitcoin_usb.device_watcher import (
+    DeviceEventSource,
+    DeviceWatcher,
+    NetlinkEventSource,
+    PollingEventSource,
+    parse_uevent,
+)
+
+coldcard = {"type": "coldcard", "path": "/dev/hidraw1", "model": "coldcard"}
+trezor = {"type": "trezor", "path": "webusb:001:4", "model": "trezor"}
+
+
+class FakeEventSource(DeviceEventSource):
+    def __init__(self) -> None:
+        self.on_event = None
+        self.stopped = False
+
+    def start(self, on_event):
+        self.on_event = on_event
+
+    def stop(self):
+        self.stopped = True
+
+    def plug(self):
+        self.on_event()
+
+
+class UnavailableEventSource(DeviceEventSource):
+    def start(self, on_event):
+        raise OSError("netlink not permitted")
+
+    def stop(self):
+        pass
+
+
+class FakeBus:
+    def __init__(self) -> None:
+        self.devices = []
+        self.enumerate_calls = 0
+
+    def enumerate(self):
+        self.enumerate_calls += 1
+        return list(self.devices)
+
+
+def test_parse_uevent():
+    data = (
+        b"add@/devices/pci0000:00/usb1/1-2/1-2:1.0/hidraw/hidraw1\0ACTION=add\0SUBSYSTEM=hidraw\0SEQNUM=42\0"
+    )
+    uevent = parse_uevent(data)
+    assert uevent == {"ACTION": "add", "SUBSYSTEM": "hidraw", "SEQNUM": "42"}
+    assert NetlinkEventSource.is_relevant(uevent)
+    assert not NetlinkEventSource.is_relevant({"ACTION": "change", "SUBSYSTEM": "hidraw"})
+    assert not NetlinkEventSource.is_relevant({"ACTION": "add", "SUBSYSTEM": "net"})
+
+    # messages of udevd start with "libudev"
+    assert parse_uevent(b"libudev\0\xfe\xed\xca\xfe") is None
+
+
+def test_cached_device_list():
+    bus = FakeBus()
+    bus.devices = [coldcard]
+    watcher = DeviceWatcher(enumerate_devices=bus.enumerate, event_source=FakeEventSource())
+
+    assert watcher.get_devices() == [coldcard]
+    assert watcher.get_devices() == [coldcard]
+    assert bus.enumerate_calls == 1
+
+
+def test_events_refresh_the_cache():
+    bus = FakeBus()
+    event_source = FakeEventSource()
+    watcher = DeviceWatcher(enumerate_devices=bus.enumerate, event_source=event_source, debounce_seconds=0)
+
+    changes = []
+    changed = threading.Event()
+
+    def on_change(added, removed, devices):
+        changes.append((added, removed, devices))
+        changed.set()
+
+    watcher.add_listener(on_change)
+    watcher.start()
+    try:
+        assert watcher.is_running
+        assert watcher.get_devices() == []
+
+        bus.devices = [coldcard, trezor]
+        event_source.plug()
+        assert changed.wait(5)
+        assert changes[-1] == ([coldcard, trezor], [], [coldcard, trezor])
+        assert watcher.get_devices() == [coldcard, trezor]
+
+        changed.clear()
+        bus.devices = [trezor]
+        event_source.plug()
+        assert changed.wait(5)
+        assert changes[-1] == ([], [coldcard], [trezor])
+    finally:
+        watcher.stop()
+    assert event_source.stopped
+    assert not watcher.is_running
+
+
+def test_no_change_no_callback():
+    bus = FakeBus()
+    bus.devices = [coldcard]
+    watcher = DeviceWatcher(enumerate_devices=bus.enumerate, event_source=FakeEventSource())
+    watcher.refresh()
+
+    changes = []
+    watcher.add_listener(lambda *args: changes.append(args))
+    watcher.refresh()
+    assert changes == []
+
+
+def test_async_listener():
+    bus = FakeBus()
+    watcher = DeviceWatcher(enumerate_devices=bus.enumerate, event_source=FakeEventSource())
+    watcher.refresh()
+
+    async def main():
+        received = asyncio.Queue()
+
+        async def on_change(added, removed, devices):
+            await received.put(added)
+
+        watcher.add_listener(on_change, loop=asyncio.get_running_loop())
+        bus.devices = [coldcard]
+        # like the watcher thread
+        await asyncio.to_thread(watcher.refresh)
+        return await asyncio.wait_for(received.get(), 5)
+
+    assert asyncio.run(main()) == [coldcard]
+
+
+def test_fallback_to_polling():
+    watcher = DeviceWatcher(enumerate_devices=FakeBus().enumerate, event_source=UnavailableEventSource())
+    watcher.start()
+    try:
+        assert isinstance(watcher.event_source, PollingEventSource)
+    finally:
+        watcher.stop()
+
+
+def test_event_source_is_abstract():
+    class IncompleteEventSource(DeviceEventSource):
+        def start(self, on_event):
+            pass
+
+    with pytest.raises(TypeError):
+        IncompleteEventSource()  # type: ignore[abstract]
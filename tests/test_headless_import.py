@@ -0,0 +1,55 @@
+import json
+import subprocess
+import sys
+
+# generous, such that slow CI runners don't fail. Locally the import takes ~0.1s
+IMPORT_BUDGET_SECONDS = 2.0
+
+HEADLESS_MODULES = [
+    "bitcoin_usb.address_generator",
+    "bitcoin_usb.address_index",
+    "bitcoin_usb.address_types",
+    "bitcoin_usb.base_device",
+    "bitcoin_usb.device_enumerator",
+    "bitcoin_usb.device_watcher",
+    "bitcoin_usb.hwi_quick",
+    "bitcoin_usb.multi_signer",
+    "bitcoin_usb.parallel_enumerator",
+    "bitcoin_usb.parallel_signer",
+    "bitcoin_usb.psbt_analysis",
+    "bitcoin_usb.psbt_tools",
+    "bitcoin_usb.seed_tools",
+    "bitcoin_usb.session_pool",
+    "bitcoin_usb.software_signer",
+    "bitcoin_usb.xpub_cache",
+]
+
+
+def import_in_fresh_interpreter(modules: list[str]) -> dict:
+    code = f"""
+import json, sys, time
+start = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+duration = time.perf_counter() - start
+print(json.dumps({{"duration": duration, "modules": list(sys.modules)}}))
+"""
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_headless_modules_dont_import_qt():
+    result = import_in_fresh_interpreter(HEADLESS_MODULES)
+    qt_modules = [m for m in result["modules"] if m.startswith("PyQt6")]
+    assert not qt_modules
+
+
+def test_headless_import_budget():
+    result = import_in_fresh_interpreter(HEADLESS_MODULES)
+    assert result["duration"] < IMPORT_BUDGET_SECONDS
+
+
+def test_translate_without_qt():
+    code = "from bitcoin_usb.i18n import translate; print(translate('bitcoin_usb', 'Error'))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "Error"
@@ -0,0 +1,139 @@
+import threading
+from contextlib import nullcontext
+
+import bdkpython as bdk
+
+from bitcoin_usb.base_device import BaseDevice
+from bitcoin_usb.multi_signer import sign_with_all
+from bitcoin_usb.psbt_tools import psbt_fingerprints
+from bitcoin_usb.software_signer import SoftwareSigner
+
+network = bdk.Network.REGTEST
+
+seeds = [
+    "spider manual inform reject arch raccoon betray moon document across main build",
+    "similar seek stock parent depart rug adjust acoustic oppose sell roast hockey",
+    "debris yellow child maze hen lamp law venue pluck ketchup melody sick",
+]
+
+# 2 of 3 of the seeds above
+multisig_descriptor = "wsh(sortedmulti(2,[7c85f2b5/48'/1'/0'/2']tpubDEBYeoKBCaY1h6353GCojAoPdi7GGz4JYhyac8StrxBWKZCb5nQQQJCFndXFmFGgakmPxS3zQkkCxzKGuLGBKhgfL96jrc6L3rn1D5bAhjo/0/*,[34be20d9/48'/1'/0'/2']tpubDEGiMrEBpyW7ebPDipDBwgxi4Ct4VqDApRcDEZy6uT8HoE5jUduJiXH7axkuQdcf7ZGamBbng7Ym3MPwLHqkugswt1uCParZBGyGsfEZ7PQ/0/*,[3b8adfc3/48'/1'/0'/2']tpubDEmjAPbjr9QfDidVmgSGdK6JYXiFy1xw9pVmXXSbZxa8qz2ixtZhaRyLdMS3wwECPao4PRC4dGWXnpwnzGUAaVewbW9VtkYaMg4neeTFLm6/0/*))"
+multisig_change_descriptor = "wsh(sortedmulti(2,[7c85f2b5/48'/1'/0'/2']tpubDEBYeoKBCaY1h6353GCojAoPdi7GGz4JYhyac8StrxBWKZCb5nQQQJCFndXFmFGgakmPxS3zQkkCxzKGuLGBKhgfL96jrc6L3rn1D5bAhjo/1/*,[34be20d9/48'/1'/0'/2']tpubDEGiMrEBpyW7ebPDipDBwgxi4Ct4VqDApRcDEZy6uT8HoE5jUduJiXH7axkuQdcf7ZGamBbng7Ym3MPwLHqkugswt1uCParZBGyGsfEZ7PQ/1/*,[3b8adfc3/48'/1'/0'/2']tpubDEmjAPbjr9QfDidVmgSGdK6JYXiFy1xw9pVmXXSbZxa8qz2ixtZhaRyLdMS3wwECPao4PRC4dGWXnpwnzGUAaVewbW9VtkYaMg4neeTFLm6/1/*))"
+multisig_psbt = "cHNidP8BAIkCAAAAASjI46t8MdEbsiZfVPkiaZ3JGC7YmxTyMZm74EDd2G1CAAAAAAD9////Av6JmAAAAAAAIgAgcjz2Q7PC6F0hUSivzhZVEjC9gVm1SRaVEmhNcNwdK664CwAAAAAAACIAILKhnxJ1tjCudKdCML09BceQ4M5A96ffH3AMXNyj5kkGBQwAAAABAP3aAwIAAAAAAQYhuJP2a8ZV/F+7yZm9Xtnt7FmHX9EP7e+iycVrMCUQEgAAAAAA/f///1RMmE5V646FrpMNTzNt2AwbTZU07TzCXd9OdTsrTgDWAAAAAAD9////gRYceHzUaRzAl0RBCFO7cZAYJY9FRniF7efnbwuNlLsAAAAAAP3////tYOUSA6VHub5kAc1F0oN56NTc0tN6j4395pdHeULa9gAAAAAA/f///7BOJiID+/5JXTNwIJUaayZY+nMbeyPwaUoWllhOPXksAQAAAAD9////v8hDGgGT0FhsRykyMvybKivQ4uUOwIFh2cdhd78ncacAAAAAAP3///8CgJaYAAAAAAAiACB6VnaHQVwp8OHC4dHg6/rNkXjoEv0zmAgl3UX9lnhstf2cDQAAAAAAIlEgUiyfoBL9UZ/gRjTscXH92T8lcBDKU3Jdv1S3z+jeYmgCRzBEAiBdtcEh7KqdrKo3TGsYMF0fP5un1Q2aihMgyoMhXjI5lQIgVPceVWGWqV/lRE6pKfSQx4lAiHl8pcRsnoJPqYAldOkBIQPoWj7e9jIHuMtz5CcCzwEw5TWQ4j6NYxfrx7pIegR9mAJHMEQCIBDcUjH7Z25SxdQOkVNk7UwDKddD0L4lcn2ciwVvbSmOAiAb8OH4UJV3fjJPeUDHL1qJnMUBBNEA8Krj3FsdxglnOQEhAp6Ay8yCqk2lPN8pwI2GZochtWVHFrnV5hKzVBNuNRfqAkcwRAIgc+Cb0ucGnGCsjtcjb39FFHCMAZypaSgD0IlN1iENj0UCIDYkyuFl8I8uaVZl7oC9Yt4HEdhDwaptJOyECsD2N881ASECW1RNyiZTlfqU2mwrYwQralZsziNAs+JRRMRVaL7N3uQCRzBEAiAfd+5qtzH6EpzJiHDn83YiULPLKkJHCUMEy7svWoIbjQIgPAFHqr+p7SVXTKeH1sh414a91UgfV48Pvd0fqe4ZH+4BIQKFutyKOkfC0ONgPo91lCXVu77pyjkfStq47zL7iy3oGwJHMEQCIAJwjbxV0HfOzkCQOV9oQIbtHJ+kBXDo5juYJhuWk3JsAiBzN4k2wY0fx6vCneZ/MPzm0WFstPAl6oLZ4AEz6a7FgQEhA5n/Nsxt8S7EAVzkehFnaL0lUf7h3RrQABgDT3Mzjx2lAkcwRAIgJ4/5/F0R8RlyFbpuxDsCpDL1ZzwkwINkYO5vC19Pw+ICIBGTq2GCs49E3SzjCehWgjNi2UuPO3sGMBlHdeqs8XekASECsclJgwvV2ENf+zIy6uI9JKA8oWCXHvXAgjeW+uTWHDkAAAAAAQErgJaYAAAAAAAiACB6VnaHQVwp8OHC4dHg6/rNkXjoEv0zmAgl3UX9lnhstQEFaVIhAg4u5xmNOJmexq2K7+QG6Kscn644nuTHOFLuEiaA94DSIQI6QwySIScj/X+kdv19gtDPaM1wc/FWryvHxyo2H/02GyECn6X+DkTIdaVG5xLRliKid6GwA/P3xjNP0sV2oviE0VxTriIGAg4u5xmNOJmexq2K7+QG6Kscn644nuTHOFLuEiaA94DSHDS+INkwAACAAQAAgAAAAIACAACAAAAAAAAAAAAiBgI6QwySIScj/X+kdv19gtDPaM1wc/FWryvHxyo2H/02Gxw7it/DMAAAgAEAAIAAAACAAgAAgAAAAAAAAAAAIgYCn6X+DkTIdaVG5xLRliKid6GwA/P3xjNP0sV2oviE0VwcfIXytTAAAIABAACAAAAAgAIAAIAAAAAAAAAAAAABAWlSIQK0QaArPgJg4Rw4cQK7oYWMqdzErP4Y50LTUfOyhXQ8GyEDCWjJ8qlI/bqNZMkNtLZgSOuXPIwb5n0Buraiah1Ks90hA3hl9jw3iDLWDO0/5yBWhTVvLu4kT79asMXE2RstOq3MU64iAgK0QaArPgJg4Rw4cQK7oYWMqdzErP4Y50LTUfOyhXQ8Gxx8hfK1MAAAgAEAAIAAAACAAgAAgAEAAAAAAAAAIgIDCWjJ8qlI/bqNZMkNtLZgSOuXPIwb5n0Buraiah1Ks90cNL4g2TAAAIABAACAAAAAgAIAAIABAAAAAAAAACICA3hl9jw3iDLWDO0/5yBWhTVvLu4kT79asMXE2RstOq3MHDuK38MwAACAAQAAgAAAAIACAACAAQAAAAAAAAAAAQFpUiECKvymAb8TIX+PFmy2AnZ8sTuAQ4smqwH59x9zBda2xY8hArYZy/V9NSyEDVuRkEw4VGWLJMU9YiV79DcC8FSQACSWIQNiFa96b9p0WOubaFXpUMq3l3r/NcLo7QQxmtGTHQIFIVOuIgICKvymAb8TIX+PFmy2AnZ8sTuAQ4smqwH59x9zBda2xY8cfIXytTAAAIABAACAAAAAgAIAAIAAAAAAAQAAACICArYZy/V9NSyEDVuRkEw4VGWLJMU9YiV79DcC8FSQACSWHDS+INkwAACAAQAAgAAAAIACAACAAAAAAAEAAAAiAgNiFa96b9p0WOubaFXpUMq3l3r/NcLo7QQxmtGTHQIFIRw7it/DMAAAgAEAAIAAAACAAgAAgAAAAAABAAAAAA=="
+
+
+class NotACosigner(BaseDevice):
+    def __init__(self) -> None:
+        super().__init__(network=network)
+        self.sign_calls = 0
+
+    def get_fingerprint(self) -> str:
+        return "deadbeef"
+
+    def sign_psbt(self, psbt: bdk.Psbt):
+        self.sign_calls += 1
+        return psbt
+
+
+class BrokenDevice(NotACosigner):
+    def get_fingerprint(self) -> str:
+        raise Exception("Device is locked")
+
+
+class WaitingSigner(SoftwareSigner):
+    "Signs only after all WaitingSigners started signing, which proves the concurrency"
+
+    def __init__(self, barrier: threading.Barrier, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.barrier = barrier
+
+    def sign_psbt(self, psbt: bdk.Psbt):
+        self.barrier.wait(timeout=10)
+        return super().sign_psbt(psbt)
+
+
+def test_psbt_fingerprints():
+    assert psbt_fingerprints(bdk.Psbt(multisig_psbt)) == {"7c85f2b5", "34be20d9", "3b8adfc3"}
+
+
+def test_sign_with_all():
+    barrier = threading.Barrier(2)
+    devices = {
+        "/dev/hidraw1": WaitingSigner(
+            barrier=barrier,
+            mnemonic=seeds[0],
+            network=network,
+            receive_descriptor=multisig_descriptor,
+            change_descriptor=multisig_change_descriptor,
+        ),
+        "/dev/hidraw2": WaitingSigner(
+            barrier=barrier,
+            mnemonic=seeds[1],
+            network=network,
+            receive_descriptor=multisig_descriptor,
+            change_descriptor=multisig_change_descriptor,
+        ),
+        "/dev/hidraw3": NotACosigner(),
+        "/dev/hidraw4": BrokenDevice(),
+    }
+    selected_devices = [{"type": "coldcard", "path": path} for path in devices]
+
+    result = sign_with_all(
+        bdk.Psbt(multisig_psbt),
+        selected_devices,
+        open_device=lambda selected_device: nullcontext(devices[selected_device["path"]]),
+    )
+
+    assert result.psbt
+    assert sorted(result.signed_fingerprints) == ["34be20d9", "7c85f2b5"]
+    assert len(result.psbt.input()[0].partial_sigs) == 2
+    assert result.psbt.finalize().could_finalize
+
+    by_path = {r.selected_device["path"]: r for r in result.device_results}
+    assert by_path["/dev/hidraw1"].sign_seconds > 0
+    assert by_path["/dev/hidraw3"].skipped
+    assert devices["/dev/hidraw3"].sign_calls == 0
+    assert [r.selected_device["path"] for r in result.failures] == ["/dev/hidraw4"]
+    assert by_path["/dev/hidraw4"].error == "Device is locked"
+
+
+def test_known_fingerprint_is_not_opened():
+    opened = []
+
+    def open_device(selected_device):
+        opened.append(selected_device)
+        return nullcontext(NotACosigner())
+
+    result = sign_with_all(
+        bdk.Psbt(multisig_psbt),
+        [{"type": "trezor", "path": "webusb:001:4", "fingerprint": "deadbeef"}],
+        open_device=open_device,
+    )
+    assert result.psbt is None
+    assert result.device_results[0].skipped
+    assert opened == []
+
+
+def test_already_signed_fingerprint_is_not_opened():
+    signer = SoftwareSigner(
+        mnemonic=seeds[0],
+        network=network,
+        receive_descriptor=multisig_descriptor,
+        change_descriptor=multisig_change_descriptor,
+    )
+    psbt = signer.sign_psbt(bdk.Psbt(multisig_psbt))
+    assert psbt
+    opened = []
+
+    def open_device(selected_device):
+        opened.append(selected_device)
+        return nullcontext(signer)
+
+    result = sign_with_all(
+        psbt,
+        [{"type": "trezor", "path": "webusb:001:4", "fingerprint": "7c85f2b5"}],
+        open_device=open_device,
+    )
+    assert result.psbt is None
+    assert result.device_results[0].skipped
+    assert opened == []
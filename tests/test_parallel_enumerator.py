@@ -0,0 +1,107 @@
+import time
+
+from hwilib.common import Chain
+
+from bitcoin_usb.parallel_enumerator import ParallelHWIEnumerator
+
+from .test_session_pool import FakeClock
+
+coldcard = {"type": "coldcard", "path": "/dev/hidraw1", "model": "coldcard"}
+trezor = {"type": "trezor", "path": "webusb:001:4", "model": "trezor"}
+jade = {"type": "jade", "path": "/dev/ttyUSB0", "model": "jade"}
+
+
+class SlowVendor:
+    def __init__(self, devices, seconds: float) -> None:
+        self.devices = devices
+        self.seconds = seconds
+        self.calls = 0
+
+    def __call__(self, password, expert, chain, allow_emulators):
+        self.calls += 1
+        time.sleep(self.seconds)
+        return [{**device, "fingerprint": "7c85f2b5"} for device in self.devices]
+
+
+def test_vendors_run_in_parallel():
+    vendors = {
+        "coldcard": SlowVendor([coldcard], 0.3),
+        "trezor": SlowVendor([trezor], 0.3),
+        "jade": SlowVendor([jade], 0.3),
+    }
+    enumerator = ParallelHWIEnumerator(
+        vendor_enumerators=vendors, quick_enumerate=lambda: [coldcard, trezor, jade]
+    )
+
+    start = time.perf_counter()
+    devices = enumerator.enumerate(chain=Chain.REGTEST)
+    duration = time.perf_counter() - start
+
+    # sequentially it would take 0.9s
+    assert duration < 0.8
+    # in the order of the vendors
+    assert [d["type"] for d in devices] == ["coldcard", "trezor", "jade"]
+    assert all(d["fingerprint"] == "7c85f2b5" for d in devices)
+
+
+def test_timeout():
+    vendors = {
+        "coldcard": SlowVendor([coldcard], 0),
+        "trezor": SlowVendor([trezor], 2),
+    }
+    enumerator = ParallelHWIEnumerator(
+        device_timeout=0.2, vendor_enumerators=vendors, quick_enumerate=lambda: [coldcard, trezor]
+    )
+
+    start = time.perf_counter()
+    devices = enumerator.enumerate()
+    assert time.perf_counter() - start < 1
+
+    assert devices[0]["fingerprint"] == "7c85f2b5"
+    # the hanging device is still listed, like hwi lists devices it could not open
+    assert devices[1]["path"] == trezor["path"]
+    assert "fingerprint" not in devices[1]
+    assert "Timed out" in devices[1]["error"]
+
+
+def test_failing_vendor_is_skipped():
+    def broken(password, expert, chain, allow_emulators):
+        raise ImportError("No module named 'usb1'")
+
+    enumerator = ParallelHWIEnumerator(
+        vendor_enumerators={"trezor": broken, "coldcard": SlowVendor([coldcard], 0)},
+        quick_enumerate=lambda: [coldcard],
+    )
+    assert [d["type"] for d in enumerator.enumerate()] == ["coldcard"]
+
+
+def test_ttl_cache():
+    clock = FakeClock()
+    vendor = SlowVendor([coldcard], 0)
+    enumerator = ParallelHWIEnumerator(
+        ttl_seconds=5,
+        vendor_enumerators={"coldcard": vendor},
+        quick_enumerate=lambda: [coldcard],
+        clock=clock,
+    )
+
+    assert enumerator.cached() is None
+    devices = enumerator.enumerate()
+    # modifying the result doesn't modify the cache
+    devices[0]["fingerprint"] = "changed"
+
+    clock.now = 3
+    assert enumerator.enumerate()[0]["fingerprint"] == "7c85f2b5"
+    assert vendor.calls == 1
+    # other chain, other result
+    enumerator.enumerate(chain=Chain.REGTEST)
+    assert vendor.calls == 2
+
+    clock.now = 10
+    assert enumerator.cached() is None
+    enumerator.enumerate()
+    assert vendor.calls == 3
+
+    enumerator.invalidate()
+    enumerator.enumerate()
+    assert vendor.calls == 4
@@ -0,0 +1,85 @@
+import bdkpython as bdk
+import pytest
+
+from bitcoin_usb.parallel_signer import ParallelSoftwareSigner
+from bitcoin_usb.psbt_tools import bdk_psbt_from_hwi
+from bitcoin_usb.software_signer import SoftwareSigner, SoftwareSignerRegistry
+
+from .test_multi_signer import multisig_change_descriptor, multisig_descriptor, multisig_psbt, seeds
+from .test_psbt_tools import large_hwi_psbt
+
+network = bdk.Network.REGTEST
+
+
+def signers(seed: str) -> tuple[SoftwareSigner, ParallelSoftwareSigner]:
+    kwargs = dict(
+        mnemonic=seed,
+        network=network,
+        receive_descriptor=multisig_descriptor,
+        change_descriptor=multisig_change_descriptor,
+    )
+    return SoftwareSigner(**kwargs), ParallelSoftwareSigner(workers=3, min_inputs_per_worker=2, **kwargs)
+
+
+@pytest.fixture(scope="module")
+def large_psbt() -> bdk.Psbt:
+    return bdk_psbt_from_hwi(large_hwi_psbt(bdk.Psbt(multisig_psbt), 7))
+
+
+def test_identical_to_serial(large_psbt: bdk.Psbt):
+    serial, parallel = signers(seeds[0])
+    try:
+        assert parallel.number_chunks(7) == 3
+        parallel_result = parallel.sign(bdk.Psbt(large_psbt.serialize()))
+        serial_result = serial.sign(bdk.Psbt(large_psbt.serialize()))
+
+        assert parallel_result.psbt.serialize() == serial_result.psbt.serialize()
+        assert parallel_result.new_signatures == serial_result.new_signatures
+        assert parallel_result.signed_inputs == list(range(7))
+        assert not parallel_result.finalized
+
+        # the 2. cosigner finalizes
+        serial2, parallel2 = signers(seeds[1])
+        try:
+            finalized_parallel = parallel2.sign(bdk.Psbt(parallel_result.psbt.serialize()))
+            finalized_serial = serial2.sign(bdk.Psbt(serial_result.psbt.serialize()))
+            assert finalized_parallel.finalized
+            assert finalized_parallel.psbt.serialize() == finalized_serial.psbt.serialize()
+            assert finalized_parallel.new_signatures == finalized_serial.new_signatures
+        finally:
+            parallel2.close()
+    finally:
+        parallel.close()
+
+
+def test_small_psbt_is_signed_serially():
+    _, parallel = signers(seeds[0])
+    signed = parallel.sign_psbt(bdk.Psbt(multisig_psbt))
+    assert signed
+    assert parallel._executor is None
+
+
+class SmallChunksParallelSoftwareSigner(ParallelSoftwareSigner):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, workers=2, min_inputs_per_worker=2, **kwargs)
+
+
+def test_evicted_signer_stops_the_workers(large_psbt: bdk.Psbt):
+    registry = SoftwareSignerRegistry(maxsize=1, signer_class=SmallChunksParallelSoftwareSigner)
+    signer = registry.get(seeds[0], multisig_descriptor, multisig_change_descriptor, network)
+    assert isinstance(signer, ParallelSoftwareSigner)
+    try:
+        assert signer.sign(bdk.Psbt(large_psbt.serialize())).signed_inputs == list(range(7))
+        executor = signer._executor
+        assert executor is not None
+
+        # evicts and wipes the parallel signer
+        registry.get(seeds[1], multisig_descriptor, multisig_change_descriptor, network)
+        assert signer.wiped
+        assert signer._executor is None
+        with pytest.raises(RuntimeError):
+            executor.submit(len, b"")
+        with pytest.raises(ValueError):
+            signer.sign(bdk.Psbt(large_psbt.serialize()))
+    finally:
+        registry.clear()
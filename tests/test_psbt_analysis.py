@@ -0,0 +1,76 @@
+import bdkpython as bdk
+
+from bitcoin_usb.address_types import DescriptorInfo
+from bitcoin_usb.psbt_analysis import PSBTAnalysis, PSBTAnalysisCache
+from bitcoin_usb.software_signer import SoftwareSigner
+
+from .test_multi_signer import multisig_change_descriptor, multisig_descriptor, multisig_psbt, seeds
+
+network = bdk.Network.REGTEST
+
+
+def sign(psbt: bdk.Psbt, seed: str) -> bdk.Psbt:
+    signer = SoftwareSigner(
+        mnemonic=seed,
+        network=network,
+        receive_descriptor=multisig_descriptor,
+        change_descriptor=multisig_change_descriptor,
+    )
+    signed = signer.sign_psbt(bdk.Psbt(psbt.serialize()))
+    assert signed
+    return signed
+
+
+def test_unsigned():
+    analysis = PSBTAnalysis(bdk.Psbt(multisig_psbt))
+
+    assert analysis.number_inputs == 1
+    assert analysis.fingerprints == {"7C85F2B5", "34BE20D9", "3B8ADFC3"}
+    assert analysis.is_cosigner("7c85f2b5")
+    assert not analysis.is_cosigner("00000000")
+    assert analysis.missing_fingerprints() == analysis.fingerprints
+    assert analysis.missing_inputs("7c85f2b5") == {0}
+    assert analysis.signed_inputs("7c85f2b5") == set()
+    assert analysis.inputs_of("7c85f2b5", key_origin="m/48'/1'/0'/2'") == {0}
+    assert analysis.inputs_of("7c85f2b5", key_origin="m/48h/1h/0h/1h") == set()
+    assert len(analysis.pubkeys_of("7c85f2b5", 0)) == 1
+
+    key_origin = next(k for k in analysis.key_origins if k.fingerprint == "7C85F2B5")
+    assert key_origin.path == "m/48h/1h/0h/2h/0/0"
+    assert key_origin.key_origin == "m/48h/1h/0h/2h"
+
+
+def test_partially_signed():
+    psbt = sign(bdk.Psbt(multisig_psbt), seeds[0])
+    analysis = PSBTAnalysis(psbt)
+
+    assert not analysis.needs_signature("7c85f2b5")
+    assert analysis.signed_inputs("7c85f2b5") == {0}
+    assert analysis.missing_fingerprints() == {"34BE20D9", "3B8ADFC3"}
+    assert analysis.signed_keys[0] == analysis.pubkeys_of("7c85f2b5", 0)
+
+    descriptor_info = DescriptorInfo.from_str(multisig_descriptor)
+    assert [p.fingerprint for p in analysis.missing_spk_providers(descriptor_info)] == [
+        "34BE20D9",
+        "3B8ADFC3",
+    ]
+
+
+def test_cache():
+    cache = PSBTAnalysisCache(maxsize=2)
+    psbt = bdk.Psbt(multisig_psbt)
+
+    analysis = cache.get(psbt)
+    # an identical psbt (other object) has the same id
+    assert cache.get(bdk.Psbt(multisig_psbt)) is analysis
+
+    signed = sign(psbt, seeds[0])
+    assert cache.get(signed) is not analysis
+    assert len(cache) == 2
+
+    cache.get(sign(psbt, seeds[1]))
+    assert len(cache) == 2
+    # the least recently used entry was dropped
+    assert cache.get(psbt) is not analysis
+
+    assert PSBTAnalysis.of(psbt) is PSBTAnalysis.of(psbt)
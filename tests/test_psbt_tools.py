@@ -1,4 +1,27 @@
+import base64
+import copy
+
 import bdkpython as bdk
+import pytest
+from hwilib.psbt import PSBT
+from hwilib.tx import CTransaction
+
+from bitcoin_usb.address_types import AddressTypes, DescriptorInfo
+from bitcoin_usb.psbt_tools import (
+    bdk_psbt_from_hwi,
+    combine_psbts,
+    hwi_psbt_from_bdk,
+    hwi_psbt_to_bytes,
+    merge_hwi_signatures,
+    new_signature_keys,
+    psbt_signature_keys,
+    slim_hwi_psbt,
+)
+from bitcoin_usb.seed_tools import derive_spk_provider
+from bitcoin_usb.software_signer import SIGN_OPTIONS_WITHOUT_FINALIZE, SoftwareSigner
+
+from .test_multi_signer import seeds
+from .test_software_signer import funded_psbt
 
 
 # test seeds
@@ -35,3 +58,204 @@ def test_finalize():
 def test_not_finalize():
     assert not p2wsh_psbt_0_2of3.finalize().could_finalize
     assert not p2wsh_psbt_1_2of3.finalize().could_finalize
+
+
+def large_hwi_psbt(psbt: bdk.Psbt, number_inputs: int) -> PSBT:
+    "A psbt with number_inputs copies of the first input (incl. its previous transaction)"
+    hwi_psbt = hwi_psbt_from_bdk(psbt)
+    hwi_psbt.inputs = [copy.deepcopy(hwi_psbt.inputs[0]) for _ in range(number_inputs)]
+    hwi_psbt.tx.vin = [copy.deepcopy(hwi_psbt.tx.vin[0]) for _ in range(number_inputs)]
+    return hwi_psbt
+
+
+def test_hwi_psbt_to_bytes():
+    for psbt in [p2wsh_psbt_0_2of3, p2wsh_psbt_1_2of3, p2wsh_2_2of3]:
+        hwi_psbt = hwi_psbt_from_bdk(psbt)
+        assert base64.b64encode(hwi_psbt_to_bytes(hwi_psbt)).decode() == hwi_psbt.serialize()
+        assert bdk_psbt_from_hwi(hwi_psbt).serialize() == psbt.serialize()
+
+    hwi_psbt = large_hwi_psbt(p2wsh_psbt_0_2of3, 20)
+    assert base64.b64encode(hwi_psbt_to_bytes(hwi_psbt)).decode() == hwi_psbt.serialize()
+
+
+def test_version_2_round_trip():
+    for psbt in [p2wsh_psbt_1_2of3, p2wsh_2_2of3]:
+        # like a device client, that converts the psbt in memory. Version 2 has no unsigned tx
+        hwi_psbt = hwi_psbt_from_bdk(psbt)
+        hwi_psbt.convert_to_v2()
+        hwi_psbt.tx = CTransaction()
+
+        psbt_bytes = hwi_psbt_to_bytes(hwi_psbt)
+        assert base64.b64encode(psbt_bytes).decode() == hwi_psbt.serialize()
+        parsed = PSBT()
+        parsed.deserialize(base64.b64encode(psbt_bytes).decode())
+        assert (len(parsed.inputs), len(parsed.outputs)) == (len(psbt.input()), len(hwi_psbt.outputs))
+
+        # bdk gets version 0, without changing hwi_psbt
+        assert bdk_psbt_from_hwi(hwi_psbt).serialize() == psbt.serialize()
+        assert hwi_psbt.version == 2 and hwi_psbt.tx.is_null()
+
+        unsigned = hwi_psbt_from_bdk(psbt)
+        for psbt_input in unsigned.inputs:
+            psbt_input.partial_sigs.clear()
+        merged = merge_hwi_signatures(bdk_psbt_from_hwi(unsigned), hwi_psbt, complete=False)
+        assert merged.serialize() == psbt.serialize()
+
+
+def test_merge_hwi_signatures():
+    # p2wsh_psbt_1_2of3 is the signed version of the first input of p2wsh_psbt_0_2of3 (but other outputs)
+    unsigned = hwi_psbt_from_bdk(p2wsh_psbt_1_2of3)
+    for psbt_input in unsigned.inputs:
+        psbt_input.partial_sigs.clear()
+    unsigned_psbt = bdk_psbt_from_hwi(unsigned)
+
+    merged = merge_hwi_signatures(unsigned_psbt, hwi_psbt_from_bdk(p2wsh_psbt_1_2of3))
+    assert merged.serialize() == p2wsh_psbt_1_2of3.serialize()
+    # the original is not modified
+    assert not unsigned_psbt.input()[0].partial_sigs
+
+
+def test_merge_hwi_signatures_other_tx_falls_back():
+    # the device returned another transaction. The returned psbt is taken as is
+    merged = merge_hwi_signatures(p2wsh_psbt_0_2of3, hwi_psbt_from_bdk(p2wsh_2_2of3))
+    assert merged.serialize() == p2wsh_2_2of3.serialize()
+
+
+def test_slim_hwi_psbt():
+    hwi_psbt = hwi_psbt_from_bdk(p2wsh_2_2of3)
+    proprietary = (b"\xfc\x05hello\x00", b"world")
+    hwi_psbt.unknown[proprietary[0]] = proprietary[1]
+    hwi_psbt.inputs[0].unknown[proprietary[0]] = proprietary[1]
+    hwi_psbt.outputs[0].unknown[proprietary[0]] = proprietary[1]
+    original = bdk_psbt_from_hwi(hwi_psbt)
+
+    report = slim_hwi_psbt(hwi_psbt, fingerprint="2597e429")
+
+    psbt_input = hwi_psbt.inputs[0]
+    # only the own signature is kept
+    assert [pubkey.hex()[:8] for pubkey in psbt_input.partial_sigs] == ["02a2fdde"]
+    assert len(psbt_input.hd_keypaths) == 3
+    # needed for segwit v0 inputs
+    assert psbt_input.non_witness_utxo is not None
+    assert not hwi_psbt.unknown and not psbt_input.unknown and not hwi_psbt.outputs[0].unknown
+
+    assert report.bytes_saved == report.original_bytes - len(hwi_psbt_to_bytes(hwi_psbt))
+    assert report.bytes_saved > 72
+    assert report.transfer_seconds_saved() > 0
+
+    # nothing is lost after merging
+    assert merge_hwi_signatures(original, hwi_psbt, complete=False).serialize() == original.serialize()
+
+
+def test_slim_foreign_derivations():
+    hwi_psbt = hwi_psbt_from_bdk(p2wsh_2_2of3)
+    slim_hwi_psbt(hwi_psbt, fingerprint="2597e429", strip_foreign_derivations=True)
+    assert [origin.fingerprint.hex() for origin in hwi_psbt.inputs[0].hd_keypaths.values()] == ["2597e429"]
+
+
+def test_slim_taproot_previous_transactions():
+    hwi_psbt = hwi_psbt_from_bdk(p2wsh_psbt_0_2of3)
+    hwi_psbt.inputs[0].witness_utxo.scriptPubKey = b"\x51\x20" + bytes(32)
+    assert hwi_psbt.inputs[0].non_witness_utxo is not None
+
+    report = slim_hwi_psbt(hwi_psbt)
+    assert hwi_psbt.inputs[0].non_witness_utxo is None
+    assert report.bytes_saved > 100
+
+
+def with_partial_sigs(psbt: bdk.Psbt, pubkeys_hex: list[str], swap=False) -> bdk.Psbt:
+    "psbt, with only the signatures of pubkeys_hex in the first input (swap exchanges the signatures)"
+    hwi_psbt = hwi_psbt_from_bdk(psbt)
+    partial_sigs = hwi_psbt.inputs[0].partial_sigs
+    pubkeys = [pubkey for pubkey in partial_sigs if pubkey.hex() in pubkeys_hex]
+    sigs = [partial_sigs[pubkey] for pubkey in pubkeys]
+    if swap:
+        sigs.reverse()
+    hwi_psbt.inputs[0].partial_sigs = dict(zip(pubkeys, sigs))
+    return bdk_psbt_from_hwi(hwi_psbt)
+
+
+def test_combine_psbts():
+    pubkeys = sorted(p2wsh_2_2of3.input()[0].partial_sigs)
+    psbt_a = with_partial_sigs(p2wsh_2_2of3, pubkeys[:1])
+    psbt_b = with_partial_sigs(p2wsh_2_2of3, pubkeys[1:])
+    assert len(psbt_a.input()[0].partial_sigs) == 1
+
+    # streamed from a generator
+    result = combine_psbts(psbt for psbt in [psbt_a, psbt_b, psbt_a, psbt_b])
+
+    assert result.psbt
+    assert result.number_psbts == 4
+    assert result.duplicate_signatures == 2
+    assert not result.conflicts
+    assert result.psbt.input()[0].partial_sigs == p2wsh_2_2of3.input()[0].partial_sigs
+    assert result.psbt.finalize().could_finalize
+
+    (coverage,) = result.coverage
+    assert coverage.signed_keys == set(pubkeys)
+    assert coverage.signed_fingerprints == {"2597e429", "f4e49574"}
+    assert coverage.missing_fingerprints == {"26ebf92a"}
+    assert len(coverage.missing_keys) == 1
+
+
+def test_combine_psbts_conflict():
+    pubkeys = sorted(p2wsh_2_2of3.input()[0].partial_sigs)
+    swapped = with_partial_sigs(p2wsh_2_2of3, pubkeys, swap=True)
+
+    result = combine_psbts([p2wsh_2_2of3, swapped])
+
+    assert result.psbt
+    assert sorted(conflict.key for conflict in result.conflicts) == pubkeys
+    assert {conflict.psbt_index for conflict in result.conflicts} == {1}
+    # the first signatures are kept
+    assert result.psbt.input()[0].partial_sigs == p2wsh_2_2of3.input()[0].partial_sigs
+
+
+def test_combine_psbts_taproot_key_path_conflict():
+    spk_provider = derive_spk_provider(seeds[0], AddressTypes.p2tr.key_origin(network), network)
+    descriptor = DescriptorInfo(AddressTypes.p2tr, [spk_provider]).get_descriptor_str(network)
+    change_descriptor = descriptor.split("#")[0].replace("/0/*", "/1/*")
+    signed = funded_psbt(descriptor, change_descriptor, number_inputs=2)
+    signer = SoftwareSigner(seeds[0], descriptor, change_descriptor, network)
+    signer.wallet.sign(psbt=signed, sign_options=SIGN_OPTIONS_WITHOUT_FINALIZE)
+    signatures = [psbt_input.tap_key_sig for psbt_input in hwi_psbt_from_bdk(signed).inputs]
+    assert all(signatures)
+
+    # the 1. psbt has only the signature of input 0
+    hwi_psbt_a = hwi_psbt_from_bdk(signed)
+    hwi_psbt_a.inputs[1].tap_key_sig = b""
+    # the 2. psbt adds the signature of input 1, but has another signature for input 0
+    hwi_psbt_b = hwi_psbt_from_bdk(signed)
+    hwi_psbt_b.inputs[0].tap_key_sig = bytes(64)
+
+    result = combine_psbts([bdk_psbt_from_hwi(hwi_psbt_a), bdk_psbt_from_hwi(hwi_psbt_b)])
+
+    assert result.psbt
+    assert [(conflict.input_index, conflict.psbt_index) for conflict in result.conflicts] == [(0, 1)]
+    # the first signature of input 0 is kept
+    assert [psbt_input.tap_key_sig for psbt_input in hwi_psbt_from_bdk(result.psbt).inputs] == signatures
+
+
+def test_combine_psbts_other_tx():
+    assert combine_psbts([]).psbt is None
+    with pytest.raises(Exception):
+        combine_psbts([p2wsh_psbt_0_2of3, p2wsh_psbt_1_2of3])
+
+
+def test_psbt_signature_keys():
+    psbt = bdk_psbt_from_hwi(large_hwi_psbt(p2wsh_2_2of3, 3))
+    keys = psbt_signature_keys(psbt)
+    assert keys == [set(psbt_input.partial_sigs) for psbt_input in psbt.input()]
+    assert len(keys) == 3
+    assert len(keys[0]) == 2
+
+
+def test_new_signature_keys():
+    keys = sorted(psbt_signature_keys(p2wsh_2_2of3)[0])
+    unsigned = base64.b64decode(with_partial_sigs(p2wsh_2_2of3, keys[:1]).serialize())
+    signed = base64.b64decode(p2wsh_2_2of3.serialize())
+
+    assert new_signature_keys(unsigned, signed) == {0: {keys[1]}}
+    assert new_signature_keys(signed, signed) == {}
+    # removed signatures are not new
+    assert new_signature_keys(signed, unsigned) == {}
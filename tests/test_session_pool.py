@@ -0,0 +1,175 @@
+import threading
+
+import bdkpython as bdk
+from hwilib.common import Chain
+
+from bitcoin_usb.device import USBDevice
+from bitcoin_usb.session_pool import DeviceSessionPool
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+device_a = {"type": "trezor", "path": "webusb:001:1", "model": "trezor_t"}
+device_b = {"type": "bitbox02", "path": "/dev/hidraw1", "model": "bitbox02_btconly"}
+
+
+def test_reuse_client():
+    pool = DeviceSessionPool()
+    created = []
+
+    def factory():
+        created.append(FakeClient())
+        return created[-1]
+
+    client = pool.acquire(device_a, Chain.REGTEST, factory)
+    pool.release(device_a, client)
+    assert not client.closed
+
+    client2 = pool.acquire(device_a, Chain.REGTEST, factory)
+    pool.release(device_a, client2)
+    assert client2 is client
+    assert len(created) == 1
+    assert device_a in pool
+    assert device_b not in pool
+
+
+def test_unhealthy_release_closes():
+    pool = DeviceSessionPool()
+    client = pool.acquire(device_a, Chain.REGTEST, FakeClient)
+    pool.release(device_a, client, healthy=False)
+    assert client.closed
+    assert len(pool) == 0
+
+    client2 = pool.acquire(device_a, Chain.REGTEST, FakeClient)
+    assert client2 is not client
+
+
+def test_other_chain_recreates_client():
+    pool = DeviceSessionPool()
+    client = pool.acquire(device_a, Chain.REGTEST, FakeClient)
+    pool.release(device_a, client)
+
+    client2 = pool.acquire(device_a, Chain.MAIN, FakeClient)
+    assert client.closed
+    assert client2 is not client
+
+
+def test_idle_eviction():
+    clock = FakeClock()
+    pool = DeviceSessionPool(max_idle_seconds=10, clock=clock)
+    client = pool.acquire(device_a, Chain.REGTEST, FakeClient)
+
+    # in use sessions are never evicted
+    clock.now = 100
+    assert pool.evict_idle() == 0
+    pool.release(device_a, client)
+
+    clock.now = 105
+    assert pool.evict_idle() == 0
+    assert not client.closed
+
+    clock.now = 115
+    assert pool.evict_idle() == 1
+    assert client.closed
+    assert len(pool) == 0
+
+
+def test_disconnect_detection():
+    pool = DeviceSessionPool()
+    client_a = pool.acquire(device_a, Chain.REGTEST, FakeClient)
+    pool.release(device_a, client_a)
+    client_b = pool.acquire(device_b, Chain.REGTEST, FakeClient)
+    pool.release(device_b, client_b)
+
+    assert pool.retain_only([device_b]) == 1
+    assert client_a.closed
+    assert not client_b.closed
+    assert device_a not in pool
+    assert device_b in pool
+
+    pool.close_all()
+    assert client_b.closed
+    assert len(pool) == 0
+
+
+def test_usb_device_uses_pool():
+    pool = DeviceSessionPool()
+    created = []
+
+    def factory():
+        created.append(FakeClient())
+        return created[-1]
+
+    for _ in range(3):
+        dev = USBDevice(selected_device=device_a, network=bdk.Network.REGTEST, session_pool=pool)
+        dev._create_client = factory
+        with dev:
+            assert dev.client is created[0]
+        assert not created[0].closed
+
+    assert len(created) == 1
+
+    # after a wipe the client is not reused
+    dev = USBDevice(selected_device=device_a, network=bdk.Network.REGTEST, session_pool=pool)
+    dev._create_client = factory
+    with dev:
+        dev.keep_session = False
+    assert created[0].closed
+    assert len(pool) == 0
+
+
+def test_sessions_in_use_are_closed_on_release():
+    pool = DeviceSessionPool()
+    for remove in [
+        pool.close_all,
+        lambda: pool.retain_only([]),
+        lambda: pool.discard(device_a),
+        # a session for another chain replaces it
+        lambda: pool.release(device_a, pool.acquire(device_a, Chain.MAIN, FakeClient)),
+    ]:
+        client = pool.acquire(device_a, Chain.REGTEST, FakeClient)
+        remove()
+        # the running operation keeps its client
+        assert not client.closed
+        other_client = pool.acquire(device_a, Chain.REGTEST, FakeClient)
+        assert other_client is not client
+        pool.release(device_a, other_client)
+        pool.close_all()
+
+        pool.release(device_a, client)
+        assert client.closed
+        assert not pool._retired
+
+
+def test_waiting_operation_continues_after_removal():
+    pool = DeviceSessionPool()
+    client = pool.acquire(device_a, Chain.REGTEST, FakeClient)
+    acquired = []
+    waiting = threading.Thread(
+        target=lambda: acquired.append(pool.acquire(device_a, Chain.REGTEST, FakeClient))
+    )
+    waiting.start()
+    waiting.join(timeout=0.1)
+    assert waiting.is_alive()
+
+    # the waiting operation gets a new client, once the running one releases the removed session
+    pool.close_all()
+    pool.release(device_a, client)
+    waiting.join(timeout=5)
+    assert not waiting.is_alive()
+    assert client.closed
+    assert acquired[0] is not client and not acquired[0].closed
@@ -1,7 +1,19 @@
 import logging
 import bdkpython as bdk
+import pytest
+from hwilib.tx import COutPoint, CTransaction, CTxIn, CTxOut
 
-from bitcoin_usb.software_signer import SoftwareSigner
+from bitcoin_usb.address_types import DescriptorInfo, DescriptorInfoCache, get_all_address_types
+from bitcoin_usb.psbt_tools import bdk_psbt_from_hwi, hwi_psbt_from_bdk
+from bitcoin_usb.seed_tools import derive_spk_provider
+from bitcoin_usb.software_signer import (
+    SIGN_OPTIONS_WITHOUT_FINALIZE,
+    SeedSigner,
+    SoftwareSigner,
+    SoftwareSignerRegistry,
+)
+
+from .test_multi_signer import multisig_change_descriptor, multisig_descriptor, multisig_psbt, seeds
 
 # test seeds
 # seed1: spider manual inform reject arch raccoon betray moon document across main build
@@ -79,3 +91,219 @@ def test_single_multisig_sign():
         bytes(signed_psbt.extract_tx().serialize()).hex()
         == "0200000000010128c8e3ab7c31d11bb2265f54f922699dc9182ed89b14f23199bbe040ddd86d420000000000fdffffff02fe89980000000000220020723cf643b3c2e85d215128afce16551230bd8159b549169512684d70dc1d2baeb80b000000000000220020b2a19f1275b630ae74a74230bd3d05c790e0ce40f7a7df1f700c5cdca3e64906040047304402201477c2de8e9c344e73180cbc7a9e80cfd30ec80c086699ffb7df7760a5d6dffd022063695caa8ced6ab840e75d7d0d976d71264d3ffea0a8672fc6c6f22580366833014730440220786b0e7aba74b314ffb6fda3230a8ef061d39599d3f76e2232840dc43ba4f28c02203e031d7fbee4173252955b5ba39c59b6f93c1414aed984eec855a1a341af24ea01695221020e2ee7198d38999ec6ad8aefe406e8ab1c9fae389ee4c73852ee122680f780d221023a430c92212723fd7fa476fd7d82d0cf68cd7073f156af2bc7c72a361ffd361b21029fa5fe0e44c875a546e712d19622a277a1b003f3f7c6334fd2c576a2f884d15c53ae050c0000"
     )
+
+
+def test_sign_result():
+    signers = [
+        SoftwareSigner(
+            mnemonic=seed,
+            network=network,
+            receive_descriptor=multisig_descriptor,
+            change_descriptor=multisig_change_descriptor,
+        )
+        for seed in seeds[:2]
+    ]
+    psbt = bdk.Psbt(multisig_psbt)
+    pubkey_7c85f2b5 = next(
+        pubkey
+        for pubkey, key_source in psbt.input()[0].bip32_derivation.items()
+        if key_source.fingerprint == "7c85f2b5"
+    )
+
+    result = signers[0].sign(psbt)
+    assert result.psbt is psbt
+    assert result.new_signatures == {0: {pubkey_7c85f2b5}}
+    assert result.signed_inputs == [0]
+    assert not result.finalized
+    assert set(psbt.input()[0].partial_sigs) == {pubkey_7c85f2b5}
+
+    # signing again adds nothing
+    assert not signers[0].sign(bdk.Psbt(psbt.serialize())).new_signatures
+    assert signers[0].sign_psbt(bdk.Psbt(psbt.serialize())) is None
+
+    result = signers[1].sign(psbt)
+    assert result.signed_inputs == [0]
+    assert pubkey_7c85f2b5 not in result.new_signatures[0]
+    assert result.finalized
+    assert psbt.input()[0].final_script_witness
+
+
+def test_sign_psbt_returns_partially_finalized_psbt():
+    signers = [
+        SoftwareSigner(
+            mnemonic=seed,
+            network=network,
+            receive_descriptor=multisig_descriptor,
+            change_descriptor=multisig_change_descriptor,
+        )
+        for seed in seeds[:2]
+    ]
+    psbt = funded_psbt(multisig_descriptor, multisig_change_descriptor, number_inputs=2)
+    for signer in signers:
+        signer.wallet.sign(psbt=psbt, sign_options=SIGN_OPTIONS_WITHOUT_FINALIZE)
+    # input 1 only keeps the signature of signers[0]
+    hwi_psbt = hwi_psbt_from_bdk(psbt)
+    hwi_input = hwi_psbt.inputs[1]
+    hwi_input.partial_sigs = {
+        pubkey: sig
+        for pubkey, sig in hwi_input.partial_sigs.items()
+        if hwi_input.hd_keypaths[pubkey].fingerprint.hex() == signers[0].get_fingerprint().lower()
+    }
+    psbt = bdk_psbt_from_hwi(hwi_psbt)
+
+    # no new signatures, but input 0 gets finalized
+    result = signers[0].sign(bdk.Psbt(psbt.serialize()))
+    assert not result.new_signatures
+    assert not result.finalized
+    signed = signers[0].sign_psbt(bdk.Psbt(psbt.serialize()))
+    assert signed
+    assert signed.input()[0].final_script_witness
+    assert not signed.input()[1].final_script_witness
+
+
+def test_signer_registry():
+    registry = SoftwareSignerRegistry(maxsize=2)
+    signer = registry.get(seeds[0], multisig_descriptor, multisig_change_descriptor, network)
+    # the wallet is built lazily
+    assert signer._wallet is None
+    assert registry.get(f" {seeds[0]}  ", multisig_descriptor, multisig_change_descriptor, network) is signer
+
+    assert signer.sign_psbt(bdk.Psbt(multisig_psbt))
+    wallet = signer._wallet
+    assert wallet is not None
+    assert registry.get(seeds[0], multisig_descriptor, multisig_change_descriptor, network).wallet is wallet
+
+    other_network = registry.get(
+        seeds[0], multisig_descriptor, multisig_change_descriptor, bdk.Network.TESTNET
+    )
+    assert other_network is not signer
+    assert len(registry) == 2
+
+    # the least recently used signer is evicted and wiped
+    registry.get(seeds[1], multisig_descriptor, multisig_change_descriptor, network)
+    assert len(registry) == 2
+    assert signer.wiped
+    assert signer.mnemonic == ""
+    assert not signer.derivation_context._derived_secrets
+    with pytest.raises(ValueError):
+        signer.sign_psbt(bdk.Psbt(multisig_psbt))
+    assert registry.get(seeds[0], multisig_descriptor, multisig_change_descriptor, network) is not signer
+
+    registry.clear()
+    assert len(registry) == 0
+    assert other_network.wiped
+
+
+def test_signer_registry_checkout():
+    registry = SoftwareSignerRegistry(maxsize=1)
+    with registry.checkout(seeds[0], multisig_descriptor, multisig_change_descriptor, network) as signer:
+        # evicted (e.g. by a request in another thread) while it is checked out
+        registry.get(seeds[1], multisig_descriptor, multisig_change_descriptor, network)
+        assert not signer.wiped
+        assert signer.sign_psbt(bdk.Psbt(multisig_psbt))
+    # wiped on the release
+    assert signer.wiped
+    assert signer.mnemonic == ""
+
+    # a sign in progress holds a checkout too
+    signer = registry.get(seeds[0], multisig_descriptor, multisig_change_descriptor, network)
+    with signer.checkout():
+        registry.clear()
+        assert signer.sign_psbt(bdk.Psbt(multisig_psbt))
+        assert not signer.wiped
+    assert signer.wiped
+    with pytest.raises(ValueError):
+        signer.sign_psbt(bdk.Psbt(multisig_psbt))
+
+
+def funded_psbt(descriptor: str, change_descriptor: str, number_inputs: int) -> bdk.Psbt:
+    "A psbt spending number_inputs unconfirmed outputs of the wallet"
+    wallet = bdk.Wallet(
+        bdk.Descriptor(descriptor, network),
+        bdk.Descriptor(change_descriptor, network),
+        network,
+        bdk.Persister.new_in_memory(),
+    )
+    funding_tx = CTransaction()
+    funding_tx.nVersion = 2
+    funding_tx.vin = [CTxIn(COutPoint(1, 0))]
+    for _ in range(number_inputs):
+        address = wallet.reveal_next_address(bdk.KeychainKind.EXTERNAL).address
+        funding_tx.vout.append(CTxOut(100_000, address.script_pubkey().to_bytes()))
+    wallet.apply_unconfirmed_txs([bdk.UnconfirmedTx(tx=bdk.Transaction(funding_tx.serialize()), last_seen=1)])
+    return (
+        bdk.TxBuilder()
+        .drain_to(wallet.peek_address(bdk.KeychainKind.INTERNAL, 0).address.script_pubkey())
+        .drain_wallet()
+        .fee_rate(bdk.FeeRate.from_sat_per_vb(1))
+        .finish(wallet)
+    )
+
+
+@pytest.mark.parametrize(
+    "address_type", get_all_address_types(), ids=lambda address_type: address_type.short_name
+)
+def test_seed_signer(address_type):
+    descriptor_info = DescriptorInfo(
+        address_type=address_type,
+        spk_providers=[
+            derive_spk_provider(seed, address_type.key_origin(network), network)
+            for seed in (seeds if address_type.is_multisig else seeds[:1])
+        ],
+        threshold=2 if address_type.is_multisig else 1,
+    )
+    descriptor = descriptor_info.get_descriptor_str(network)
+    change_descriptor = descriptor.split("#")[0].replace("/0/*", "/1/*")
+    psbt = funded_psbt(descriptor, change_descriptor, number_inputs=2)
+
+    software_signer = SoftwareSigner(
+        mnemonic=seeds[0],
+        receive_descriptor=descriptor,
+        change_descriptor=change_descriptor,
+        network=network,
+    )
+    expected = software_signer.sign(bdk.Psbt(psbt.serialize()))
+
+    result = SeedSigner(seeds[0], network).sign(bdk.Psbt(psbt.serialize()))
+    assert result.new_signatures == expected.new_signatures
+    assert not result.finalized
+    if expected.finalized:
+        software_signer.wallet.finalize_psbt(psbt=result.psbt, sign_options=None)
+    assert result.psbt.serialize() == expected.psbt.serialize()
+
+
+def test_seed_signer_accounts():
+    seed_signer = SeedSigner(seeds[1], network, max_wallets=1)
+    signed = seed_signer.sign_psbt(bdk.Psbt(multisig_psbt))
+    assert signed
+    assert seed_signer.account_key_origins(signed) == set()
+    # already signed
+    assert seed_signer.sign_psbt(signed) is None
+
+    account_1 = DescriptorInfo.from_str(multisig_descriptor).spk_providers[1]
+    account_1_descriptor = (
+        f"wpkh([{account_1.fingerprint}/48'/1'/1'/2']{seed_signer.derive('m/48h/1h/1h/2h')}/0/*)"
+    )
+    psbt = funded_psbt(account_1_descriptor, account_1_descriptor.replace("/0/*", "/1/*"), number_inputs=1)
+    assert seed_signer.account_key_origins(psbt) == {("m/48h/1h/1h/2h", False)}
+    assert seed_signer.sign(psbt).signed_inputs == [0]
+    # only 1 account wallet is kept
+    assert list(seed_signer._wallets) == [("m/48h/1h/1h/2h", False)]
+    assert "m/48h/1h/0h/2h" not in seed_signer.derivation_context._derived_secrets
+
+    assert SeedSigner(seeds[0], network).sign_psbt(psbt) is None
+
+
+def test_descriptor_cache():
+    cache = DescriptorInfoCache()
+    for seed in seeds[:2]:
+        signer = SoftwareSigner(
+            mnemonic=seed,
+            receive_descriptor=multisig_descriptor,
+            change_descriptor=multisig_change_descriptor,
+            network=network,
+            descriptor_cache=cache,
+        )
+        assert signer.sign_psbt(bdk.Psbt(multisig_psbt))
+    # the 2. signer parses the descriptors from the cache
+    assert (cache.hits, cache.misses) == (2, 2)
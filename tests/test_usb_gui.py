@@ -0,0 +1,68 @@
+from typing import Any
+
+import bdkpython as bdk
+import pytest
+
+from bitcoin_usb.device import USBDevice
+
+from .test_device import FakeSigningClient
+from .test_psbt_tools import p2wsh_2_2of3, p2wsh_psbt_0_2of3, p2wsh_psbt_1_2of3
+
+try:
+    from bitcoin_usb.usb_gui import USBGui
+except Exception as e:  # the gui dependencies (Qt) are not importable everywhere
+    pytest.skip(f"usb_gui is not importable: {e}", allow_module_level=True)
+
+network = bdk.Network.REGTEST
+
+
+class FakeSigningDevice(USBDevice):
+    "Opens a FakeSigningClient instead of a hwi client"
+
+    def __init__(self, client: FakeSigningClient, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.fake_client = client
+        self.closed = False
+
+    def _create_client(self):
+        return self.fake_client
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        self.closed = True
+
+
+def get_usb_gui(client: FakeSigningClient) -> tuple[USBGui, list[FakeSigningDevice]]:
+    usb_gui = USBGui(network=network, loop_in_thread=None)  # type: ignore
+    devices: list[FakeSigningDevice] = []
+
+    def usb_device(selected_device: dict[str, Any], in_worker_thread=False) -> USBDevice:
+        devices.append(FakeSigningDevice(client, selected_device=selected_device, network=network))
+        return devices[-1]
+
+    usb_gui.get_device = lambda slow_hwi_listing=False: {"type": "fake", "path": "fake"}  # type: ignore
+    usb_gui._usb_device = usb_device  # type: ignore
+    return usb_gui, devices
+
+
+def test_sign_many_closes_the_device_before_returning():
+    client = FakeSigningClient()
+    usb_gui, devices = get_usb_gui(client)
+    blocker_ended: list[bool] = []
+    usb_gui.signal_end_hwi_blocker.connect(lambda: blocker_ended.append(True))
+    psbts = [p2wsh_psbt_0_2of3, p2wsh_psbt_1_2of3, p2wsh_2_2of3]
+
+    signed_psbts = usb_gui.sign_many(psbts)
+    # the device is closed and the blocker ended, even if only a part of the result is used
+    assert signed_psbts[0].serialize() == psbts[0].serialize()
+    assert client.signed == 3
+    assert devices[0].closed
+    assert blocker_ended == [True]
+
+
+def test_sign_many_stops_on_rejection():
+    client = FakeSigningClient(reject_index=1)
+    usb_gui, devices = get_usb_gui(client)
+
+    assert len(usb_gui.sign_many([p2wsh_psbt_0_2of3, p2wsh_psbt_1_2of3, p2wsh_2_2of3])) == 1
+    assert devices[0].closed
@@ -0,0 +1,68 @@
+import bdkpython as bdk
+
+from bitcoin_usb.address_types import get_key_origins
+from bitcoin_usb.device import USBDevice
+from bitcoin_usb.xpub_cache import XpubCache
+
+from .test_device import FakeSoftwareClient, network
+
+fingerprint = "7c85f2b5"
+
+
+def get_usb_device(xpub_cache: XpubCache) -> USBDevice:
+    dev = USBDevice(selected_device={"type": "fake", "path": "fake"}, network=network, xpub_cache=xpub_cache)
+    dev.client = FakeSoftwareClient()  # type: ignore
+    return dev
+
+
+def test_persistence(tmp_path):
+    path = tmp_path / "xpubs.json"
+    cache = XpubCache(path)
+    cache.set(fingerprint, "m/84'/1'/0'", network, "tpub1")
+    cache.flush()
+
+    cache = XpubCache(path)
+    assert cache.get(fingerprint.upper(), "m/84h/1h/0h", network) == "tpub1"
+    assert cache.get(fingerprint, "m/84h/1h/0h", bdk.Network.BITCOIN) is None
+    assert len(cache) == 1
+
+    cache.invalidate(fingerprint)
+    assert XpubCache(path).get(fingerprint, "m/84h/1h/0h", network) is None
+
+
+def test_device_uses_cache():
+    cache = XpubCache()
+    key_origins = get_key_origins(network, accounts=range(2))
+
+    dev = get_usb_device(cache)
+    xpubs = dev.get_xpubs_batch(key_origins).xpubs
+    assert dev.client.requested_paths == key_origins  # type: ignore
+    assert len(cache) == len(key_origins)
+
+    # a new session only asks the device for 1 spot check
+    dev = get_usb_device(cache)
+    assert dev.get_xpubs_batch(key_origins).xpubs == xpubs
+    assert dev.client.requested_paths == key_origins[:1]  # type: ignore
+
+
+def test_spot_check_detects_outdated_cache():
+    cache = XpubCache()
+    key_origins = get_key_origins(network)
+    for key_origin in key_origins:
+        cache.set(fingerprint, key_origin, network, "outdated")
+
+    dev = get_usb_device(cache)
+    xpubs = dev.get_xpubs_batch(key_origins).xpubs
+    assert "outdated" not in xpubs.values()
+    assert dev.client.requested_paths == key_origins  # type: ignore
+    assert cache.get(fingerprint, key_origins[-1], network) == xpubs[key_origins[-1]]
+
+
+def test_wipe_invalidates_cache():
+    cache = XpubCache()
+    cache.set(fingerprint, "m/84h/1h/0h", network, "tpub1")
+
+    dev = get_usb_device(cache)
+    dev.client.wipe_device = lambda: True  # type: ignore
+    assert dev.wipe_device()
+    assert len(cache) == 0
@@ -0,0 +1,81 @@
+"""Compares the device listing of DeviceEnumerator with the previous mock patched hwilib enumeration.
+
+No device has to be connected: hid.enumerate is replaced by a fake HID bus with
+--devices entries (a mix of hardware wallets and other HID devices).
+
+    PYTHONPATH=. python tools/benchmark_enumerate.py --devices 20 --repeat 50
+"""
+
+import argparse
+import time
+from unittest.mock import patch
+
+import bdkpython as bdk
+import hid
+
+from bitcoin_usb.device_enumerator import DeviceEnumerator
+from bitcoin_usb.hwi_quick import HWIQuick
+
+FAKE_DEVICES = [
+    {"vendor_id": 0x046D, "product_id": 0xC31C, "interface_number": 0, "usage_page": 1},
+    {"vendor_id": 0xD13E, "product_id": 0xCC10, "interface_number": 0, "usage_page": 0xFFA0},
+    {"vendor_id": 0x2C97, "product_id": 0x5011, "interface_number": 0, "usage_page": 0xFFA0},
+    {"vendor_id": 0x534C, "product_id": 0x0001, "interface_number": 0, "usage_page": 0xFF00},
+]
+
+
+def fake_hid_bus(n: int) -> list[dict]:
+    devices = []
+    for i in range(n):
+        device = dict(FAKE_DEVICES[i % len(FAKE_DEVICES)])
+        device.update(path=f"/dev/hidraw{i}".encode(), serial_number="", product_string="", release_number=0)
+        devices.append(device)
+    return devices
+
+
+def measure(f, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        f()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    bus = fake_hid_bus(args.devices)
+
+    def fake_hid_enumerate(vendor_id=0, product_id=0):
+        # hidapi filters by vendor/product id, if given
+        return [d for d in bus if vendor_id in (0, d["vendor_id"]) and product_id in (0, d["product_id"])]
+
+    network = bdk.Network.REGTEST
+    no_usb = lambda: []  # noqa: E731
+
+    with (
+        patch.object(hid, "enumerate", fake_hid_enumerate),
+        patch("hwilib.devices.trezorlib.transport.webusb.WebUsbTransport.enumerate", return_value=[]),
+        patch("serial.tools.list_ports.comports", return_value=[]),
+    ):
+        old = HWIQuick(network)
+        new = HWIQuick(
+            network, device_enumerator=DeviceEnumerator(webusb_enumerate=no_usb, serial_enumerate=no_usb)
+        )
+        # warm up the imports
+        old_devices = old.enumerate_with_mocks()
+        new_devices = new.enumerate()
+
+        old_seconds = measure(old.enumerate_with_mocks, args.repeat)
+        new_seconds = measure(new.enumerate, args.repeat)
+
+    print(f"fake hid devices: {args.devices}, repeat: {args.repeat}")
+    print(f"HWIQuick.enumerate_with_mocks: {old_seconds * 1000:8.3f} ms  ({len(old_devices)} wallets)")
+    print(f"DeviceEnumerator.enumerate:    {new_seconds * 1000:8.3f} ms  ({len(new_devices)} wallets)")
+    print(f"speedup: {old_seconds / new_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
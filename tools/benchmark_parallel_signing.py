@@ -0,0 +1,72 @@
+"""Scaling of ParallelSoftwareSigner with the number of worker processes.
+
+The psbts consist of copies of 1 p2wsh 2-of-3 multisig input (incl. the previous transaction),
+signed by 1 cosigner.  workers=1 is the serial SoftwareSigner.
+"cold" includes starting the worker processes (and building their wallets), "warm" reuses them.
+
+    PYTHONPATH=. python tools/benchmark_parallel_signing.py --inputs 1000 4000 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import time
+
+import bdkpython as bdk
+
+from bitcoin_usb.parallel_signer import ParallelSoftwareSigner
+from bitcoin_usb.psbt_tools import bdk_psbt_from_hwi
+from bitcoin_usb.software_signer import SoftwareSigner
+from tests.test_multi_signer import multisig_change_descriptor, multisig_descriptor, multisig_psbt, seeds
+from tests.test_psbt_tools import large_hwi_psbt
+
+network = bdk.Network.REGTEST
+
+
+def create_signer(workers: int) -> SoftwareSigner:
+    kwargs = dict(
+        mnemonic=seeds[0],
+        network=network,
+        receive_descriptor=multisig_descriptor,
+        change_descriptor=multisig_change_descriptor,
+    )
+    if workers == 1:
+        return SoftwareSigner(**kwargs)
+    return ParallelSoftwareSigner(workers=workers, min_inputs_per_worker=1, **kwargs)
+
+
+def measure(signer: SoftwareSigner, psbt_base64: str) -> tuple[float, str]:
+    start = time.perf_counter()
+    signed = signer.sign_psbt(bdk.Psbt(psbt_base64))
+    assert signed
+    return time.perf_counter() - start, signed.serialize()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--inputs", type=int, nargs="+", default=[1000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    print(f"cpu_count: {os.cpu_count()}")
+    print(f"{'inputs':>7} {'workers':>8} {'cold s':>8} {'warm s':>8} {'speedup':>8}")
+    for number_inputs in args.inputs:
+        psbt_base64 = bdk_psbt_from_hwi(large_hwi_psbt(bdk.Psbt(multisig_psbt), number_inputs)).serialize()
+        serial_seconds: float | None = None
+        serial_result: str | None = None
+        for workers in args.workers:
+            signer = create_signer(workers)
+            cold_seconds, result = measure(signer, psbt_base64)
+            warm_seconds, result = measure(signer, psbt_base64)
+            if isinstance(signer, ParallelSoftwareSigner):
+                signer.close()
+            if serial_seconds is None:
+                serial_seconds, serial_result = warm_seconds, result
+            assert result == serial_result, "the parallel and serial signatures differ"
+            print(
+                f"{number_inputs:>7} {workers:>8} {cold_seconds:>8.2f} {warm_seconds:>8.2f} "
+                f"{serial_seconds / warm_seconds:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compares the conversions of USBDevice.sign_psbt between bdk.Psbt and hwilib PSBT.
+
+old: bdk.serialize -> hwi deserialize -> (device signs) -> hwi serialize -> bdk.Psbt(base64)
+new: hwi_psbt_from_bdk -> (device signs) -> merge_hwi_signatures
+
+The psbts consist of copies of 1 p2wsh multisig input, including the full previous transaction.
+The "device" adds 1 partial signature to every input.
+
+    PYTHONPATH=. python tools/benchmark_psbt_bridge.py --inputs 100 500 1000
+"""
+
+import argparse
+import copy
+import time
+
+import bdkpython as bdk
+from hwilib.psbt import PSBT
+
+from bitcoin_usb.psbt_tools import bdk_psbt_from_hwi, hwi_psbt_from_bdk, merge_hwi_signatures
+from tests.test_psbt_tools import large_hwi_psbt, p2wsh_psbt_0_2of3, p2wsh_psbt_1_2of3
+
+SIGNATURE = next(iter(hwi_psbt_from_bdk(p2wsh_psbt_1_2of3).inputs[0].partial_sigs.items()))
+
+
+def fake_sign(hwi_psbt: PSBT) -> PSBT:
+    for psbt_input in hwi_psbt.inputs:
+        psbt_input.partial_sigs[SIGNATURE[0]] = SIGNATURE[1]
+    return hwi_psbt
+
+
+def old_bridge(psbt: bdk.Psbt) -> bdk.Psbt:
+    hwi_psbt = PSBT()
+    hwi_psbt.deserialize(psbt.serialize())
+    signed = fake_sign(hwi_psbt)
+    return bdk.Psbt(signed.serialize())
+
+
+def new_bridge(psbt: bdk.Psbt) -> bdk.Psbt:
+    signed = fake_sign(hwi_psbt_from_bdk(psbt))
+    return merge_hwi_signatures(psbt, signed)
+
+
+def measure(f, psbt: bdk.Psbt, repeat: int) -> tuple[float, bdk.Psbt]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = f(psbt)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--inputs", type=int, nargs="+", default=[10, 100, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'inputs':>7} {'psbt kB':>8} {'old ms':>9} {'new ms':>9} {'speedup':>8}")
+    for number_inputs in args.inputs:
+        psbt = bdk_psbt_from_hwi(large_hwi_psbt(p2wsh_psbt_0_2of3, number_inputs))
+        old_seconds, old_result = measure(old_bridge, psbt, args.repeat)
+        new_seconds, new_result = measure(new_bridge, psbt, args.repeat)
+        assert old_result.serialize() == new_result.serialize()
+        print(
+            f"{number_inputs:>7} {len(psbt.serialize()) * 3 / 4 / 1000:>8.0f} "
+            f"{old_seconds * 1000:>9.1f} {new_seconds * 1000:>9.1f} {old_seconds / new_seconds:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()